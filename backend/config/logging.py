@@ -38,4 +38,16 @@ def setup_logging():
     
     # 设置Flask和其他库的日志级别
     logging.getLogger('werkzeug').setLevel(logging.ERROR)  # 修改为ERROR级别，减少HTTP请求日志
-    logging.getLogger('sqlalchemy').setLevel(logging.ERROR)  # 修改为ERROR级别，减少SQL查询日志 
\ No newline at end of file
+    logging.getLogger('sqlalchemy').setLevel(logging.ERROR)  # 修改为ERROR级别，减少SQL查询日志
+
+    # 慢查询日志单独写入文件，不受根日志级别限制
+    slow_query_handler = RotatingFileHandler(
+        os.path.join(log_dir, 'slow_query.log'),
+        maxBytes=10*1024*1024,  # 10MB
+        backupCount=5
+    )
+    slow_query_handler.setFormatter(formatter)
+    slow_query_logger = logging.getLogger('slow_query')
+    slow_query_logger.setLevel(logging.WARNING)
+    slow_query_logger.addHandler(slow_query_handler)
+    slow_query_logger.propagate = False
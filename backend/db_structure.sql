@@ -16,6 +16,32 @@ CREATE TABLE `exchange_rates` (
   UNIQUE KEY `uix_currency_date` (`currency`,`rate_date`)
 ) ENGINE=InnoDB AUTO_INCREMENT=47 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='汇率记录表';
 
+-- 表结构: holder_positions
+CREATE TABLE `holder_positions` (
+  `holder_id` int NOT NULL COMMENT '持有人ID',
+  `market` varchar(20) NOT NULL COMMENT '市场',
+  `stock_code` varchar(20) NOT NULL COMMENT '股票代码',
+  `stock_name` varchar(100) DEFAULT NULL COMMENT '股票名称',
+  `quantity` int NOT NULL DEFAULT '0' COMMENT '持仓数量',
+  `cost` decimal(16,2) DEFAULT NULL COMMENT '持仓成本',
+  `avg_cost` decimal(12,4) DEFAULT NULL COMMENT '移动加权平均价',
+  `total_buy_quantity` int NOT NULL DEFAULT '0' COMMENT '累计买入数量',
+  `total_sell_quantity` int NOT NULL DEFAULT '0' COMMENT '累计卖出数量',
+  `total_buy_amount` decimal(16,2) NOT NULL DEFAULT '0.00' COMMENT '累计买入金额',
+  `total_sell_amount` decimal(16,2) NOT NULL DEFAULT '0.00' COMMENT '累计卖出金额',
+  `total_buy_fees` decimal(16,2) NOT NULL DEFAULT '0.00' COMMENT '累计买入费用',
+  `total_sell_fees` decimal(16,2) NOT NULL DEFAULT '0.00' COMMENT '累计卖出费用',
+  `realized_profit` decimal(16,2) NOT NULL DEFAULT '0.00' COMMENT '已实现盈亏',
+  `last_buy_avg_cost` decimal(12,4) DEFAULT NULL COMMENT '最后一次买入后的移动加权平均价',
+  `last_buy_date` date DEFAULT NULL COMMENT '最后一次买入日期',
+  `last_buy_split_id` int DEFAULT NULL COMMENT '最后一次买入的分单ID',
+  `last_transaction_date` date DEFAULT NULL COMMENT '最后交易日期',
+  `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`holder_id`,`market`,`stock_code`),
+  KEY `idx_stock` (`stock_code`,`market`),
+  CONSTRAINT `fk_hp_holder_id` FOREIGN KEY (`holder_id`) REFERENCES `holders` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='持有人持仓快照';
+
 -- 表结构: holders
 CREATE TABLE `holders` (
   `id` int NOT NULL AUTO_INCREMENT COMMENT '持有人ID',
@@ -56,6 +82,16 @@ CREATE TABLE `permissions` (
   CONSTRAINT `permissions_ibfk_1` FOREIGN KEY (`parent_id`) REFERENCES `permissions` (`id`) ON DELETE SET NULL
 ) ENGINE=InnoDB AUTO_INCREMENT=68 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- 表结构: price_history
+CREATE TABLE `price_history` (
+  `symbol` varchar(30) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '货币对或股票查询字符串，如 USD-HKD、0700:HKG',
+  `price_date` date NOT NULL COMMENT '日期',
+  `value` decimal(18,6) NOT NULL COMMENT '汇率或收盘价',
+  `source` varchar(20) COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT 'GOOGLE_FINANCE' COMMENT '数据来源',
+  `created_at` datetime DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  PRIMARY KEY (`symbol`,`price_date`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='历史汇率/股价时间序列';
+
 -- 表结构: role_permissions
 CREATE TABLE `role_permissions` (
   `id` int NOT NULL AUTO_INCREMENT,
@@ -117,6 +153,7 @@ CREATE TABLE `stock_transactions` (
   `avg_price` decimal(10,4) DEFAULT NULL COMMENT '平均价格',
   PRIMARY KEY (`id`),
   KEY `user_id` (`user_id`),
+  KEY `idx_user_date_id` (`user_id`,`transaction_date`,`id`),
   CONSTRAINT `stock_transactions_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=284 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='股票交易记录表';
 
@@ -173,12 +210,12 @@ CREATE TABLE `transaction_splits` (
   `avg_price` decimal(10,4) DEFAULT NULL COMMENT '平均价格',
   PRIMARY KEY (`id`),
   KEY `idx_original_transaction` (`original_transaction_id`),
-  KEY `idx_holder` (`holder_id`),
+  KEY `idx_holder_stock_date` (`holder_id`,`market`,`stock_code`,`transaction_date`,`id`),
   KEY `idx_stock` (`stock_code`,`market`),
   KEY `idx_transaction_date` (`transaction_date`),
   CONSTRAINT `fk_original_transaction_id` FOREIGN KEY (`original_transaction_id`) REFERENCES `stock_transactions` (`id`) ON DELETE CASCADE,
   CONSTRAINT `fk_ts_holder_id` FOREIGN KEY (`holder_id`) REFERENCES `holders` (`id`)
-) ENGINE=InnoDB AUTO_INCREMENT=258 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='交易分单记录';
+) ENGINE=InnoDB AUTO_INCREMENT=258 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='交易分单记录';
 
 -- 表结构: user_roles
 CREATE TABLE `user_roles` (
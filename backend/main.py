@@ -1,12 +1,16 @@
 from flask import Flask, send_from_directory, jsonify, request
 import os
 import logging
+import threading
 from logging.handlers import RotatingFileHandler
 from datetime import datetime
 from config.database import db
 from flask_cors import CORS
 from config.logging import setup_logging
 from config.db_config import get_db_config
+from utils.db import DB_ENV, configure_pool, get_pool_stats
+from utils.query_profiler import QueryProfiler, init_query_profiler
+from utils.auth import permission_required
 
 # 导入路由
 from routes.auth import auth_bp
@@ -23,7 +27,34 @@ from routes.holder import holder_bp
 # 设置日志
 setup_logging()
 
-def create_app():
+def init_database(app, env):
+    """
+    注册应用共享的数据库对象，连接池在第一个请求到来时才初始化，
+    导入应用和 fork 工作进程时不连接数据库
+    """
+    app.config['DB_ENV'] = env
+    app.extensions['db'] = db
+    configure_pool(env)
+
+    init_lock = threading.Lock()
+    state = {'ready': False}
+
+    @app.before_request
+    def ensure_db_pool():
+        if state['ready']:
+            return
+        with init_lock:
+            if state['ready']:
+                return
+            try:
+                db.init_pool(env)
+                state['ready'] = True
+                app.logger.info("数据库连接池初始化成功")
+            except Exception as e:
+                app.logger.error(f"数据库连接池初始化失败: {str(e)}")
+                raise
+
+def create_app(env=None):
     # 创建应用实例
     app = Flask(__name__, static_folder='../frontend/dist')
 
@@ -108,13 +139,11 @@ def create_app():
     app.logger.addHandler(handler)
     app.logger.setLevel(logging.ERROR)
 
-    # 初始化数据库连接
-    try:
-        db.init_pool('development')
-        app.logger.info("数据库连接池初始化成功")
-    except Exception as e:
-        app.logger.error(f"数据库连接池初始化失败: {str(e)}")
-        raise
+    # 注册数据库，环境由参数或 DB_ENV 环境变量指定
+    init_database(app, env or DB_ENV)
+
+    # 记录每个请求的查询次数和数据库耗时
+    init_query_profiler(app, db)
 
     # 健康检查端点
     @app.route('/api/health')
@@ -125,6 +154,18 @@ def create_app():
             'db_connected': db.is_connected()
         })
 
+    # 查询统计和连接池统计，权限由 migrations/add_monitor_permission.py 添加
+    @app.route('/api/health/metrics')
+    @permission_required('system:monitor:view')
+    def health_metrics():
+        top = max(request.args.get('top', 20, type=int), 1)
+        return jsonify({
+            'status': 'ok',
+            'timestamp': datetime.now().isoformat(),
+            'queries': QueryProfiler.snapshot(top),
+            'connection_pool': get_pool_stats()
+        })
+
     # 错误处理
     @app.errorhandler(404)
     def not_found_error(error):
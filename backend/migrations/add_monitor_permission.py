@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+系统监控权限迁移脚本
+
+添加 /api/health/metrics 使用的 system:monitor:view 权限（挂在 system 模块下），
+并授予管理员角色。重复运行时跳过已存在的权限和授权。
+
+用法: python migrations/add_monitor_permission.py
+      python migrations/add_monitor_permission.py --role 管理员
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.db import get_db_connection
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+PERMISSION = {
+    'name': '查看系统监控',
+    'code': 'system:monitor:view',
+    'description': '查看连接池、查询耗时等运行指标（/api/health/metrics）',
+    # 5-接口
+    'type': 5,
+    'parent_code': 'system'
+}
+
+def add_monitor_permission(connection):
+    """
+    添加系统监控权限，路径和层级与 Permission._update_path 的规则一致
+
+    Returns:
+        int: 权限ID
+    """
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("SELECT id FROM permissions WHERE code = %s", (PERMISSION['code'],))
+        row = cursor.fetchone()
+        if row:
+            logger.info(f"{PERMISSION['code']} 权限已存在，跳过创建")
+            return row['id']
+
+        cursor.execute("SELECT id, path, level FROM permissions WHERE code = %s", (PERMISSION['parent_code'],))
+        parent = cursor.fetchone()
+        if not parent:
+            logger.warning(f"未找到父权限 {PERMISSION['parent_code']}，{PERMISSION['code']} 作为顶级权限添加")
+
+        cursor.execute("""
+            INSERT INTO permissions (name, code, description, type, parent_id, level, sort_order, is_menu)
+            VALUES (%s, %s, %s, %s, %s, %s, 0, 0)
+        """, (
+            PERMISSION['name'], PERMISSION['code'], PERMISSION['description'], PERMISSION['type'],
+            parent['id'] if parent else None, parent['level'] + 1 if parent else 0
+        ))
+        permission_id = cursor.lastrowid
+        path = f"{parent['path']}/{permission_id}" if parent and parent['path'] else str(permission_id)
+        cursor.execute("UPDATE permissions SET path = %s WHERE id = %s", (path, permission_id))
+        logger.info(f"成功添加 {PERMISSION['code']} 权限: id={permission_id}, path={path}")
+        return permission_id
+
+    except Exception as e:
+        logger.error(f"添加 {PERMISSION['code']} 权限时出错: {e}")
+        raise
+    finally:
+        cursor.close()
+
+def grant_to_role(connection, permission_id, role_name):
+    """
+    将权限授予角色
+
+    Returns:
+        bool: 角色存在时为 True
+    """
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("SELECT id FROM roles WHERE name = %s", (role_name,))
+        role = cursor.fetchone()
+        if not role:
+            logger.warning(f"未找到角色 {role_name}，请在角色管理中为管理员角色分配 {PERMISSION['code']} 权限")
+            return False
+
+        cursor.execute(
+            "INSERT IGNORE INTO role_permissions (role_id, permission_id) VALUES (%s, %s)",
+            (role['id'], permission_id)
+        )
+        if cursor.rowcount:
+            logger.info(f"已将 {PERMISSION['code']} 授予角色 {role_name}")
+        else:
+            logger.info(f"角色 {role_name} 已有 {PERMISSION['code']} 权限，跳过授权")
+        return True
+
+    except Exception as e:
+        logger.error(f"授予角色 {role_name} 权限时出错: {e}")
+        raise
+    finally:
+        cursor.close()
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='添加系统监控权限并授予管理员角色')
+    parser.add_argument('--role', default='admin', help='授予权限的管理员角色名称')
+    args = parser.parse_args()
+
+    try:
+        connection = get_db_connection()
+        logger.info("数据库连接成功")
+
+        permission_id = add_monitor_permission(connection)
+        grant_to_role(connection, permission_id, args.role)
+        connection.commit()
+        logger.info("迁移成功完成，权限缓存最长 PERMISSION_CACHE_TTL 秒后在运行中的服务生效")
+
+    except Exception as e:
+        logger.error(f"迁移失败: {e}")
+        if 'connection' in locals():
+            connection.rollback()
+    finally:
+        if 'connection' in locals():
+            connection.close()
+            logger.info("数据库连接已关闭")
+
+if __name__ == "__main__":
+    main()
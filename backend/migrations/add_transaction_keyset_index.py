@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+交易列表游标分页索引迁移脚本
+
+为 stock_transactions 添加 (user_id, transaction_date, id) 联合索引，
+交易列表按 transaction_date DESC, id DESC 游标分页时可直接从索引定位到上一页末尾。
+"""
+
+import os
+import sys
+import logging
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.db import get_db_connection
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+def add_transaction_keyset_index(connection):
+    """
+    添加交易列表游标分页索引
+    """
+    cursor = connection.cursor()
+    
+    try:
+        # 检查索引是否已存在
+        cursor.execute("SHOW INDEX FROM stock_transactions WHERE Key_name = 'idx_user_date_id'")
+        if cursor.fetchone():
+            logger.info("idx_user_date_id 索引已存在，跳过创建")
+            return
+        
+        cursor.execute("""
+        ALTER TABLE `stock_transactions`
+          ADD KEY `idx_user_date_id` (`user_id`,`transaction_date`,`id`)
+        """)
+        logger.info("成功添加 idx_user_date_id 索引")
+        
+    except Exception as e:
+        logger.error(f"添加 idx_user_date_id 索引时出错: {e}")
+        raise
+    finally:
+        cursor.close()
+
+def main():
+    """
+    主函数
+    """
+    try:
+        connection = get_db_connection()
+        logger.info("数据库连接成功")
+        
+        add_transaction_keyset_index(connection)
+        connection.commit()
+        logger.info("迁移成功完成")
+        
+    except Exception as e:
+        logger.error(f"迁移失败: {e}")
+        if 'connection' in locals():
+            connection.rollback()
+    finally:
+        if 'connection' in locals():
+            connection.close()
+            logger.info("数据库连接已关闭")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+排序规则统一及分单索引迁移脚本
+
+transaction_splits、holder_positions 使用 utf8mb4_0900_ai_ci，stock_transactions、stocks 使用
+utf8mb4_unicode_ci，盈利查询只能用 COLLATE 转换后再连接，无法使用索引。
+本迁移将这几张表统一为 utf8mb4_unicode_ci，并为 transaction_splits 添加
+(holder_id, market, stock_code, transaction_date, id) 联合索引，替代只含 holder_id 的 idx_holder。
+
+迁移前后可运行 scripts/explain_profit_queries.py 对比执行计划。
+"""
+
+import os
+import sys
+import logging
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.db import get_db_connection
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+TARGET_COLLATION = 'utf8mb4_unicode_ci'
+
+# 需要统一排序规则的表
+TABLES = ('stock_transactions', 'stocks', 'transaction_splits', 'holder_positions')
+
+# 需要添加的索引: (表名, 索引名, 列)
+INDEXES = (
+    ('transaction_splits', 'idx_holder_stock_date', ('holder_id', 'market', 'stock_code', 'transaction_date', 'id')),
+)
+
+# 被新索引覆盖的冗余索引: (表名, 索引名)
+REDUNDANT_INDEXES = (
+    ('transaction_splits', 'idx_holder'),
+)
+
+def needs_conversion(cursor, table):
+    """表或其字符列的排序规则与目标不一致"""
+    cursor.execute("""
+        SELECT TABLE_COLLATION FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    row = cursor.fetchone()
+    if not row:
+        logger.warning(f"{table} 表不存在，跳过")
+        return False
+    if row['TABLE_COLLATION'] != TARGET_COLLATION:
+        return True
+
+    cursor.execute("""
+        SELECT COUNT(*) AS mismatched FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+          AND COLLATION_NAME IS NOT NULL AND COLLATION_NAME <> %s
+    """, (table, TARGET_COLLATION))
+    return cursor.fetchone()['mismatched'] > 0
+
+def index_exists(cursor, table, index_name):
+    cursor.execute(f"SHOW INDEX FROM `{table}` WHERE Key_name = %s", (index_name,))
+    return cursor.fetchone() is not None
+
+def align_collations(connection):
+    """
+    统一排序规则
+    """
+    cursor = connection.cursor()
+
+    try:
+        for table in TABLES:
+            if not needs_conversion(cursor, table):
+                logger.info(f"{table} 排序规则已是 {TARGET_COLLATION}，跳过")
+                continue
+            cursor.execute(f"ALTER TABLE `{table}` CONVERT TO CHARACTER SET utf8mb4 COLLATE {TARGET_COLLATION}")
+            logger.info(f"已将 {table} 转换为 {TARGET_COLLATION}")
+    except Exception as e:
+        logger.error(f"统一排序规则时出错: {e}")
+        raise
+    finally:
+        cursor.close()
+
+def add_split_indexes(connection):
+    """
+    添加联合索引并删除被覆盖的冗余索引
+    """
+    cursor = connection.cursor()
+
+    try:
+        for table, index_name, columns in INDEXES:
+            if index_exists(cursor, table, index_name):
+                logger.info(f"{index_name} 索引已存在，跳过创建")
+                continue
+            column_list = ', '.join(f'`{column}`' for column in columns)
+            cursor.execute(f"ALTER TABLE `{table}` ADD KEY `{index_name}` ({column_list})")
+            logger.info(f"成功添加 {table}.{index_name} 索引")
+
+        # 新索引以 holder_id 开头，可以满足外键约束，再删除冗余索引
+        for table, index_name in REDUNDANT_INDEXES:
+            if not index_exists(cursor, table, index_name):
+                continue
+            cursor.execute(f"ALTER TABLE `{table}` DROP KEY `{index_name}`")
+            logger.info(f"已删除冗余索引 {table}.{index_name}")
+    except Exception as e:
+        logger.error(f"添加分单索引时出错: {e}")
+        raise
+    finally:
+        cursor.close()
+
+def main():
+    """
+    主函数
+    """
+    try:
+        connection = get_db_connection()
+        logger.info("数据库连接成功")
+
+        align_collations(connection)
+        add_split_indexes(connection)
+        connection.commit()
+        logger.info("迁移成功完成")
+
+    except Exception as e:
+        logger.error(f"迁移失败: {e}")
+        if 'connection' in locals():
+            connection.rollback()
+    finally:
+        if 'connection' in locals():
+            connection.close()
+            logger.info("数据库连接已关闭")
+
+if __name__ == "__main__":
+    main()
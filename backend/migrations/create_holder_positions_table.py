@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+持有人持仓快照表创建迁移脚本
+
+创建 holder_positions 表，并从现有交易分单记录生成全部持仓快照。
+"""
+
+import os
+import sys
+import logging
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.db import get_db_connection
+from models.holder_position import HolderPosition
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+def create_holder_positions_table(connection):
+    """
+    创建持有人持仓快照表
+    """
+    cursor = connection.cursor()
+    
+    try:
+        # 检查表是否已存在
+        cursor.execute("SHOW TABLES LIKE 'holder_positions'")
+        if cursor.fetchone():
+            logger.info("holder_positions 表已存在，跳过创建")
+            return
+        
+        create_table_sql = """
+        CREATE TABLE IF NOT EXISTS `holder_positions` (
+          `holder_id` int NOT NULL COMMENT '持有人ID',
+          `market` varchar(20) NOT NULL COMMENT '市场',
+          `stock_code` varchar(20) NOT NULL COMMENT '股票代码',
+          `stock_name` varchar(100) DEFAULT NULL COMMENT '股票名称',
+          `quantity` int NOT NULL DEFAULT '0' COMMENT '持仓数量',
+          `cost` decimal(16,2) DEFAULT NULL COMMENT '持仓成本',
+          `avg_cost` decimal(12,4) DEFAULT NULL COMMENT '移动加权平均价',
+          `total_buy_quantity` int NOT NULL DEFAULT '0' COMMENT '累计买入数量',
+          `total_sell_quantity` int NOT NULL DEFAULT '0' COMMENT '累计卖出数量',
+          `total_buy_amount` decimal(16,2) NOT NULL DEFAULT '0.00' COMMENT '累计买入金额',
+          `total_sell_amount` decimal(16,2) NOT NULL DEFAULT '0.00' COMMENT '累计卖出金额',
+          `total_buy_fees` decimal(16,2) NOT NULL DEFAULT '0.00' COMMENT '累计买入费用',
+          `total_sell_fees` decimal(16,2) NOT NULL DEFAULT '0.00' COMMENT '累计卖出费用',
+          `realized_profit` decimal(16,2) NOT NULL DEFAULT '0.00' COMMENT '已实现盈亏',
+          `last_buy_avg_cost` decimal(12,4) DEFAULT NULL COMMENT '最后一次买入后的移动加权平均价',
+          `last_buy_date` date DEFAULT NULL COMMENT '最后一次买入日期',
+          `last_buy_split_id` int DEFAULT NULL COMMENT '最后一次买入的分单ID',
+          `last_transaction_date` date DEFAULT NULL COMMENT '最后交易日期',
+          `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+          PRIMARY KEY (`holder_id`,`market`,`stock_code`),
+          KEY `idx_stock` (`stock_code`,`market`),
+          CONSTRAINT `fk_hp_holder_id` FOREIGN KEY (`holder_id`) REFERENCES `holders` (`id`) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='持有人持仓快照';
+        """
+        
+        cursor.execute(create_table_sql)
+        logger.info("成功创建 holder_positions 表")
+        
+    except Exception as e:
+        logger.error(f"创建 holder_positions 表时出错: {e}")
+        raise
+    finally:
+        cursor.close()
+
+def main():
+    """
+    主函数
+    """
+    try:
+        connection = get_db_connection()
+        logger.info("数据库连接成功")
+        
+        create_holder_positions_table(connection)
+        connection.commit()
+        
+        # 从交易分单记录生成持仓快照
+        if not HolderPosition.rebuild_all():
+            raise RuntimeError("生成持仓快照失败")
+        logger.info("迁移成功完成")
+        
+    except Exception as e:
+        logger.error(f"迁移失败: {e}")
+        if 'connection' in locals():
+            connection.rollback()
+    finally:
+        if 'connection' in locals():
+            connection.close()
+            logger.info("数据库连接已关闭")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+历史汇率/股价时间序列表创建迁移脚本
+
+创建 price_history 表，历史数据在首次按日期查询时整段抓取写入。
+"""
+
+import os
+import sys
+import logging
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.db import get_db_connection
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+def create_price_history_table(connection):
+    """
+    创建历史汇率/股价时间序列表
+    """
+    cursor = connection.cursor()
+    
+    try:
+        # 检查表是否已存在
+        cursor.execute("SHOW TABLES LIKE 'price_history'")
+        if cursor.fetchone():
+            logger.info("price_history 表已存在，跳过创建")
+            return
+        
+        create_table_sql = """
+        CREATE TABLE IF NOT EXISTS `price_history` (
+          `symbol` varchar(30) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '货币对或股票查询字符串，如 USD-HKD、0700:HKG',
+          `price_date` date NOT NULL COMMENT '日期',
+          `value` decimal(18,6) NOT NULL COMMENT '汇率或收盘价',
+          `source` varchar(20) COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT 'GOOGLE_FINANCE' COMMENT '数据来源',
+          `created_at` datetime DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+          PRIMARY KEY (`symbol`,`price_date`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='历史汇率/股价时间序列';
+        """
+        
+        cursor.execute(create_table_sql)
+        logger.info("成功创建 price_history 表")
+        
+    except Exception as e:
+        logger.error(f"创建 price_history 表时出错: {e}")
+        raise
+    finally:
+        cursor.close()
+
+def main():
+    """
+    主函数
+    """
+    try:
+        connection = get_db_connection()
+        logger.info("数据库连接成功")
+        
+        create_price_history_table(connection)
+        connection.commit()
+        logger.info("迁移成功完成")
+        
+    except Exception as e:
+        logger.error(f"迁移失败: {e}")
+        if 'connection' in locals():
+            connection.rollback()
+    finally:
+        if 'connection' in locals():
+            connection.close()
+            logger.info("数据库连接已关闭")
+
+if __name__ == "__main__":
+    main()
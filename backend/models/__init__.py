@@ -8,6 +8,10 @@ from .exchange import ExchangeRate
 from .role import Role
 from .permission import Permission, RolePermission
 from .user_role import UserRole
+from .holder_position import HolderPosition
+from .price_history import PriceHistory
+from .permission_cache import PermissionCache
+from .visibility_scope import VisibilityScope
 
 __all__ = [
     'User', 
@@ -18,5 +22,9 @@ __all__ = [
     'Role',
     'Permission',
     'UserRole',
-    'RolePermission'
+    'RolePermission',
+    'HolderPosition',
+    'PriceHistory',
+    'PermissionCache',
+    'VisibilityScope'
 ] 
\ No newline at end of file
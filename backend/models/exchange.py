@@ -1,5 +1,6 @@
 from datetime import datetime
 from config.database import db
+from utils.db import build_batch_update
 
 class ExchangeRate:
     """汇率模型"""
@@ -36,6 +37,75 @@ class ExchangeRate:
             print(f"查找临时汇率记录失败: {str(e)}")
             return []
             
+    @classmethod
+    def find_page(cls, currency=None, start_date=None, end_date=None, page=1, per_page=15, db_conn=None):
+        """
+        分页查询汇率记录，按日期降序、货币排序
+        
+        db_conn 为数据库连接或Database对象，默认使用全局db
+        
+        Returns:
+            dict: items（ExchangeRate.to_dict() 列表）、total、page、per_page、pages
+        """
+        db_conn = db_conn or db
+        sql = """
+            SELECT * FROM exchange_rates 
+            WHERE 1=1
+        """
+        params = []
+        
+        if currency:
+            sql += " AND currency = %s"
+            params.append(currency)
+        if start_date:
+            sql += " AND rate_date >= %s"
+            params.append(start_date)
+        if end_date:
+            sql += " AND rate_date <= %s"
+            params.append(end_date)
+            
+        # 计算总记录数
+        count_sql = sql.replace("*", "COUNT(*) as count")
+        total = db_conn.fetch_one(count_sql, params)
+        total_count = total['count'] if total else 0
+        
+        # 添加排序和分页
+        sql += " ORDER BY rate_date DESC, currency"
+        sql += " LIMIT %s OFFSET %s"
+        offset = (page - 1) * per_page
+        params.extend([per_page, offset])
+        
+        rates = db_conn.fetch_all(sql, params) or []
+        return {
+            'items': [cls(rate).to_dict() for rate in rates],
+            'total': total_count,
+            'page': page,
+            'per_page': per_page,
+            'pages': (total_count + per_page - 1) // per_page
+        }
+            
+    @staticmethod
+    def bulk_update(updates, batch_size=500):
+        """
+        批量更新汇率记录的汇率和来源
+        
+        Args:
+            updates: (id, rate, source) 元组列表
+            batch_size: 每条语句更新的行数
+            
+        Returns:
+            int: 提交更新的记录数
+        """
+        updated = 0
+        for start in range(0, len(updates), batch_size):
+            batch = updates[start:start + batch_size]
+            sql, params = build_batch_update('exchange_rates', [
+                (rate_id, {'rate': rate, 'source': source}) for rate_id, rate, source in batch
+            ])
+            if db.execute(sql, params) is not False:
+                updated += len(batch)
+        return updated
+            
     def save(self):
         """保存或更新汇率记录"""
         if self.id:
@@ -0,0 +1,351 @@
+"""
+持有人持仓快照模型
+
+holder_positions 按 (holder_id, market, stock_code) 保存当前持仓的汇总结果，
+每次交易写入后刷新对应的持仓，持仓页面只需按持有人读取少量快照行，
+不再对 transaction_splits 的完整历史做聚合。
+用户自己的交易分单给非关联持有人（或未指定持有人）的部分不在快照中，查询持仓时从分单记录计算。
+"""
+from datetime import date
+from config.database import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+FEES_SQL = "(ts.broker_fee + ts.transaction_levy + ts.stamp_duty + ts.trading_fee + ts.deposit_fee)"
+
+# 从交易分单记录计算持仓快照，{filter} 为 transaction_splits 的筛选条件，holder_id 为 NULL 的记录归为一组
+SNAPSHOT_SELECT_SQL = f"""
+    SELECT
+        agg.holder_id,
+        agg.market,
+        agg.stock_code,
+        agg.stock_name,
+        agg.quantity,
+        last_split.current_cost AS cost,
+        last_split.current_avg_cost AS avg_cost,
+        agg.total_buy_quantity,
+        agg.total_sell_quantity,
+        agg.total_buy_amount,
+        agg.total_sell_amount,
+        agg.total_buy_fees,
+        agg.total_sell_fees,
+        agg.realized_profit,
+        last_buy.current_avg_cost AS last_buy_avg_cost,
+        last_buy.transaction_date AS last_buy_date,
+        last_buy.id AS last_buy_split_id,
+        agg.last_transaction_date
+    FROM (
+        SELECT
+            ts.holder_id,
+            ts.market,
+            ts.stock_code,
+            MAX(ts.stock_name) AS stock_name,
+            SUM(CASE WHEN UPPER(ts.transaction_type) = 'BUY' THEN ts.total_quantity ELSE -ts.total_quantity END) AS quantity,
+            SUM(CASE WHEN UPPER(ts.transaction_type) = 'BUY' THEN ts.total_quantity ELSE 0 END) AS total_buy_quantity,
+            SUM(CASE WHEN UPPER(ts.transaction_type) = 'SELL' THEN ts.total_quantity ELSE 0 END) AS total_sell_quantity,
+            SUM(CASE WHEN UPPER(ts.transaction_type) = 'BUY' THEN ts.total_amount ELSE 0 END) AS total_buy_amount,
+            SUM(CASE WHEN UPPER(ts.transaction_type) = 'SELL' THEN ts.total_amount ELSE 0 END) AS total_sell_amount,
+            SUM(CASE WHEN UPPER(ts.transaction_type) = 'BUY' THEN {FEES_SQL} ELSE 0 END) AS total_buy_fees,
+            SUM(CASE WHEN UPPER(ts.transaction_type) = 'SELL' THEN {FEES_SQL} ELSE 0 END) AS total_sell_fees,
+            SUM(CASE WHEN UPPER(ts.transaction_type) = 'SELL'
+                THEN ts.total_amount - (ts.total_quantity * ts.prev_avg_cost) - {FEES_SQL}
+                ELSE 0 END) AS realized_profit,
+            MAX(ts.transaction_date) AS last_transaction_date
+        FROM stock.transaction_splits ts
+        WHERE {{filter}}
+        GROUP BY ts.holder_id, ts.market, ts.stock_code
+    ) agg
+    LEFT JOIN (
+        SELECT ranked.holder_id, ranked.market, ranked.stock_code, ranked.current_cost, ranked.current_avg_cost
+        FROM (
+            SELECT ts.holder_id, ts.market, ts.stock_code, ts.current_cost, ts.current_avg_cost,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY ts.holder_id, ts.market, ts.stock_code
+                       ORDER BY ts.transaction_date DESC, ts.id DESC
+                   ) AS row_num
+            FROM stock.transaction_splits ts
+            WHERE {{filter}}
+        ) ranked
+        WHERE ranked.row_num = 1
+    ) last_split ON last_split.holder_id <=> agg.holder_id
+        AND last_split.market = agg.market
+        AND last_split.stock_code = agg.stock_code
+    LEFT JOIN (
+        SELECT ranked.holder_id, ranked.market, ranked.stock_code, ranked.current_avg_cost, ranked.transaction_date, ranked.id
+        FROM (
+            SELECT ts.holder_id, ts.market, ts.stock_code, ts.current_avg_cost, ts.transaction_date, ts.id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY ts.holder_id, ts.market, ts.stock_code
+                       ORDER BY ts.transaction_date DESC, ts.id DESC
+                   ) AS row_num
+            FROM stock.transaction_splits ts
+            WHERE UPPER(ts.transaction_type) = 'BUY' AND {{filter}}
+        ) ranked
+        WHERE ranked.row_num = 1
+    ) last_buy ON last_buy.holder_id <=> agg.holder_id
+        AND last_buy.market = agg.market
+        AND last_buy.stock_code = agg.stock_code
+"""
+
+SNAPSHOT_COLUMNS = [
+    'holder_id', 'market', 'stock_code', 'stock_name', 'quantity', 'cost', 'avg_cost',
+    'total_buy_quantity', 'total_sell_quantity', 'total_buy_amount', 'total_sell_amount',
+    'total_buy_fees', 'total_sell_fees', 'realized_profit',
+    'last_buy_avg_cost', 'last_buy_date', 'last_buy_split_id', 'last_transaction_date'
+]
+
+KEY_FILTER_SQL = "ts.holder_id = %s AND ts.market = %s AND ts.stock_code = %s"
+
+# 快照只保存指定了持有人的分单记录
+SNAPSHOT_FILTER_SQL = "ts.holder_id IS NOT NULL"
+
+# 用于校验的数值字段
+COMPARE_FIELDS = [
+    'quantity', 'cost', 'avg_cost', 'total_buy_quantity', 'total_sell_quantity',
+    'total_buy_amount', 'total_sell_amount', 'total_buy_fees', 'total_sell_fees',
+    'realized_profit', 'last_buy_avg_cost'
+]
+
+def _upsert_sql(filter_sql):
+    """构建从交易分单记录写入持仓快照的语句"""
+    columns = ', '.join(SNAPSHOT_COLUMNS)
+    updates = ', '.join(
+        f"{column} = VALUES({column})" for column in SNAPSHOT_COLUMNS
+        if column not in ('holder_id', 'market', 'stock_code')
+    )
+    return f"""
+        INSERT INTO stock.holder_positions ({columns})
+        {SNAPSHOT_SELECT_SQL.format(filter=filter_sql)}
+        ON DUPLICATE KEY UPDATE {updates}, updated_at = NOW()
+    """
+
+class HolderPosition:
+    """持有人持仓快照"""
+
+    @staticmethod
+    def refresh(holder_id, market, stock_code, db_conn=None):
+        """
+        从交易分单记录刷新一个持有人-股票的持仓快照
+
+        Args:
+            holder_id: 持有人ID
+            market: 市场
+            stock_code: 股票代码
+            db_conn: 数据库连接或Database对象，默认使用全局db
+
+        Returns:
+            bool: 是否成功
+        """
+        db_conn = db_conn or db
+        key_params = [holder_id, market, stock_code]
+        try:
+            db_conn.execute(_upsert_sql(KEY_FILTER_SQL), key_params * 3)
+
+            # 该持有人-股票已没有交易分单记录时删除快照
+            delete_sql = """
+                DELETE FROM stock.holder_positions
+                WHERE holder_id = %s AND market = %s AND stock_code = %s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM stock.transaction_splits ts
+                      WHERE ts.holder_id = %s AND ts.market = %s AND ts.stock_code = %s
+                  )
+            """
+            db_conn.execute(delete_sql, key_params * 2)
+            return True
+        except Exception as e:
+            logger.error(f"刷新持仓快照失败: holder_id={holder_id}, {market}-{stock_code}, 错误: {str(e)}")
+            return False
+
+    @staticmethod
+    def refresh_many(keys, db_conn=None):
+        """
+        刷新多个持有人-股票的持仓快照
+
+        Args:
+            keys: (holder_id, market, stock_code) 元组的集合
+            db_conn: 数据库连接或Database对象
+
+        Returns:
+            int: 成功刷新的数量
+        """
+        return sum(
+            1 for holder_id, market, stock_code in keys
+            if holder_id and HolderPosition.refresh(holder_id, market, stock_code, db_conn)
+        )
+
+    @staticmethod
+    def get_split_keys(transaction_id, db_conn=None):
+        """获取一笔交易的分单记录涉及的持有人-股票组合"""
+        db_conn = db_conn or db
+        sql = """
+            SELECT DISTINCT holder_id, market, stock_code
+            FROM stock.transaction_splits
+            WHERE original_transaction_id = %s AND holder_id IS NOT NULL
+        """
+        rows = db_conn.fetch_all(sql, [transaction_id]) or []
+        return {(row['holder_id'], row['market'], row['stock_code']) for row in rows}
+
+    @staticmethod
+    def get_stock_keys(market, stock_code, db_conn=None):
+        """获取一只股票的分单记录涉及的持有人-股票组合"""
+        db_conn = db_conn or db
+        sql = """
+            SELECT DISTINCT holder_id, market, stock_code
+            FROM stock.transaction_splits
+            WHERE market = %s AND stock_code = %s AND holder_id IS NOT NULL
+        """
+        rows = db_conn.fetch_all(sql, [market, stock_code]) or []
+        return {(row['holder_id'], row['market'], row['stock_code']) for row in rows}
+
+    @staticmethod
+    def rebuild_all(db_conn=None):
+        """
+        从交易分单记录重建全部持仓快照
+
+        Returns:
+            bool: 是否成功
+        """
+        db_conn = db_conn or db
+        try:
+            db_conn.execute(_upsert_sql(SNAPSHOT_FILTER_SQL))
+            delete_sql = """
+                DELETE hp FROM stock.holder_positions hp
+                LEFT JOIN (
+                    SELECT DISTINCT holder_id, market, stock_code
+                    FROM stock.transaction_splits
+                    WHERE holder_id IS NOT NULL
+                ) ts ON ts.holder_id = hp.holder_id
+                    AND ts.market = hp.market
+                    AND ts.stock_code = hp.stock_code
+                WHERE ts.holder_id IS NULL
+            """
+            db_conn.execute(delete_sql)
+            logger.info("持仓快照重建完成")
+            return True
+        except Exception as e:
+            logger.error(f"重建持仓快照失败: {str(e)}")
+            return False
+
+    @staticmethod
+    def verify(db_conn=None, tolerance=0.01):
+        """
+        校验持仓快照与交易分单记录是否一致
+
+        Args:
+            db_conn: 数据库连接或Database对象
+            tolerance: 数值字段允许的误差
+
+        Returns:
+            list: 不一致的记录，每项包含 key、field、snapshot、expected
+        """
+        db_conn = db_conn or db
+        expected_rows = db_conn.fetch_all(SNAPSHOT_SELECT_SQL.format(filter=SNAPSHOT_FILTER_SQL)) or []
+        snapshot_rows = db_conn.fetch_all("SELECT * FROM stock.holder_positions") or []
+
+        expected = {(r['holder_id'], r['market'], r['stock_code']): r for r in expected_rows}
+        snapshot = {(r['holder_id'], r['market'], r['stock_code']): r for r in snapshot_rows}
+
+        drifts = []
+        for key in expected.keys() | snapshot.keys():
+            if key not in snapshot:
+                drifts.append({'key': key, 'field': None, 'snapshot': None, 'expected': 'missing'})
+                continue
+            if key not in expected:
+                drifts.append({'key': key, 'field': None, 'snapshot': 'orphan', 'expected': None})
+                continue
+            for field in COMPARE_FIELDS:
+                snapshot_value = float(snapshot[key][field] or 0)
+                expected_value = float(expected[key][field] or 0)
+                if abs(snapshot_value - expected_value) > tolerance:
+                    drifts.append({'key': key, 'field': field, 'snapshot': snapshot_value, 'expected': expected_value})
+            if snapshot[key]['last_transaction_date'] != expected[key]['last_transaction_date']:
+                drifts.append({
+                    'key': key,
+                    'field': 'last_transaction_date',
+                    'snapshot': snapshot[key]['last_transaction_date'],
+                    'expected': expected[key]['last_transaction_date']
+                })
+
+        if drifts:
+            logger.warning(f"持仓快照校验发现 {len(drifts)} 处不一致")
+        return drifts
+
+    @staticmethod
+    def find_holdings(scope, holder_id=None, db_conn=None):
+        """
+        按股票汇总用户可见的持仓
+
+        关联持有人的部分读取持仓快照；用户自己的交易分单给其他持有人或未指定持有人的部分
+        只在用户自己的交易范围内从交易分单记录计算，不读取这些持有人的快照。
+
+        Args:
+            scope: VisibilityScope 可见范围
+            holder_id: 只查询该持有人（可选）
+            db_conn: 数据库连接或Database对象，默认使用全局db
+
+        Returns:
+            list: 持仓数量大于0的股票汇总，按最后交易日期降序、市场、代码排序
+        """
+        db_conn = db_conn or db
+        rows = []
+        holder_ids = scope.select_holder_ids(holder_id)
+        if holder_ids:
+            placeholders = ', '.join(['%s'] * len(holder_ids))
+            sql = f"SELECT * FROM stock.holder_positions WHERE holder_id IN ({placeholders})"
+            rows.extend(db_conn.fetch_all(sql, holder_ids) or [])
+
+        # 指定的是关联持有人时，其记录已全部在快照中
+        if holder_id is None or not holder_ids:
+            filter_sql, filter_params = scope.unowned_split_predicate()
+            if holder_id is not None:
+                filter_sql += " AND ts.holder_id = %s"
+                filter_params.append(holder_id)
+            rows.extend(db_conn.fetch_all(SNAPSHOT_SELECT_SQL.format(filter=filter_sql), filter_params * 3) or [])
+
+        holdings = {}
+        for row in rows:
+            key = (row['market'], row['stock_code'])
+            if key not in holdings:
+                holdings[key] = {
+                    'market': row['market'],
+                    'stock_code': row['stock_code'],
+                    'stock_name': row['stock_name'],
+                    'quantity': 0.0,
+                    'total_buy_quantity': 0.0,
+                    'total_sell_quantity': 0.0,
+                    'total_buy_amount': 0.0,
+                    'total_sell_amount': 0.0,
+                    'total_buy_fees': 0.0,
+                    'total_sell_fees': 0.0,
+                    'realized_profit': 0.0,
+                    'avg_cost': 0.0,
+                    'last_transaction_date': None,
+                    '_last_buy': None
+                }
+            holding = holdings[key]
+            for field in ('quantity', 'total_buy_quantity', 'total_sell_quantity', 'total_buy_amount',
+                          'total_sell_amount', 'total_buy_fees', 'total_sell_fees', 'realized_profit'):
+                holding[field] += float(row[field] or 0)
+
+            # 平均成本取所有持有人中最后一次买入的移动加权平均价
+            if row['last_buy_date'] is not None:
+                last_buy = (row['last_buy_date'], row['last_buy_split_id'])
+                if holding['_last_buy'] is None or last_buy > holding['_last_buy']:
+                    holding['_last_buy'] = last_buy
+                    holding['avg_cost'] = float(row['last_buy_avg_cost'] or 0)
+
+            if row['last_transaction_date'] and (
+                holding['last_transaction_date'] is None or row['last_transaction_date'] > holding['last_transaction_date']
+            ):
+                holding['last_transaction_date'] = row['last_transaction_date']
+
+        result = []
+        for holding in holdings.values():
+            holding.pop('_last_buy')
+            if holding['quantity'] > 0:
+                result.append(holding)
+
+        result.sort(key=lambda h: (h['market'], h['stock_code']))
+        result.sort(key=lambda h: h['last_transaction_date'] or date.min, reverse=True)
+        return result
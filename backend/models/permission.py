@@ -3,6 +3,7 @@
 """
 from datetime import datetime
 from config.database import db
+from models.permission_cache import PermissionCache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -42,7 +43,10 @@ class Permission:
                     self.path, self.level, self.sort_order, self.is_menu,
                     self.icon, self.component, self.route_path, self.id
                 )
-                return db.execute(sql, params)
+                result = db.execute(sql, params)
+                # 权限代码可能已变更
+                PermissionCache.bump_version()
+                return result
             else:
                 # 新增
                 sql = """
@@ -133,7 +137,9 @@ class Permission:
             
             # 最后删除权限
             sql = "DELETE FROM stock.permissions WHERE id = %s"
-            return db.execute(sql, (self.id,))
+            result = db.execute(sql, (self.id,))
+            PermissionCache.bump_version()
+            return result
         except Exception as e:
             logger.error(f"删除权限失败: {str(e)}")
             return False
@@ -292,6 +298,7 @@ class RolePermission:
             # 先删除角色的所有权限
             delete_sql = "DELETE FROM role_permissions WHERE role_id = %s"
             db.execute(delete_sql, (role_id,))
+            PermissionCache.bump_version()
             
             # 如果没有权限需要分配，直接返回成功
             if not permission_ids:
@@ -310,7 +317,9 @@ class RolePermission:
                     INSERT INTO role_permissions (role_id, permission_id)
                     VALUES {', '.join(values)}
                 """
-                return db.execute(insert_sql, params)
+                result = db.execute(insert_sql, params)
+                PermissionCache.bump_version()
+                return result
             
             return True
         except Exception as e:
@@ -0,0 +1,80 @@
+"""
+用户权限缓存
+
+按用户缓存权限代码的 frozenset，权限校验只需一次集合查找，不查询数据库。
+角色、权限、角色-权限、用户-角色发生变更时递增全局版本号，
+缓存项的版本号与当前版本不一致时重新查询。
+版本号只在本进程内有效，多进程部署时缓存项最长保留 PERMISSION_CACHE_TTL 秒。
+"""
+import os
+import time
+import threading
+from config.database import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 缓存项最长保留时间（秒）
+PERMISSION_CACHE_TTL = float(os.environ.get('PERMISSION_CACHE_TTL', 60))
+
+class PermissionCache:
+    """用户权限缓存"""
+
+    _lock = threading.Lock()
+    _version = 0
+    _entries = {}
+
+    @staticmethod
+    def bump_version():
+        """角色或权限分配发生变更，使所有缓存项失效"""
+        with PermissionCache._lock:
+            PermissionCache._version += 1
+            PermissionCache._entries.clear()
+
+    @staticmethod
+    def _load_codes(user_id):
+        """查询用户拥有的权限代码"""
+        sql = """
+            SELECT DISTINCT p.code FROM permissions p
+            JOIN role_permissions rp ON p.id = rp.permission_id
+            JOIN user_roles ur ON rp.role_id = ur.role_id
+            WHERE ur.user_id = %s
+        """
+        rows = db.fetch_all(sql, (user_id,)) or []
+        return frozenset(row['code'] for row in rows)
+
+    @staticmethod
+    def get_codes(user_id):
+        """
+        获取用户的权限代码集合
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            frozenset: 权限代码集合
+        """
+        now = time.monotonic()
+        entry = PermissionCache._entries.get(user_id)
+        if entry is not None:
+            version, loaded_at, codes = entry
+            if version == PermissionCache._version and now - loaded_at < PERMISSION_CACHE_TTL:
+                return codes
+
+        version = PermissionCache._version
+        try:
+            codes = PermissionCache._load_codes(user_id)
+        except Exception as e:
+            logger.error(f"获取用户权限失败: {str(e)}")
+            return frozenset()
+
+        with PermissionCache._lock:
+            # 查询期间版本已变更时不写入，避免缓存旧的权限
+            if version == PermissionCache._version:
+                PermissionCache._entries[user_id] = (version, now, codes)
+        return codes
+
+    @staticmethod
+    def has_permission(user_id, permission_code):
+        """检查用户是否有指定权限"""
+        return permission_code in PermissionCache.get_codes(user_id)
@@ -0,0 +1,62 @@
+"""
+历史汇率/股价时间序列模型
+
+price_history 按 (symbol, price_date) 保存每日数值，symbol 为 Google Finance 查询字符串，
+货币对如 'USD-HKD'，股票如 '0700:HKG'。一次抓取的整段历史批量写入。
+"""
+from config.database import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PriceHistory:
+    """历史汇率/股价"""
+
+    @staticmethod
+    def save_points(symbol, points, source='GOOGLE_FINANCE'):
+        """
+        批量写入一个 symbol 的历史数据，已存在的日期覆盖数值
+
+        Args:
+            symbol: 货币对或股票查询字符串
+            points: (date, value) 列表
+            source: 数据来源
+
+        Returns:
+            int: 写入的记录数
+        """
+        if not points:
+            return 0
+        sql = """
+            INSERT INTO stock.price_history (symbol, price_date, value, source, created_at)
+            VALUES (%s, %s, %s, %s, NOW())
+            ON DUPLICATE KEY UPDATE value = VALUES(value), source = VALUES(source)
+        """
+        rows = [(symbol, price_date, value, source) for price_date, value in points]
+        try:
+            with db.get_connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.executemany(sql, rows)
+                connection.commit()
+            logger.info(f"已写入 {symbol} 的 {len(rows)} 条历史数据")
+            return len(rows)
+        except Exception as e:
+            logger.error(f"写入 {symbol} 历史数据失败: {str(e)}")
+            return 0
+
+    @staticmethod
+    def get_series(symbol):
+        """
+        读取一个 symbol 的全部历史数据
+
+        Returns:
+            list: 按日期升序的 (date, value) 列表
+        """
+        sql = """
+            SELECT price_date, value
+            FROM stock.price_history
+            WHERE symbol = %s
+            ORDER BY price_date
+        """
+        rows = db.fetch_all(sql, [symbol]) or []
+        return [(row['price_date'], float(row['value'])) for row in rows]
@@ -3,6 +3,7 @@
 """
 from datetime import datetime
 from config.database import db
+from models.permission_cache import PermissionCache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -58,7 +59,9 @@ class Role:
             
             # 最后删除角色
             sql = "DELETE FROM stock.roles WHERE id = %s"
-            return db.execute(sql, (self.id,))
+            result = db.execute(sql, (self.id,))
+            PermissionCache.bump_version()
+            return result
         except Exception as e:
             logger.error(f"删除角色失败: {str(e)}")
             return False
@@ -2,6 +2,7 @@
 角色权限关联模型
 """
 from config.database import db
+from models.permission_cache import PermissionCache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -104,7 +105,9 @@ class RolePermission:
         """删除角色的所有权限关联"""
         try:
             sql = "DELETE FROM stock.role_permissions WHERE role_id = %s"
-            return db.execute(sql, (role_id,))
+            result = db.execute(sql, (role_id,))
+            PermissionCache.bump_version()
+            return result
         except Exception as e:
             logger.error(f"删除角色权限关联失败: {str(e)}")
             return False
@@ -114,7 +117,9 @@ class RolePermission:
         """删除权限的所有角色关联"""
         try:
             sql = "DELETE FROM stock.role_permissions WHERE permission_id = %s"
-            return db.execute(sql, (permission_id,))
+            result = db.execute(sql, (permission_id,))
+            PermissionCache.bump_version()
+            return result
         except Exception as e:
             logger.error(f"删除权限角色关联失败: {str(e)}")
             return False
@@ -133,7 +138,8 @@ class RolePermission:
                     'permission_id': permission_id
                 })
                 role_permission.save()
-                
+            
+            PermissionCache.bump_version()
             return True
         except Exception as e:
             logger.error(f"为角色分配权限失败: {str(e)}")
@@ -2,6 +2,7 @@
 用户角色关联模型
 """
 from config.database import db
+from models.permission_cache import PermissionCache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -104,7 +105,9 @@ class UserRole:
         """删除用户的所有角色关联"""
         try:
             sql = "DELETE FROM stock.user_roles WHERE user_id = %s"
-            return db.execute(sql, (user_id,))
+            result = db.execute(sql, (user_id,))
+            PermissionCache.bump_version()
+            return result
         except Exception as e:
             logger.error(f"删除用户角色关联失败: {str(e)}")
             return False
@@ -114,7 +117,9 @@ class UserRole:
         """删除角色的所有用户关联"""
         try:
             sql = "DELETE FROM stock.user_roles WHERE role_id = %s"
-            return db.execute(sql, (role_id,))
+            result = db.execute(sql, (role_id,))
+            PermissionCache.bump_version()
+            return result
         except Exception as e:
             logger.error(f"删除角色用户关联失败: {str(e)}")
             return False
@@ -133,7 +138,8 @@ class UserRole:
                     'role_id': role_id
                 })
                 user_role.save()
-                
+            
+            PermissionCache.bump_version()
             return True
         except Exception as e:
             logger.error(f"为用户分配角色失败: {str(e)}")
@@ -0,0 +1,135 @@
+"""
+用户数据可见范围
+
+一个用户可以看到自己录入的交易，以及分单给自己关联的持有人的交易。
+VisibilityScope 查询出用户关联的持有人，同一请求内只计算一次，按用户缓存，
+渲染出可在各个盈利/持仓查询中复用的筛选条件。可见范围是分单记录级别的：
+用户自己的交易分单给其他持有人（或未指定持有人）时，只能看到这些分单记录，
+不能看到该持有人的其他交易。
+只有持有人管理接口（routes/holder.py）中持有人归属的变更会递增版本号使缓存失效：
+新增持有人、删除持有人、修改持有人的所属用户。
+其他变更都不递增版本号，依赖缓存项在 VISIBILITY_SCOPE_TTL（默认60秒）后过期，
+包括其他进程中的上述变更和不经过这些接口修改 holders.user_id。
+"""
+import os
+import time
+import threading
+from flask import g, has_request_context
+from config.database import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 缓存项最长保留时间（秒）
+VISIBILITY_SCOPE_TTL = float(os.environ.get('VISIBILITY_SCOPE_TTL', 60))
+
+class VisibilityScope:
+    """用户可见范围"""
+
+    _lock = threading.Lock()
+    _version = 0
+    _entries = {}
+
+    def __init__(self, user_id, owned_holder_ids):
+        """
+        Args:
+            user_id: 用户ID
+            owned_holder_ids: 关联到该用户的持有人ID
+        """
+        self.user_id = user_id
+        self.owned_holder_ids = tuple(sorted(owned_holder_ids))
+
+    @staticmethod
+    def bump_version():
+        """持有人新增、删除或所属用户变更，使所有缓存项失效"""
+        with VisibilityScope._lock:
+            VisibilityScope._version += 1
+            VisibilityScope._entries.clear()
+
+    @staticmethod
+    def _load(user_id):
+        """查询用户关联的持有人"""
+        rows = db.fetch_all("SELECT id FROM stock.holders WHERE user_id = %s", [user_id]) or []
+        return VisibilityScope(user_id, [row['id'] for row in rows])
+
+    @staticmethod
+    def for_user(user_id):
+        """
+        获取用户的可见范围，同一请求内复用同一个对象
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            VisibilityScope: 可见范围
+        """
+        if has_request_context():
+            scope = g.get('visibility_scope')
+            if scope is not None and scope.user_id == user_id:
+                return scope
+
+        now = time.monotonic()
+        entry = VisibilityScope._entries.get(user_id)
+        if entry is not None and entry[0] == VisibilityScope._version and now - entry[1] < VISIBILITY_SCOPE_TTL:
+            scope = entry[2]
+        else:
+            version = VisibilityScope._version
+            scope = VisibilityScope._load(user_id)
+            with VisibilityScope._lock:
+                # 查询期间版本已变更时不写入
+                if version == VisibilityScope._version:
+                    VisibilityScope._entries[user_id] = (version, now, scope)
+            logger.info(f"用户 {user_id} 关联的持有人IDs: {list(scope.owned_holder_ids)}")
+
+        if has_request_context():
+            g.visibility_scope = scope
+        return scope
+
+    def split_predicate(self, transaction_alias='t', split_alias='ts'):
+        """
+        渲染分单记录的可见条件：用户自己的交易，或分单给用户关联的持有人
+
+        Args:
+            transaction_alias: stock_transactions 的表别名
+            split_alias: transaction_splits 的表别名
+
+        Returns:
+            tuple: (sql, params)
+        """
+        if not self.owned_holder_ids:
+            return f"{transaction_alias}.user_id = %s", [self.user_id]
+        placeholders = ', '.join(['%s'] * len(self.owned_holder_ids))
+        sql = f"({transaction_alias}.user_id = %s OR {split_alias}.holder_id IN ({placeholders}))"
+        return sql, [self.user_id] + list(self.owned_holder_ids)
+
+    def unowned_split_predicate(self, split_alias='ts'):
+        """
+        渲染不属于用户关联持有人的可见分单记录条件：用户自己的交易分单给其他持有人或未指定持有人
+
+        这部分记录不在关联持有人的持仓快照中，需要从交易分单记录计算
+
+        Args:
+            split_alias: transaction_splits 的表别名
+
+        Returns:
+            tuple: (sql, params)
+        """
+        scope_sql, scope_params = self.split_predicate('t', split_alias)
+        sql = (f"EXISTS (SELECT 1 FROM stock.stock_transactions t "
+               f"WHERE t.id = {split_alias}.original_transaction_id AND {scope_sql})")
+        if not self.owned_holder_ids:
+            return sql, scope_params
+        placeholders = ', '.join(['%s'] * len(self.owned_holder_ids))
+        sql += f" AND ({split_alias}.holder_id IS NULL OR {split_alias}.holder_id NOT IN ({placeholders}))"
+        return sql, scope_params + list(self.owned_holder_ids)
+
+    def select_holder_ids(self, holder_id=None):
+        """
+        用户关联的持有人ID，指定 holder_id 时只保留该持有人（需为关联的持有人）
+
+        Returns:
+            list: 持有人ID列表
+        """
+        if holder_id is None:
+            return list(self.owned_holder_ids)
+        return [h for h in self.owned_holder_ids if str(h) == str(holder_id)]
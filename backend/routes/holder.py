@@ -5,8 +5,9 @@ from flask import Blueprint, jsonify, request, current_app
 from datetime import datetime
 import logging
 import pymysql
-from utils.db import get_db_connection
+from utils.db import get_pooled_connection
 from utils.auth import login_required, permission_required
+from models.visibility_scope import VisibilityScope
 
 holder_bp = Blueprint('holder', __name__)
 
@@ -23,7 +24,7 @@ def get_holders():
         holder_type = request.args.get('type', '')
         status = request.args.get('status', '')
         
-        conn = get_db_connection()
+        conn = get_pooled_connection()
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         
         # 构建查询语句
@@ -86,7 +87,7 @@ def get_holder(holder_id):
     获取持有人详情
     """
     try:
-        conn = get_db_connection()
+        conn = get_pooled_connection()
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         
         # 查询持有人
@@ -155,7 +156,7 @@ def add_holder():
                 'message': '持有人姓名不能为空'
             }), 400
         
-        conn = get_db_connection()
+        conn = get_pooled_connection()
         cursor = conn.cursor()
         
         # 检查名称是否已存在
@@ -176,6 +177,7 @@ def add_holder():
         """
         cursor.execute(insert_query, (name, holder_type, user_id if user_id else None, status))
         conn.commit()
+        VisibilityScope.bump_version()
         
         holder_id = cursor.lastrowid
         
@@ -238,19 +240,19 @@ def update_holder(holder_id):
         
         # 尝试获取数据库连接
         current_app.logger.info(f"尝试获取数据库连接...")
-        conn = get_db_connection()
+        conn = get_pooled_connection()
         current_app.logger.info(f"数据库连接获取成功")
         
         cursor = conn.cursor()
         
         # 检查持有人是否存在
         current_app.logger.info(f"检查持有人ID {holder_id} 是否存在")
-        check_query = "SELECT COUNT(*) FROM holders WHERE id = %s"
+        check_query = "SELECT user_id FROM holders WHERE id = %s"
         cursor.execute(check_query, (holder_id,))
-        count = cursor.fetchone()['COUNT(*)']
-        current_app.logger.info(f"持有人存在检查结果: {count}")
+        existing_holder = cursor.fetchone()
+        current_app.logger.info(f"持有人存在检查结果: {existing_holder is not None}")
         
-        if count == 0:
+        if existing_holder is None:
             return jsonify({
                 'success': False,
                 'message': '持有人不存在'
@@ -292,6 +294,9 @@ def update_holder(holder_id):
         
         conn.commit()
         current_app.logger.info(f"事务提交成功")
+        # 只有所属用户变更才会改变用户可见范围
+        if str(existing_holder['user_id'] or '') != str(user_id or ''):
+            VisibilityScope.bump_version()
         
         return jsonify({
             'success': True,
@@ -349,7 +354,7 @@ def delete_holder(holder_id):
         
         # 尝试获取数据库连接
         current_app.logger.info(f"尝试获取数据库连接...")
-        conn = get_db_connection()
+        conn = get_pooled_connection()
         current_app.logger.info(f"数据库连接获取成功")
         
         cursor = conn.cursor()
@@ -397,6 +402,7 @@ def delete_holder(holder_id):
             
             conn.commit()
             current_app.logger.info(f"事务提交成功")
+            VisibilityScope.bump_version()
             
             return jsonify({
                 'success': True,
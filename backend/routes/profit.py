@@ -1,11 +1,18 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, Response, current_app, jsonify, request, session, stream_with_context
 from routes.auth import login_required
 from utils.auth import permission_required
 from config.database import db
 from datetime import datetime
 from models import Stock, StockTransaction
-from utils.exchange_rate import get_exchange_rate
 from services.currency_checker import CurrencyChecker
+from services.price_refresher import PriceRefresher
+from models.holder_position import HolderPosition
+from models.visibility_scope import VisibilityScope
+from models.exchange import ExchangeRate
+from services.profit_aggregator import ProfitAggregator, iter_json, normalize_transaction_type
+from services.parallel_reader import parallel_reader
+from services.rate_table import rate_table
+from utils.db import stream
 import json
 import logging
 
@@ -15,268 +22,179 @@ logger = logging.getLogger(__name__)
 
 def process_transactions(transactions):
     """处理交易数据，生成统计信息"""
-    market_stats = {}
-    stock_stats = {}
-    transaction_details = {}
-    sorted_stock_stats = {}  # 添加这一行，确保变量在使用前初始化
-    
-    # 添加安全检查
-    if not transactions:
-        return market_stats, sorted_stock_stats, transaction_details
-    
-    # 按日期排序交易记录 - 修复：使用sorted函数而不是直接调用sort方法
-    transactions = sorted(transactions, key=lambda x: (x['transaction_date'], x['id']))
-    
-    # 按股票分组处理交易记录
-    stock_groups = {}
-    for transaction in transactions:
-        market = transaction['market']
-        stock_code = transaction['stock_code']
-        stock_key = f"{market}-{stock_code}"
-        
-        # 确保交易类型为大写
-        transaction['transaction_type'] = transaction['transaction_type'].upper() if transaction.get('transaction_type') else 'BUY'
-        
-        if stock_key not in stock_groups:
-            stock_groups[stock_key] = []
-        stock_groups[stock_key].append(transaction)
-        
-        # 初始化市场统计
-        if market not in market_stats:
-            market_stats[market] = {
-                'transaction_count': 0,
-                'total_buy': 0,
-                'total_sell': 0,
-                'total_fees': 0,
-                'realized_profit': 0,
-                'market_value': 0,
-                'holding_profit': 0,
-                'total_profit': 0,
-                'profit_rate': 0,
-                'holding_stats': {
-                    'count': 0,
-                    'total_buy': 0,
-                    'total_sell': 0,
-                    'total_fees': 0,
-                    'realized_profit': 0,
-                    'market_value': 0,
-                    'holding_profit': 0,
-                    'total_profit': 0,
-                    'profit_rate': 0
-                },
-                'closed_stats': {
-                    'count': 0,
-                    'total_buy': 0,
-                    'total_sell': 0,
-                    'total_fees': 0,
-                    'realized_profit': 0,
-                    'profit_rate': 0
-                }
-            }
-    
-    # 处理每个股票的统计数据
-    for stock_key, stock_transactions in stock_groups.items():
-        market = stock_transactions[0]['market']
-        stock_code = stock_transactions[0]['stock_code']
-        stock_name = stock_transactions[0].get('stock_name', stock_code)
-        
-        # 安全地获取current_avg_cost
-        current_avg_cost = stock_transactions[0].get('current_avg_cost')
-        if current_avg_cost is None:
-            current_avg_cost = 0
-        try:
-            current_price = float(current_avg_cost)
-        except (ValueError, TypeError):
-            current_price = 0
-        
-        # 初始化股票统计
-        stock_stats[stock_key] = {
-            'market': market,
-            'stock_code': stock_code,
-            'stock_name': stock_name,
-            'current_quantity': 0,
-            'transaction_count': len(stock_transactions),
-            'total_buy': 0,
-            'total_sell': 0,
-            'total_fees': 0,
-            'realized_profit': 0,
-            'current_price': current_price,
-            'market_value': 0,
-            'holding_profit': 0,
-            'total_profit': 0,
-            'profit_rate': 0,
-            'average_cost': 0,
-            'last_transaction_date': stock_transactions[0]['transaction_date']
-        }
-        
-        # 初始化交易明细
-        transaction_details[stock_key] = []
-        
-        # 计算股票统计数据
-        last_buy_transaction = None
-        for trans in stock_transactions:
-            # 安全地获取数值，确保None值被转换为0
-            total_amount = 0
-            if trans.get('total_amount') is not None:
-                try:
-                    total_amount = float(trans['total_amount'])
-                except (ValueError, TypeError):
-                    total_amount = 0
-            
-            total_quantity = 0
-            if trans.get('total_quantity') is not None:
-                try:
-                    total_quantity = float(trans['total_quantity'])
-                except (ValueError, TypeError):
-                    total_quantity = 0
-            
-            total_fees = 0
-            if trans.get('total_fees') is not None:
-                try:
-                    total_fees = float(trans['total_fees'])
-                except (ValueError, TypeError):
-                    total_fees = 0
-            
-            prev_avg_cost = 0
-            if trans.get('prev_avg_cost') is not None:
-                try:
-                    prev_avg_cost = float(trans['prev_avg_cost'])
-                except (ValueError, TypeError):
-                    prev_avg_cost = 0
-            
-            # 更新统计数据
-            if trans['transaction_type'].upper() == 'BUY':
-                stock_stats[stock_key]['current_quantity'] += total_quantity
-                stock_stats[stock_key]['total_buy'] += total_amount
-                stock_stats[stock_key]['total_fees'] += total_fees
-                market_stats[market]['transaction_count'] += trans.get('transaction_count', 1)
-                market_stats[market]['total_buy'] += total_amount
-                market_stats[market]['total_fees'] += total_fees
-                last_buy_transaction = trans
-            else:  # SELL
-                stock_stats[stock_key]['current_quantity'] -= total_quantity
-                stock_stats[stock_key]['total_sell'] += total_amount
-                stock_stats[stock_key]['total_fees'] += total_fees
-                market_stats[market]['transaction_count'] += trans.get('transaction_count', 1)
-                market_stats[market]['total_sell'] += total_amount
-                market_stats[market]['total_fees'] += total_fees
-                
-                # 计算卖出时的已实现盈亏
-                # 卖出收入 - 买入成本 - 相关费用
-                realized_profit = total_amount - (total_quantity * prev_avg_cost) - total_fees
-                stock_stats[stock_key]['realized_profit'] += realized_profit
-                market_stats[market]['realized_profit'] += realized_profit
-            
-            transaction_details[stock_key].append(trans)
-        
-        # 计算持仓市值和持仓盈亏
-        current_quantity = stock_stats[stock_key]['current_quantity']
-        if current_quantity > 0:
-            # 使用最后一次买入的移动加权平均价格作为平均成本
-            if last_buy_transaction and last_buy_transaction.get('current_avg_cost') is not None:
-                try:
-                    stock_stats[stock_key]['average_cost'] = float(last_buy_transaction['current_avg_cost'])
-                except (ValueError, TypeError):
-                    stock_stats[stock_key]['average_cost'] = 0
-            else:
-                stock_stats[stock_key]['average_cost'] = 0
-            
-            # 计算市值
-            market_value = current_quantity * current_price
-            stock_stats[stock_key]['market_value'] = market_value
-            
-            # 计算持仓盈亏
-            holding_cost = current_quantity * stock_stats[stock_key]['average_cost']
-            stock_stats[stock_key]['holding_profit'] = market_value - holding_cost
-        
-        # 计算总盈亏和盈亏率
-        stock_stats[stock_key]['total_profit'] = (
-            stock_stats[stock_key]['realized_profit'] + 
-            stock_stats[stock_key]['holding_profit']
-        )
-        
-        if stock_stats[stock_key]['total_buy'] > 0:
-            stock_stats[stock_key]['profit_rate'] = (
-                stock_stats[stock_key]['total_profit'] / 
-                stock_stats[stock_key]['total_buy'] * 100
-            )
-        
-        # 更新市场统计
-        market_stats[market]['realized_profit'] += stock_stats[stock_key]['realized_profit']
-        
-        if current_quantity > 0:
-            # 持仓统计
-            market_stats[market]['holding_stats']['count'] += 1
-            market_stats[market]['holding_stats']['total_buy'] += stock_stats[stock_key]['total_buy']
-            market_stats[market]['holding_stats']['total_sell'] += stock_stats[stock_key]['total_sell']
-            market_stats[market]['holding_stats']['total_fees'] += stock_stats[stock_key]['total_fees']
-            market_stats[market]['holding_stats']['realized_profit'] += stock_stats[stock_key]['realized_profit']
-            market_stats[market]['holding_stats']['market_value'] += stock_stats[stock_key]['market_value']
-            market_stats[market]['holding_stats']['holding_profit'] += stock_stats[stock_key]['holding_profit']
-            
-            # 更新市场总计
-            market_stats[market]['market_value'] += stock_stats[stock_key]['market_value']
-            market_stats[market]['holding_profit'] += stock_stats[stock_key]['holding_profit']
-        else:
-            # 已清仓统计
-            market_stats[market]['closed_stats']['count'] += 1
-            market_stats[market]['closed_stats']['total_buy'] += stock_stats[stock_key]['total_buy']
-            market_stats[market]['closed_stats']['total_sell'] += stock_stats[stock_key]['total_sell']
-            market_stats[market]['closed_stats']['total_fees'] += stock_stats[stock_key]['total_fees']
-            market_stats[market]['closed_stats']['realized_profit'] += stock_stats[stock_key]['realized_profit']
-        
-        # 获取每只股票的最后交易日期
-        stock_last_dates = {}
-        for stock_key, transactions in transaction_details.items():
-            if transactions:
-                # 按交易日期降序排序
-                sorted_trans = sorted(transactions, key=lambda x: (x['transaction_date'], x['id']), reverse=True)
-                stock_last_dates[stock_key] = sorted_trans[0]['transaction_date']
-                # 将最后交易日期添加到 stock_stats 中
-                stock_stats[stock_key]['last_transaction_date'] = sorted_trans[0]['transaction_date']
-        
-        # 对stock_stats进行排序
-        sorted_stock_stats = {}
-        for market in market_stats:
-            market_stocks = {k: v for k, v in stock_stats.items() if v['market'] == market}
-            # 按最后交易日期降序排序
-            sorted_stocks = sorted(market_stocks.items(), 
-                                 key=lambda x: stock_last_dates.get(x[0], ''), 
-                                 reverse=True)
-            for stock_key, stock_stat in sorted_stocks:
-                sorted_stock_stats[stock_key] = stock_stat
-
-    # 计算市场级别的汇总数据
-    for market in market_stats:
-        # 计算持仓统计的总盈亏和盈亏率
-        holding_stats = market_stats[market]['holding_stats']
-        holding_stats['total_profit'] = holding_stats['realized_profit'] + holding_stats['holding_profit']
-        if holding_stats['total_buy'] > 0:
-            holding_stats['profit_rate'] = (holding_stats['total_profit'] / holding_stats['total_buy']) * 100
-        
-        # 计算已清仓统计的盈亏率
-        closed_stats = market_stats[market]['closed_stats']
-        if closed_stats['total_buy'] > 0:
-            closed_stats['profit_rate'] = (closed_stats['realized_profit'] / closed_stats['total_buy']) * 100
-        
-        # 计算市场总计的总盈亏和盈亏率
-        market_stats[market]['total_profit'] = (
-            market_stats[market]['realized_profit'] + 
-            market_stats[market]['holding_profit']
+    return ProfitAggregator(to_hkd=rate_table.market_to_hkd).add_all(transactions or []).to_dict()
+
+def iter_stock_groups(rows):
+    """
+    将按 (market, stock_code, transaction_date, id) 排序的交易记录按股票逐组产出
+
+    Yields:
+        tuple: (stock_key, 该股票的交易记录列表)
+    """
+    group_key = None
+    group = []
+    for row in rows:
+        # 与 ProfitAggregator 保留的明细一致
+        normalize_transaction_type(row)
+        stock_key = f"{row['market']}-{row['stock_code']}"
+        if stock_key != group_key and group:
+            yield group_key, group
+            group = []
+        group_key = stock_key
+        group.append(row)
+    if group:
+        yield group_key, group
+
+def summarize_profit_stats(rows):
+    """
+    汇总盈利统计，只保留汇总结果，不保留交易记录
+
+    Args:
+        rows: 交易记录迭代器，顺序不限
+
+    Returns:
+        tuple: (market_stats, stock_stats)
+    """
+    return ProfitAggregator(keep_details=False, to_hkd=rate_table.market_to_hkd).add_all(rows).finish()
+
+# 盈利明细的默认排序：最近交易的股票在前
+DETAIL_ORDER = 'ltd.last_transaction_date DESC, ts.transaction_date DESC, ts.id DESC'
+# 按股票分组排序，可逐只股票输出交易明细
+STOCK_ORDER = 'ts.market, ts.stock_code, ts.transaction_date, ts.id'
+# details=page 时每页的股票数
+PROFIT_DETAILS_PER_PAGE = 20
+
+def build_profit_stats_query(scope, start_date=None, end_date=None, market=None, holder_id=None,
+                             stock_keys=None, order_by=DETAIL_ORDER):
+    """
+    构建盈利统计的交易明细查询
+
+    可见范围条件只在 visible_splits 中计算一次，last_transaction_dates 和明细查询都读取它。
+
+    Args:
+        scope: VisibilityScope
+        start_date: 开始日期
+        end_date: 结束日期
+        market: 市场
+        holder_id: 持有人ID
+        stock_keys: 只查询这些 (market, stock_code)（可选）
+        order_by: 排序方式，DETAIL_ORDER 或按股票分组的 STOCK_ORDER，None 表示不排序
+
+    Returns:
+        tuple: (sql, params)
+    """
+    scope_sql, scope_params = scope.split_predicate()
+
+    conditions = []
+    params = []
+
+    if start_date:
+        conditions.append('ts.transaction_date >= %s')
+        params.append(start_date)
+    if end_date:
+        conditions.append('ts.transaction_date <= %s')
+        params.append(end_date)
+    if market:
+        conditions.append('ts.market = %s')
+        params.append(market)
+    if holder_id:
+        conditions.append('ts.holder_id = %s')
+        params.append(holder_id)
+    if stock_keys:
+        placeholders = ', '.join(['(%s, %s)'] * len(stock_keys))
+        conditions.append(f'(ts.market, ts.stock_code) IN ({placeholders})')
+        params.extend(value for stock_key in stock_keys for value in stock_key)
+
+    where_clause = ' AND '.join(conditions) if conditions else '1 = 1'
+
+    sql = """
+        WITH visible_splits AS (
+            SELECT ts.*
+            FROM stock.transaction_splits ts
+            JOIN stock.stock_transactions t ON ts.original_transaction_id = t.id
+            WHERE """ + scope_sql + """
+        ),
+        last_transaction_dates AS (
+            SELECT 
+                ts.market,
+                ts.stock_code,
+                MAX(ts.transaction_date) as last_transaction_date
+            FROM visible_splits ts
+            GROUP BY ts.market, ts.stock_code
         )
-        if market_stats[market]['total_buy'] > 0:
-            market_stats[market]['profit_rate'] = (
-                market_stats[market]['total_profit'] / 
-                market_stats[market]['total_buy']
-            ) * 100
+        SELECT 
+            ts.id,
+            ts.original_transaction_id,
+            ts.market,
+            ts.stock_code,
+            ts.stock_name,
+            UPPER(ts.transaction_type) as transaction_type,
+            ts.transaction_date,
+            ts.transaction_code,
+            ts.holder_id,
+            ts.holder_name,
+            ts.split_ratio,
+            ts.total_quantity,
+            ts.total_amount,
+            ts.broker_fee,
+            ts.transaction_levy,
+            ts.stamp_duty,
+            ts.trading_fee,
+            ts.deposit_fee,
+            ts.prev_avg_cost,
+            ts.current_avg_cost,
+            ts.prev_quantity,
+            ts.current_quantity,
+            (ts.broker_fee + ts.transaction_levy + ts.stamp_duty + ts.trading_fee + ts.deposit_fee) as total_fees,
+            ts.created_at,
+            ltd.last_transaction_date,
+            1 as transaction_count
+        FROM visible_splits ts
+        LEFT JOIN stock.stocks s ON ts.stock_code = s.code AND ts.market = s.market
+        LEFT JOIN last_transaction_dates ltd ON ts.market = ltd.market AND ts.stock_code = ltd.stock_code
+        WHERE """ + where_clause + """
+    """
+    if order_by:
+        sql += "ORDER BY " + order_by
+    return sql, scope_params + params
 
-    return market_stats, sorted_stock_stats, transaction_details
+def stream_profit_response(summary, detail_groups):
+    """
+    流式输出盈利统计，结构与一次性返回的 JSON 相同：
+    先输出汇总部分，再按股票逐段输出 transaction_details
+
+    Args:
+        summary: 汇总部分（market_stats、stock_stats 等）
+        detail_groups: (stock_key, 交易记录列表) 迭代器，None 表示不输出明细
+    """
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield '{"success": true, "data": '
+        try:
+            yield from iter_json(summary, detail_groups, dumps)
+        except Exception as e:
+            # 响应头已发出，只能中断输出，客户端会得到不完整的 JSON
+            logger.error(f"流式输出盈利明细失败: {str(e)}", exc_info=True)
+            return
+        yield '}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
 
 @profit_bp.route('/')
 @login_required
 @permission_required('profit:stats:view')
 def get_profit_stats():
-    """获取盈利统计数据"""
+    """
+    获取盈利统计数据
+
+    查询参数 details 控制交易明细：
+        all（默认）: 返回全部交易明细
+        none: 只返回 market_stats 和 stock_stats，不输出交易明细
+        page: 按 stock_stats 的顺序分页，只返回第 page 页 per_page 只股票的交易明细
+    stream=1 时先输出汇总部分，再按股票逐段流式输出交易明细。
+    details 不为 all 或 stream=1 时通过服务端游标单次遍历汇总，不在内存中保留全部交易记录。
+    """
     try:
         # 1. 获取查询参数
         user_id = session.get('user_id')
@@ -284,126 +202,86 @@ def get_profit_stats():
         end_date = request.args.get('end_date')
         market = request.args.get('market')
         holder_id = request.args.get('holder_id')
+        details = request.args.get('details', 'all')
+        stream_mode = request.args.get('stream') in ('1', 'true')
         
-        logger.info(f"盈利统计查询参数: user_id={user_id}, start_date={start_date}, end_date={end_date}, market={market}, holder_id={holder_id}")
+        logger.info(f"盈利统计查询参数: user_id={user_id}, start_date={start_date}, end_date={end_date}, market={market}, holder_id={holder_id}, details={details}, stream={stream_mode}")
 
-        # 获取用户关联的持有人ID
-        holder_sql = "SELECT id FROM stock.holders WHERE user_id = %s"
-        user_holders = db.fetch_all(holder_sql, [user_id])
-        user_holder_ids = [h['id'] for h in user_holders]
-        
-        logger.info(f"用户 {user_id} 关联的持有人IDs: {user_holder_ids}")
-
-        # 2. 构建查询条件
-        conditions = []
-        params = []
-
-        # 修改用户ID条件，允许查看与用户关联的分单
-        if user_holder_ids:
-            holder_placeholders = ', '.join(['%s'] * len(user_holder_ids))
-            conditions.append(f'(t.user_id = %s OR ts.holder_id IN ({holder_placeholders}))')
-            params.append(user_id)
-            params.extend(user_holder_ids)
-        else:
-            conditions.append('t.user_id = %s')
-            params.append(user_id)
-
-        if start_date:
-            conditions.append('ts.transaction_date >= %s')
-            params.append(start_date)
-        if end_date:
-            conditions.append('ts.transaction_date <= %s')
-            params.append(end_date)
-        if market:
-            conditions.append('ts.market = %s')
-            params.append(market)
+        if details not in ('all', 'none', 'page'):
+            return jsonify({
+                'success': False,
+                'message': 'details 参数必须为 all、none 或 page'
+            }), 400
+
+        # 可见范围在同一请求内只计算一次
+        scope = VisibilityScope.for_user(user_id)
         if holder_id:
-            conditions.append('ts.holder_id = %s')
-            params.append(holder_id)
             logger.info(f"按持有人筛选: holder_id={holder_id}")
+        filters = (scope, start_date, end_date, market, holder_id)
 
-        where_clause = ' AND '.join(conditions)
-
-        # 3. 获取交易明细数据
-        cte_sql = """
-            WITH last_transaction_dates AS (
-                SELECT 
-                    ts.market COLLATE utf8mb4_unicode_ci as market,
-                    ts.stock_code COLLATE utf8mb4_unicode_ci as stock_code,
-                    MAX(ts.transaction_date) as last_transaction_date
-                FROM stock.transaction_splits ts
-                JOIN stock.stock_transactions t ON ts.original_transaction_id = t.id
-                WHERE """
-        
-        if user_holder_ids:
-            holder_placeholders = ', '.join(['%s'] * len(user_holder_ids))
-            cte_sql += f"(t.user_id = %s OR ts.holder_id IN ({holder_placeholders}))"
-            all_params_for_cte = [user_id] + user_holder_ids
-        else:
-            cte_sql += "t.user_id = %s"
-            all_params_for_cte = [user_id]
-            
-        cte_sql += """
-                GROUP BY ts.market, ts.stock_code
-            )
-        """
-        
-        main_sql = """
-            SELECT 
-                ts.id,
-                ts.original_transaction_id,
-                ts.market,
-                ts.stock_code,
-                ts.stock_name,
-                UPPER(ts.transaction_type) as transaction_type,
-                ts.transaction_date,
-                ts.transaction_code,
-                ts.holder_id,
-                ts.holder_name,
-                ts.split_ratio,
-                ts.total_quantity,
-                ts.total_amount,
-                ts.broker_fee,
-                ts.transaction_levy,
-                ts.stamp_duty,
-                ts.trading_fee,
-                ts.deposit_fee,
-                ts.prev_avg_cost,
-                ts.current_avg_cost,
-                ts.prev_quantity,
-                ts.current_quantity,
-                (ts.broker_fee + ts.transaction_levy + ts.stamp_duty + ts.trading_fee + ts.deposit_fee) as total_fees,
-                ts.created_at,
-                ltd.last_transaction_date,
-                1 as transaction_count
-            FROM stock.transaction_splits ts
-            JOIN stock.stock_transactions t ON ts.original_transaction_id = t.id
-            LEFT JOIN stock.stocks s ON ts.stock_code COLLATE utf8mb4_unicode_ci = s.code AND ts.market COLLATE utf8mb4_unicode_ci = s.market
-            LEFT JOIN last_transaction_dates ltd ON ts.market COLLATE utf8mb4_unicode_ci = ltd.market AND ts.stock_code COLLATE utf8mb4_unicode_ci = ltd.stock_code
-            WHERE """ + where_clause + """
-            ORDER BY ltd.last_transaction_date DESC, ts.transaction_date DESC, ts.id DESC
-        """
-        
-        sql = cte_sql + main_sql
+        if details == 'all' and not stream_mode:
+            # 2-3. 构建查询条件并获取交易明细数据
+            sql, all_params = build_profit_stats_query(*filters)
+            logger.info(f"执行SQL: {sql}")
+            logger.info(f"参数: {all_params}")
+            transactions = db.fetch_all(sql, all_params)
+            logger.info(f"查询到 {len(transactions)} 条交易记录")
+
+            # 4. 处理交易数据
+            market_stats, stock_stats, transaction_details = process_transactions(transactions)
 
-        # 在参数列表开头添加CTE的参数
-        all_params = all_params_for_cte + params
-        logger.info(f"执行SQL: {sql}")
-        logger.info(f"参数: {all_params}")
-        transactions = db.fetch_all(sql, all_params)
-        logger.info(f"查询到 {len(transactions)} 条交易记录")
+            # 5. 返回结果
+            return jsonify({
+                'success': True,
+                'data': {
+                    'market_stats': market_stats,
+                    'stock_stats': stock_stats,
+                    'transaction_details': transaction_details
+                }
+            })
+
+        # 单次遍历汇总，不保留交易记录
+        sql, all_params = build_profit_stats_query(*filters, order_by=None)
+        market_stats, stock_stats = summarize_profit_stats(stream(sql, all_params, db_conn=db))
+        summary = {
+            'market_stats': market_stats,
+            'stock_stats': stock_stats
+        }
+
+        # 选择需要输出明细的股票
+        stock_keys = None
+        if details == 'all':
+            stock_keys = [(stat['market'], stat['stock_code']) for stat in stock_stats.values()]
+        elif details == 'page':
+            page = max(request.args.get('page', 1, type=int), 1)
+            per_page = max(request.args.get('per_page', PROFIT_DETAILS_PER_PAGE, type=int), 1)
+            page_stats = list(stock_stats.values())[(page - 1) * per_page:page * per_page]
+            stock_keys = [(stat['market'], stat['stock_code']) for stat in page_stats]
+            summary['details_page'] = {
+                'page': page,
+                'per_page': per_page,
+                'total': len(stock_stats),
+                'pages': (len(stock_stats) + per_page - 1) // per_page
+            }
 
-        # 4. 处理交易数据
-        market_stats, stock_stats, transaction_details = process_transactions(transactions)
+        detail_groups = None
+        if stock_keys is not None:
+            detail_groups = iter([])
+            if stock_keys:
+                # details=all 时不需要按股票筛选
+                sql, all_params = build_profit_stats_query(
+                    *filters, stock_keys=stock_keys if details == 'page' else None, order_by=STOCK_ORDER
+                )
+                detail_groups = iter_stock_groups(stream(sql, all_params, db_conn=db))
 
-        # 5. 返回结果
+        if stream_mode:
+            return stream_profit_response(summary, detail_groups)
+
+        if detail_groups is not None:
+            summary['transaction_details'] = dict(detail_groups)
         return jsonify({
             'success': True,
-            'data': {
-                'market_stats': market_stats,
-                'stock_stats': stock_stats,
-                'transaction_details': transaction_details
-            }
+            'data': summary
         })
     except Exception as e:
         logger.error(f"获取盈利统计失败: {str(e)}")
@@ -412,6 +290,23 @@ def get_profit_stats():
             'message': f'获取盈利统计失败: {str(e)}'
         }), 500
 
+def format_holding_stock(stock):
+    """将持仓快照汇总转换为持仓股票列表的返回格式"""
+    return {
+        'market': stock['market'],
+        'stock_code': stock['stock_code'],
+        'stock_name': stock['stock_name'],
+        'holding_quantity': stock['quantity'],
+        'total_buy_quantity': stock['total_buy_quantity'],
+        'total_sell_quantity': stock['total_sell_quantity'],
+        'total_buy_amount': stock['total_buy_amount'],
+        'total_sell_amount': stock['total_sell_amount'],
+        'total_buy_fees': stock['total_buy_fees'],
+        'total_sell_fees': stock['total_sell_fees'],
+        'avg_cost': stock['avg_cost'],
+        'last_transaction_date': stock['last_transaction_date'].strftime('%Y-%m-%d') if stock['last_transaction_date'] else None
+    }
+
 @profit_bp.route('/holding_stocks')
 @login_required
 @permission_required('profit:stats:view')
@@ -422,129 +317,13 @@ def get_holding_stocks_api():
         user_id = session.get('user_id')
         holder_id = request.args.get('holder_id')
         
-        # 获取用户关联的持有人ID
-        holder_sql = "SELECT id FROM stock.holders WHERE user_id = %s"
-        user_holders = db.fetch_all(holder_sql, [user_id])
-        user_holder_ids = [h['id'] for h in user_holders]
-        
-        logger.info(f"用户 {user_id} 关联的持有人IDs: {user_holder_ids}")
-        
-        # 构建SQL查询
-        cte_sql = """
-        WITH last_transaction_dates AS (
-            SELECT 
-                ts.market COLLATE utf8mb4_unicode_ci as market,
-                ts.stock_code COLLATE utf8mb4_unicode_ci as stock_code,
-                MAX(ts.transaction_date) as last_transaction_date
-            FROM stock.transaction_splits ts
-            JOIN stock.stock_transactions t ON ts.original_transaction_id = t.id
-            WHERE """
-            
-        if user_holder_ids:
-            holder_placeholders = ', '.join(['%s'] * len(user_holder_ids))
-            cte_sql += f"(t.user_id = %s OR ts.holder_id IN ({holder_placeholders}))"
-            cte_params = [user_id] + user_holder_ids
-        else:
-            cte_sql += "t.user_id = %s"
-            cte_params = [user_id]
-            
-        cte_sql += """
-            GROUP BY ts.market, ts.stock_code
-        )
-        """
-        
-        avg_cost_sql = """
-        (
-            SELECT ts_last.current_avg_cost
-            FROM stock.transaction_splits ts_last
-            JOIN stock.stock_transactions t_last ON ts_last.original_transaction_id = t_last.id
-            WHERE """
-                
-        if user_holder_ids:
-            holder_placeholders = ', '.join(['%s'] * len(user_holder_ids))
-            avg_cost_sql += f"(t_last.user_id = %s OR ts_last.holder_id IN ({holder_placeholders}))"
-            avg_cost_params = [user_id] + user_holder_ids
-        else:
-            avg_cost_sql += "t_last.user_id = %s"
-            avg_cost_params = [user_id]
-            
-        avg_cost_sql += """
-              AND ts_last.market COLLATE utf8mb4_unicode_ci = s.market COLLATE utf8mb4_unicode_ci
-              AND ts_last.stock_code COLLATE utf8mb4_unicode_ci = s.code COLLATE utf8mb4_unicode_ci
-              AND UPPER(ts_last.transaction_type) = 'BUY'
-            ORDER BY ts_last.transaction_date DESC, ts_last.id DESC
-            LIMIT 1
-        ) as avg_cost
-        """
-        
-        main_sql = """
-        SELECT 
-            ts.market,
-            ts.stock_code,
-            ts.stock_name,
-            SUM(CASE WHEN UPPER(ts.transaction_type) = 'BUY' THEN ts.total_quantity ELSE -ts.total_quantity END) as holding_quantity,
-            SUM(CASE WHEN UPPER(ts.transaction_type) = 'BUY' THEN ts.total_quantity ELSE 0 END) as total_buy_quantity,
-            SUM(CASE WHEN UPPER(ts.transaction_type) = 'SELL' THEN ts.total_quantity ELSE 0 END) as total_sell_quantity,
-            SUM(CASE WHEN UPPER(ts.transaction_type) = 'BUY' THEN ts.total_amount ELSE 0 END) as total_buy_amount,
-            SUM(CASE WHEN UPPER(ts.transaction_type) = 'SELL' THEN ts.total_amount ELSE 0 END) as total_sell_amount,
-            SUM(CASE WHEN UPPER(ts.transaction_type) = 'BUY' THEN ts.broker_fee + ts.transaction_levy + ts.stamp_duty + ts.trading_fee + ts.deposit_fee ELSE 0 END) as total_buy_fees,
-            SUM(CASE WHEN UPPER(ts.transaction_type) = 'SELL' THEN ts.broker_fee + ts.transaction_levy + ts.stamp_duty + ts.trading_fee + ts.deposit_fee ELSE 0 END) as total_sell_fees,
-        """ + avg_cost_sql + """,
-            MAX(ltd.last_transaction_date) as last_transaction_date
-        FROM stock.transaction_splits ts
-        JOIN stock.stock_transactions t ON ts.original_transaction_id = t.id
-        LEFT JOIN last_transaction_dates ltd ON ts.market COLLATE utf8mb4_unicode_ci = ltd.market AND ts.stock_code COLLATE utf8mb4_unicode_ci = ltd.stock_code
-        WHERE """
-        
-        if user_holder_ids:
-            holder_placeholders = ', '.join(['%s'] * len(user_holder_ids))
-            main_sql += f"(t.user_id = %s OR ts.holder_id IN ({holder_placeholders}))"
-            where_params = [user_id] + user_holder_ids
-        else:
-            main_sql += "t.user_id = %s"
-            where_params = [user_id]
-        
-        # 合并所有参数
-        params = cte_params + avg_cost_params + where_params
-        
-        if holder_id:
-            main_sql += " AND ts.holder_id = %s"
-            params.append(holder_id)
-            
-        main_sql += """
-        GROUP BY ts.market, ts.stock_code, ts.stock_name
-        HAVING SUM(CASE WHEN UPPER(ts.transaction_type) = 'BUY' THEN ts.total_quantity ELSE -ts.total_quantity END) > 0
-        ORDER BY last_transaction_date DESC, ts.market, ts.stock_code
-        """
-        
-        sql = cte_sql + main_sql
-        
-        logger.info(f"执行SQL: {sql}")
-        logger.info(f"参数: {params}")
-        stocks = db.fetch_all(sql, params)
+        # 关联持有人从持仓快照读取，不再聚合交易分单记录的完整历史
+        stocks = HolderPosition.find_holdings(VisibilityScope.for_user(user_id), holder_id)
         logger.info(f"查询到 {len(stocks)} 条持仓记录")
         
-        # 处理结果
-        result = []
-        for stock in stocks:
-            result.append({
-                'market': stock['market'],
-                'stock_code': stock['stock_code'],
-                'stock_name': stock['stock_name'],
-                'holding_quantity': float(stock['holding_quantity']),
-                'total_buy_quantity': float(stock['total_buy_quantity']),
-                'total_sell_quantity': float(stock['total_sell_quantity']),
-                'total_buy_amount': float(stock['total_buy_amount']),
-                'total_sell_amount': float(stock['total_sell_amount']),
-                'total_buy_fees': float(stock['total_buy_fees']),
-                'total_sell_fees': float(stock['total_sell_fees']),
-                'avg_cost': float(stock['avg_cost']) if stock['avg_cost'] else 0,
-                'last_transaction_date': stock['last_transaction_date'].strftime('%Y-%m-%d') if stock['last_transaction_date'] else None
-            })
-        
         return jsonify({
             'success': True,
-            'data': result
+            'data': [format_holding_stock(stock) for stock in stocks]
         })
     except Exception as e:
         logger.error(f"获取持仓股票列表失败: {str(e)}")
@@ -553,6 +332,52 @@ def get_holding_stocks_api():
             'message': f'获取持仓股票列表失败: {str(e)}'
         }), 500
 
+@profit_bp.route('/dashboard')
+@login_required
+@permission_required('profit:stats:view')
+def get_profit_dashboard():
+    """
+    获取盈利看板数据
+
+    一次返回盈利汇总（不含交易明细）、持仓股票列表和第一页汇率，与分别调用
+    /api/profit/?details=none、/api/profit/holding_stocks、/api/stock/exchange_rates 的结果相同。
+    三个查询互不依赖，通过 parallel_reader 在各自的连接上并发执行，耗时取决于最慢的一个。
+    """
+    try:
+        user_id = session.get('user_id')
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        market = request.args.get('market')
+        holder_id = request.args.get('holder_id')
+        rates_per_page = max(request.args.get('rates_per_page', 15, type=int), 1)
+
+        # 可见范围依赖请求上下文，在并发查询之前计算
+        scope = VisibilityScope.for_user(user_id)
+        sql, all_params = build_profit_stats_query(scope, start_date, end_date, market, holder_id, order_by=None)
+
+        results = parallel_reader.run(
+            profit=lambda db_conn: summarize_profit_stats(stream(sql, all_params, db_conn=db_conn)),
+            holding_stocks=lambda db_conn: HolderPosition.find_holdings(scope, holder_id, db_conn=db_conn),
+            exchange_rates=lambda db_conn: ExchangeRate.find_page(page=1, per_page=rates_per_page, db_conn=db_conn)
+        )
+
+        market_stats, stock_stats = results['profit']
+        return jsonify({
+            'success': True,
+            'data': {
+                'market_stats': market_stats,
+                'stock_stats': stock_stats,
+                'holding_stocks': [format_holding_stock(stock) for stock in results['holding_stocks']],
+                'exchange_rates': results['exchange_rates']
+            }
+        })
+    except Exception as e:
+        logger.error(f"获取盈利看板数据失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取盈利看板数据失败: {str(e)}'
+        }), 500
+
 @profit_bp.route('/refresh_prices', methods=['POST'])
 @login_required
 @permission_required('profit:stats:view')
@@ -564,90 +389,37 @@ def refresh_stock_prices():
         user_id = session.get('user_id')
         holder_id = request.args.get('holder_id')
         
-        # 获取用户关联的持有人ID
-        holder_sql = "SELECT id FROM stock.holders WHERE user_id = %s"
-        user_holders = db.fetch_all(holder_sql, [user_id])
-        user_holder_ids = [h['id'] for h in user_holders]
-        
-        logger.info(f"用户 {user_id} 关联的持有人IDs: {user_holder_ids}")
-        
-        # 获取持仓股票列表
-        avg_cost_sql = """
-                (
-                    SELECT ts_last.current_avg_cost
-                    FROM stock.transaction_splits ts_last
-                    JOIN stock.stock_transactions t_last ON ts_last.original_transaction_id = t_last.id
-                    WHERE """
-                    
-        if user_holder_ids:
-            holder_placeholders = ', '.join(['%s'] * len(user_holder_ids))
-            avg_cost_sql += f"(t_last.user_id = %s OR ts_last.holder_id IN ({holder_placeholders}))"
-            avg_cost_params = [user_id] + user_holder_ids
-        else:
-            avg_cost_sql += "t_last.user_id = %s"
-            avg_cost_params = [user_id]
-            
-        avg_cost_sql += """
-                      AND ts_last.market COLLATE utf8mb4_unicode_ci = s.market COLLATE utf8mb4_unicode_ci
-                      AND ts_last.stock_code COLLATE utf8mb4_unicode_ci = s.code COLLATE utf8mb4_unicode_ci
-                      AND UPPER(ts_last.transaction_type) = 'BUY'
-                    ORDER BY ts_last.transaction_date DESC, ts_last.id DESC
-                    LIMIT 1
-                ) as last_buy_avg_cost
-        """
-        
-        main_sql = """
-            SELECT 
-                s.market,
-                s.code,
-                s.code_name as stock_name,
-                s.google_name,
-                SUM(CASE 
-                    WHEN UPPER(ts.transaction_type) = 'BUY' THEN ts.total_quantity 
-                    WHEN UPPER(ts.transaction_type) = 'SELL' THEN -ts.total_quantity 
-                    ELSE 0 
-                END) as quantity,
-                SUM(CASE WHEN UPPER(ts.transaction_type) = 'BUY' THEN ts.total_amount ELSE 0 END) as total_buy,
-                SUM(CASE WHEN UPPER(ts.transaction_type) = 'SELL' THEN ts.total_amount ELSE 0 END) as total_sell,
-                SUM(ts.broker_fee + ts.transaction_levy + ts.stamp_duty + ts.trading_fee + ts.deposit_fee) as total_fees,
-        """ + avg_cost_sql + """
-            FROM stock.transaction_splits ts
-            JOIN stock.stock_transactions t ON ts.original_transaction_id = t.id
-            JOIN stock.stocks s ON ts.stock_code COLLATE utf8mb4_unicode_ci = s.code AND ts.market COLLATE utf8mb4_unicode_ci = s.market
-            WHERE """
-            
-        if user_holder_ids:
-            holder_placeholders = ', '.join(['%s'] * len(user_holder_ids))
-            main_sql += f"(t.user_id = %s OR ts.holder_id IN ({holder_placeholders}))"
-            where_params = [user_id] + user_holder_ids
-        else:
-            main_sql += "t.user_id = %s"
-            where_params = [user_id]
-        
-        # 合并所有参数
-        params = avg_cost_params + where_params
-        
-        if holder_id:
-            main_sql += " AND ts.holder_id = %s"
-            params.append(holder_id)
-        
-        main_sql += """
-            GROUP BY s.market, s.code, s.code_name, s.google_name
-            HAVING SUM(CASE 
-                WHEN UPPER(ts.transaction_type) = 'BUY' THEN ts.total_quantity 
-                WHEN UPPER(ts.transaction_type) = 'SELL' THEN -ts.total_quantity 
-                ELSE 0 
-            END) > 0
-        """
-        
-        sql = main_sql
-        
-        logger.info(f"查询用户 {user_id} 的持仓股票")
-        logger.debug(f"执行SQL: {sql}")
-        logger.debug(f"参数: {params}")
+        # 从持仓快照读取持仓股票，再补充股票基础信息中的名称
+        scope = VisibilityScope.for_user(user_id)
         
         try:
-            stocks = db.fetch_all(sql, params)
+            holdings = HolderPosition.find_holdings(scope, holder_id)
+            stocks = []
+            if holdings:
+                conditions = ' OR '.join(['(market = %s AND code = %s)'] * len(holdings))
+                stock_params = [value for holding in holdings for value in (holding['market'], holding['stock_code'])]
+                stock_rows = db.fetch_all(
+                    f"SELECT market, code, code_name, google_name FROM stock.stocks WHERE {conditions}",
+                    stock_params
+                ) or []
+                stock_info = {(row['market'], row['code']): row for row in stock_rows}
+                
+                for holding in holdings:
+                    info = stock_info.get((holding['market'], holding['stock_code']))
+                    if not info:
+                        continue
+                    stocks.append({
+                        'market': info['market'],
+                        'code': info['code'],
+                        'stock_name': info['code_name'],
+                        'google_name': info['google_name'],
+                        'quantity': holding['quantity'],
+                        'total_buy': holding['total_buy_amount'],
+                        'total_sell': holding['total_sell_amount'],
+                        'total_fees': holding['total_buy_fees'] + holding['total_sell_fees'],
+                        'last_buy_avg_cost': holding['avg_cost'],
+                        'realized_profit': holding['realized_profit']
+                    })
             logger.info(f"查询到 {len(stocks)} 条持仓记录")
         except Exception as db_error:
             logger.error(f"查询持仓股票失败: {str(db_error)}")
@@ -668,6 +440,21 @@ def refresh_stock_prices():
                 }
             })
         
+        # 确定每只股票的查询字符串
+        for stock in stocks:
+            query = stock['google_name']
+            if not query:
+                logger.warning(f"股票 {stock['market']}-{stock['code']} 缺少Google名称，无法查询价格")
+                # 尝试构建一个默认的查询字符串
+                market_code = 'HKG' if stock['market'] == 'HK' else stock['market']
+                query = f"{stock['code']}:{market_code}"
+                logger.info(f"使用默认查询字符串: {query}")
+            stock['query'] = query
+        
+        # 并发查询所有股价，截止时间到达时只使用已完成的结果
+        refresh_result = PriceRefresher().fetch_prices([stock['query'] for stock in stocks])
+        prices = refresh_result['prices']
+        
         results = []
         success_count = 0
         failed_count = 0
@@ -684,22 +471,8 @@ def refresh_stock_prices():
                 logger.info(f"处理股票: {stock['market']}-{stock['code']} ({stock['stock_name']})")
                 logger.info(f"持仓数量: {quantity}, 买入总额: {total_buy}, 卖出总额: {total_sell}, 总费用: {total_fees}")
                 
-                # 获取当前股价
-                query = stock['google_name']
-                if not query:
-                    logger.warning(f"股票 {stock['market']}-{stock['code']} 缺少Google名称，无法查询价格")
-                    # 尝试构建一个默认的查询字符串
-                    market_code = 'HKG' if stock['market'] == 'HK' else stock['market']
-                    query = f"{stock['code']}:{market_code}"
-                    logger.info(f"使用默认查询字符串: {query}")
-                
-                logger.info(f"查询股价: {query}")
-                try:
-                    price_result = checker.get_stock_price(query)
-                    logger.info(f"获取到的股价: {price_result}")
-                except Exception as price_error:
-                    logger.error(f"获取股价异常: {str(price_error)}")
-                    price_result = None
+                price_result = prices.get(stock['query'])
+                logger.info(f"获取到的股价: {stock['query']} = {price_result}")
                 
                 if price_result is not None:
                     try:
@@ -716,36 +489,9 @@ def refresh_stock_prices():
                         holding_profit = (current_price - avg_cost) * quantity
                         logger.info(f"持仓盈亏: {holding_profit}")
                         
-                        # 获取已实现盈亏
-                        realized_profit_sql = """
-                            SELECT 
-                                SUM(
-                                    CASE 
-                                        WHEN UPPER(ts.transaction_type) = 'SELL' THEN 
-                                            ts.total_amount - (ts.total_quantity * ts.prev_avg_cost) - 
-                                            (ts.broker_fee + ts.transaction_levy + ts.stamp_duty + ts.trading_fee + ts.deposit_fee)
-                                        ELSE 0 
-                                    END
-                                ) as total_realized_profit
-                            FROM stock.transaction_splits ts
-                            JOIN stock.stock_transactions t ON ts.original_transaction_id = t.id
-                            WHERE t.user_id = %s 
-                              AND ts.stock_code COLLATE utf8mb4_unicode_ci = %s COLLATE utf8mb4_unicode_ci 
-                              AND ts.market COLLATE utf8mb4_unicode_ci = %s COLLATE utf8mb4_unicode_ci
-                        """
-                        
-                        realized_params = [user_id, stock['code'], stock['market']]
-                        if holder_id:
-                            realized_profit_sql += " AND ts.holder_id = %s"
-                            realized_params.append(holder_id)
-                        
-                        try:
-                            realized_profit_record = db.fetch_one(realized_profit_sql, realized_params)
-                            realized_profit = float(realized_profit_record['total_realized_profit'] or 0) if realized_profit_record else 0
-                            logger.info(f"已实现盈亏: {realized_profit}")
-                        except Exception as rp_error:
-                            logger.error(f"获取已实现盈亏失败: {str(rp_error)}")
-                            realized_profit = 0
+                        # 已实现盈亏取自持仓快照
+                        realized_profit = float(stock['realized_profit'] or 0)
+                        logger.info(f"已实现盈亏: {realized_profit}")
                         
                         # 计算总盈亏
                         total_profit = holding_profit + realized_profit
@@ -790,7 +536,8 @@ def refresh_stock_prices():
             'data': {
                 'items': results,
                 'success_count': success_count,
-                'failed_count': failed_count
+                'failed_count': failed_count,
+                'timed_out': refresh_result['timed_out']
             }
         })
     except Exception as e:
@@ -3,6 +3,7 @@
 """
 from flask import Blueprint, request, jsonify
 from models import Role, Permission, RolePermission
+from models.permission_cache import PermissionCache
 from utils.auth import login_required, permission_required
 from config.database import db
 import logging
@@ -258,6 +259,7 @@ def delete_role(role_id):
                 'success': False,
                 'message': '删除角色失败'
             }), 500
+        PermissionCache.bump_version()
             
         return jsonify({
             'success': True,
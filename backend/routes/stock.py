@@ -3,8 +3,11 @@ from routes.auth import login_required
 from config.database import db
 from datetime import datetime
 from services.currency_checker import CurrencyChecker
+from services.price_refresher import PriceRefresher
+from services.rate_table import rate_table
 from models import Stock, StockTransaction
 from models.exchange import ExchangeRate
+from models.holder_position import HolderPosition
 import logging
 import json
 from sqlalchemy import text
@@ -30,6 +33,9 @@ def get_transactions():
         transaction_code = request.args.get('transaction_code')
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
+        # 传入 cursor（第一页为空字符串）时使用游标分页
+        cursor = request.args.get('cursor')
+        with_total = request.args.get('with_total', '1') != '0'
         
         # 构建过滤条件
         filters = {
@@ -41,7 +47,15 @@ def get_transactions():
         }
         
         # 使用TransactionQuery服务获取交易记录
-        result = TransactionQuery.get_transactions(user_id, filters, page, per_page)
+        try:
+            result = TransactionQuery.get_transactions(
+                user_id, filters, page, per_page, cursor=cursor, with_total=with_total
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
         
         return jsonify({
             'success': True,
@@ -487,6 +501,9 @@ def edit_stock(id):
         if stock.save():
             # 同步更新transaction_splits表中的股票信息
             try:
+                # 改代码前涉及的持有人，改代码后删除旧代码的持仓快照并生成新代码的持仓快照
+                holder_ids = {holder_id for holder_id, _, _ in HolderPosition.get_stock_keys(old_market, old_code)}
+                
                 update_splits_sql = """
                     UPDATE transaction_splits
                     SET stock_code = %s,
@@ -518,6 +535,12 @@ def edit_stock(id):
                     old_market
                 ))
                 
+                position_keys = {(holder_id, old_market, old_code) for holder_id in holder_ids}
+                position_keys |= {(holder_id, stock.market, stock.code) for holder_id in holder_ids}
+                refreshed = HolderPosition.refresh_many(position_keys)
+                if refreshed < len(position_keys):
+                    logger.error(f"刷新持仓快照失败: {len(position_keys) - refreshed}/{len(position_keys)} 个")
+                
                 logger.info(f"股票信息同步更新成功: 从 {old_code}/{old_market} 到 {stock.code}/{stock.market}")
             except Exception as e:
                 logger.error(f"更新交易分单记录的股票信息失败: {str(e)}")
@@ -584,18 +607,23 @@ def update_stock_prices():
         sql = "SELECT code, market FROM stocks"
         stocks = db.fetch_all(sql)
         
+        for stock in stocks:
+            market_code = 'HKG' if stock['market'] == 'HK' else stock['market']
+            stock['query'] = f"{stock['code']}:{market_code}"
+        
+        # 并发查询所有股价，截止时间到达时只更新已完成的结果
+        refresh_result = PriceRefresher().fetch_prices([stock['query'] for stock in stocks])
+        prices = refresh_result['prices']
+        
         updated_count = 0
         failed_count = 0
         
         for stock in stocks:
-            try:
-                market_code = 'HKG' if stock['market'] == 'HK' else stock['market']
-                query = f"{stock['code']}:{market_code}"
-                price_result = checker.get_exchange_rate(query)
-                stock['current_price'] = float(price_result) if price_result is not None else 0
-            except Exception as e:
-                logger.error(f"获取股票 {query} 价格失败: {str(e)}")
-                stock['current_price'] = 0
+            price_result = prices.get(stock['query'])
+            if price_result is None:
+                failed_count += 1
+                logger.error(f"获取股票 {stock['query']} 价格失败")
+                continue
                 
             try:
                 # 更新股票价格
@@ -605,7 +633,7 @@ def update_stock_prices():
                         price_updated_at = NOW() 
                     WHERE code = %s AND market = %s
                 """
-                if db.execute(update_sql, (stock['current_price'], stock['code'], stock['market'])):
+                if db.execute(update_sql, (float(price_result), stock['code'], stock['market'])):
                     updated_count += 1
             except Exception as e:
                 failed_count += 1
@@ -615,7 +643,8 @@ def update_stock_prices():
             'success': True,
             'data': {
                 'updated': updated_count,
-                'failed': failed_count
+                'failed': failed_count,
+                'timed_out': refresh_result['timed_out']
             }
         })
         
@@ -686,6 +715,15 @@ def check_stock_price():
             'message': '检查股票价格失败'
         }), 500
 
+@stock_bp.route('/quote_cache/stats')
+@login_required
+def get_quote_cache_stats():
+    """获取报价缓存的命中计数"""
+    return jsonify({
+        'success': True,
+        'data': checker.get_quote_cache_stats()
+    })
+
 @stock_bp.route('/exchange_rates')
 @login_required
 def get_exchange_rates():
@@ -697,46 +735,9 @@ def get_exchange_rates():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
-        # 构建SQL查询
-        sql = """
-            SELECT * FROM exchange_rates 
-            WHERE 1=1
-        """
-        params = []
-        
-        if currency:
-            sql += " AND currency = %s"
-            params.append(currency)
-        if start_date:
-            sql += " AND rate_date >= %s"
-            params.append(start_date)
-        if end_date:
-            sql += " AND rate_date <= %s"
-            params.append(end_date)
-            
-        # 计算总记录数
-        count_sql = sql.replace("*", "COUNT(*) as count")
-        total = db.fetch_one(count_sql, params)
-        total_count = total['count'] if total else 0
-        
-        # 添加排序和分页
-        sql += " ORDER BY rate_date DESC, currency"
-        sql += " LIMIT %s OFFSET %s"
-        offset = (page - 1) * per_page
-        params.extend([per_page, offset])
-        
-        # 获取数据
-        rates = db.fetch_all(sql, params)
-        
         return jsonify({
             'success': True,
-            'data': {
-                'items': [ExchangeRate(rate).to_dict() for rate in rates],
-                'total': total_count,
-                'page': page,
-                'per_page': per_page,
-                'pages': (total_count + per_page - 1) // per_page
-            }
+            'data': ExchangeRate.find_page(currency, start_date, end_date, page, per_page)
         })
         
     except Exception as e:
@@ -752,13 +753,16 @@ def fetch_missing_rates():
     """获取缺失的汇率数据并更新临时汇率"""
     try:
         # 更新所有临时汇率记录
-        updated_count = checker.update_temporary_rates()
+        report = checker.update_temporary_rates_report()
+        updated_count = report['updated_count']
         
         return jsonify({
             'success': True,
             'message': f'成功更新 {updated_count} 条临时汇率记录',
             'data': {
-                'updated_count': updated_count
+                'updated_count': updated_count,
+                'elapsed': report['elapsed'],
+                'currencies': report['currencies']
             }
         })
         
@@ -796,6 +800,8 @@ def add_exchange_rate():
         # 创建新记录
         rate = ExchangeRate(data)
         if rate.save():
+            rate_table.upsert(rate.currency, rate.rate_date, rate.rate)
+            
             # 添加成功后，检查并更新临时汇率记录
             checker.update_temporary_rates()
             
@@ -842,6 +848,7 @@ def update_exchange_rate(id):
             rate.source = data['source']
         
         if rate.save():
+            rate_table.upsert(rate.currency, rate.rate_date, rate.rate)
             return jsonify({
                 'success': True,
                 'message': '更新汇率记录成功',
@@ -877,6 +884,7 @@ def delete_exchange_rate(id):
         # 删除记录
         delete_sql = "DELETE FROM exchange_rates WHERE id = %s"
         if db.execute(delete_sql, (id,)):
+            rate_table.remove(rate['currency'], rate['rate_date'])
             return jsonify({
                 'success': True,
                 'message': '删除汇率记录成功'
@@ -6,15 +6,11 @@ import logging
 from utils.auth import login_required
 from services.transaction_service import TransactionService
 from services.transaction_query import TransactionQuery
-from config.database import Database
+from config.database import db
 
 transaction_bp = Blueprint('transaction', __name__)
 logger = logging.getLogger(__name__)
 
-# 创建数据库对象
-db = Database()
-db.init_pool()  # 确保初始化连接池
-
 @transaction_bp.route('/api/transaction/<int:transaction_id>', methods=['GET'])
 @login_required
 def get_transaction(transaction_id):
@@ -53,7 +49,7 @@ def add_transaction():
         transaction_data['user_id'] = user_id
         
         success, result, status_code = TransactionService.process_transaction(
-            db=db,  # 使用初始化的数据库连接对象
+            db=db,  # 使用应用共享的数据库对象
             user_id=user_id,
             transaction_data=transaction_data
         )
@@ -89,7 +85,7 @@ def update_transaction(transaction_id):
         transaction_data['user_id'] = user_id
         
         success, result, status_code = TransactionService.process_transaction(
-            db=db,  # 使用初始化的数据库连接对象
+            db=db,  # 使用应用共享的数据库对象
             user_id=user_id,
             transaction_data=transaction_data,
             transaction_id=transaction_id
@@ -131,7 +127,7 @@ def delete_transaction(transaction_id):
             }), 404
         
         success, result, status_code = TransactionService.process_transaction(
-            db=db,  # 使用初始化的数据库连接对象
+            db=db,  # 使用应用共享的数据库对象
             user_id=user_id,
             transaction_data=transaction,
             transaction_id=transaction_id,
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from flask import Blueprint, jsonify, request, current_app
-from utils.db import get_db_connection
+from utils.db import get_pooled_connection
 from utils.auth import login_required
 import pymysql
 from decimal import Decimal
@@ -56,7 +56,7 @@ def get_transaction_details():
         end_date = request.args.get('end_date')
         
         # 获取数据库连接
-        conn = get_db_connection()
+        conn = get_pooled_connection()
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         
         # 构建查询条件
@@ -6,19 +6,16 @@ from datetime import datetime
 import logging
 import pymysql
 import json
-from utils.db import get_db_connection
+from utils.db import get_pooled_connection
 from utils.auth import login_required, has_permission
 from services.transaction_calculator import TransactionCalculator
+from models.holder_position import HolderPosition
 from decimal import Decimal
-from config.database import Database
+from config.database import db
 
 transaction_split_bp = Blueprint('transaction_split', __name__)
 logger = logging.getLogger(__name__)
 
-# 创建数据库对象
-db = Database()
-db.init_pool()  # 确保初始化连接池
-
 @transaction_split_bp.route('/api/transaction/get_by_code', methods=['GET'])
 @login_required
 def get_transaction_by_code():
@@ -43,7 +40,7 @@ def get_transaction_by_code():
         }), 400
     
     try:
-        conn = get_db_connection()
+        conn = get_pooled_connection()
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         
         # 检查权限：是否是交易创建者或分单持有人
@@ -176,7 +173,7 @@ def get_users():
     获取持有人列表，用于分单选择
     """
     try:
-        conn = get_db_connection()
+        conn = get_pooled_connection()
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         
         # 查询持有人列表
@@ -261,6 +258,9 @@ def split_transaction():
                 
             logger.info(f"找到原始交易记录: {transaction}")
             
+            # 记录旧分单涉及的持有人-股票，重新分单后刷新其持仓快照
+            previous_position_keys = HolderPosition.get_split_keys(transaction_id)
+            
             # 先删除该交易的所有现有分单记录
             delete_query = """
                 DELETE FROM transaction_splits
@@ -398,6 +398,9 @@ def split_transaction():
                 # 提交事务
                 conn.commit()
                 
+                # 旧分单的持有人可能已不在新的分单中，需要刷新其持仓快照
+                TransactionCalculator._refresh_holder_positions(db, previous_position_keys)
+                
                 return jsonify({
                     'success': True,
                     'message': '分单处理成功',
@@ -641,7 +644,7 @@ def get_accessible_holders():
         # 记录请求信息
         logger.info(f"获取可访问持有人列表，用户ID: {current_user_id}")
         
-        conn = get_db_connection()
+        conn = get_pooled_connection()
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         
         # 查询用户可访问的持有人列表
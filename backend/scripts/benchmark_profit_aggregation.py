@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+盈利统计聚合性能测试
+
+用 verify_profit_aggregation.make_splits 生成不同规模的交易分单记录，
+测量 ProfitAggregator 各种输出方式的耗时和每条记录的平均耗时。
+单次遍历聚合的每条耗时应基本不随规模增长。
+
+用法: python scripts/benchmark_profit_aggregation.py --sizes 10000,100000,1000000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.profit_aggregator import ProfitAggregator
+from verify_profit_aggregation import make_splits
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def run_summary(rows):
+    ProfitAggregator(keep_details=False).add_all(rows).finish()
+
+def run_dict(rows):
+    ProfitAggregator().add_all(rows).to_dict()
+
+def run_rows(rows):
+    ProfitAggregator(keep_details=False).add_all(rows).to_rows()
+
+def run_json(rows):
+    dumps = lambda obj: json.dumps(obj, default=str)
+    for _ in ProfitAggregator().add_all(rows).iter_json(dumps):
+        pass
+
+MODES = [
+    ('汇总', run_summary),
+    ('字典', run_dict),
+    ('股票行', run_rows),
+    ('JSON', run_json)
+]
+
+def main():
+    parser = argparse.ArgumentParser(description='盈利统计聚合性能测试')
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='分单数，逗号分隔')
+    parser.add_argument('--rows-per-stock', type=int, default=200, help='平均每只股票的分单数')
+    args = parser.parse_args()
+
+    for size in (int(value) for value in args.sizes.split(',')):
+        stocks = max(size // args.rows_per_stock, 1)
+        started = time.perf_counter()
+        rows = make_splits(size, stocks, seed=size)
+        # 查询结果按最后交易日期排序，聚合不依赖输入顺序，这里打乱以覆盖最坏情况
+        random.Random(size).shuffle(rows)
+        logger.info(f"已生成 {size} 条分单记录, {stocks} 只股票, 耗时 {time.perf_counter() - started:.1f} 秒")
+
+        results = []
+        for name, run in MODES:
+            started = time.perf_counter()
+            run(rows)
+            elapsed = time.perf_counter() - started
+            results.append(f"{name} {elapsed * 1000:8.0f} ms ({elapsed * 1e6 / size:.2f} us/条)")
+        print(f"{size:>8} 条: " + ', '.join(results))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+报价抓取性能测试
+
+启动本地桩服务器，比较每次新建连接的 requests.get 与共享连接池的 http_client.get
+在相同请求数下的耗时，并校验解析出的价格。
+
+用法: python scripts/benchmark_quote_fetch.py --requests 200 --delay 0.005 --fail-rate 0.05
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import requests
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services import http_client
+from scripts.stub_finance_server import start_server, quote_price
+
+# 配置日志
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def plain_get(url):
+    """每次新建连接"""
+    response = requests.get(url, timeout=15)
+    response.raise_for_status()
+    return response
+
+def run(fetch, base_url, queries):
+    """依次请求所有查询，返回 (耗时, 失败数)"""
+    failed = 0
+    started = time.perf_counter()
+    for query in queries:
+        try:
+            response = fetch(f'{base_url}/quote/{query}')
+            if f'{quote_price(query):.4f}' not in response.text:
+                failed += 1
+        except requests.exceptions.RequestException:
+            failed += 1
+    return time.perf_counter() - started, failed
+
+def main():
+    parser = argparse.ArgumentParser(description='报价抓取性能测试')
+    parser.add_argument('--requests', type=int, default=200, help='请求数')
+    parser.add_argument('--delay', type=float, default=0.0, help='桩服务器每个请求的延迟（秒）')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='桩服务器返回503的比例')
+    parser.add_argument('--padding', type=int, default=200000, help='页面附加内容长度')
+    args = parser.parse_args()
+
+    server, base_url = start_server(delay=args.delay, fail_rate=args.fail_rate, padding=args.padding)
+    queries = [f'{index:04d}:HKG' for index in range(args.requests)]
+    try:
+        for name, fetch in (('requests.get', plain_get), ('http_client.get', http_client.get)):
+            elapsed, failed = run(fetch, base_url, queries)
+            print(f"{name}: {len(queries)} 次请求, 耗时 {elapsed:.2f} 秒, "
+                  f"{len(queries) / elapsed:.0f} 次/秒, 失败 {failed}")
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
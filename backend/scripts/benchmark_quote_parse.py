@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+报价页面解析性能测试
+
+对 fixtures/quote_pages 下保存的报价页面，比较 BeautifulSoup 完整解析与定向扫描
+读取价格、名称和 window.google.finance.data 的每页CPU时间，并校验两者结果一致。
+夹具页面有两种：--save 生成的结构相近的页面，以及 --capture 抓取的真实页面（*.captured.html），
+真实页面去掉样式、SVG、注释和无关脚本后保存，裁剪前后的解析结果必须一致。
+
+用法: python scripts/benchmark_quote_parse.py --rounds 20
+      python scripts/benchmark_quote_parse.py --save      # 重新生成夹具页面
+      python scripts/benchmark_quote_parse.py --capture   # 抓取每个市场的真实页面
+      python scripts/benchmark_quote_parse.py --capture 9988:HKG AAPL:NASDAQ
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+from datetime import datetime
+from bs4 import BeautifulSoup
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services import quote_page, http_client
+from services.http_client import FINANCE_BASE_URL
+from services.currency_checker import CurrencyChecker
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'quote_pages')
+
+FIXTURE_QUOTES = [
+    ('0700:HKG', '腾讯控股', 412.6),
+    ('NVDA:NASDAQ', 'NVIDIA Corp', 131.38),
+    ('USD-HKD', 'USD / HKD', 7.7812)
+]
+
+# 默认抓取的真实页面：每个市场一个，另加一个汇率页面
+CAPTURE_QUERIES = ['0700:HKG', 'NVDA:NASDAQ', 'KO:NYSE', '600519:SHA', '000001:SHE', 'USD-HKD']
+CAPTURED_SUFFIX = '.captured.html'
+
+# 裁剪真实页面时去掉的内容
+TRIM_PATTERNS = [
+    re.compile(r'<style\b[^>]*>.*?</style>', re.S | re.I),
+    re.compile(r'<svg\b[^>]*>.*?</svg>', re.S | re.I),
+    re.compile(r'<!--.*?-->', re.S)
+]
+SCRIPT_PATTERN = re.compile(r'<script\b[^>]*>.*?</script>', re.S | re.I)
+
+def fixture_path(query, suffix='.html'):
+    """夹具页面的文件路径"""
+    return os.path.join(FIXTURE_DIR, re.sub(r'[^0-9A-Za-z_-]', '_', query) + suffix)
+
+def build_fixture_page(query, name, price, blocks=300, seed=0):
+    """生成与 Google Finance 报价页面结构相近的页面：大量无关节点、脚本和一个价格节点"""
+    rng = random.Random(seed)
+    filler = []
+    for index in range(blocks):
+        filler.append(
+            f'<div class="gyFHrc" jsname="b{index}"><span class="mfs7Fc">指标 {index}</span>'
+            f'<div class="P6K39c"><span>{rng.uniform(1, 1000):.2f}</span></div>'
+            f'<a href="/finance/quote/X{index}:HKG"><div class="ZvmM7">{rng.uniform(-5, 5):.2f}%</div></a></div>'
+        )
+    start = 1700000000000
+    points = [[start + day * 86400000, round(price * (1 + rng.uniform(-0.1, 0.1)), 4)] for day in range(250)]
+    finance_data = json.dumps({'lines': [{'points': points}]})
+    half = len(filler) // 2
+    return (
+        '<!DOCTYPE html><html lang="zh"><head><meta charset="utf-8">'
+        f'<title>{query} 股价</title>'
+        '<script>window.WIZ_global_data = {"a": 1};</script>'
+        '</head><body><c-wiz><header>'
+        f'<div class="zzDege">{name}</div></header><main>'
+        + ''.join(filler[:half])
+        + f'<div class="rPF6Lc"><div class="P6K39c"><div class="YMlKec fxKbKc">{price:,.2f}</div></div>'
+        + f'<div jsname="ip75Cb" data-last-price="{price}" data-currency-code="HKD"></div></div>'
+        + ''.join(filler[half:])
+        + f'</main></c-wiz><script>window.google.finance.data = {finance_data};</script>'
+        '</body></html>'
+    )
+
+def save_fixtures():
+    """生成并保存夹具页面"""
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for seed, (query, name, price) in enumerate(FIXTURE_QUOTES):
+        path = fixture_path(query)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(build_fixture_page(query, name, price, seed=seed))
+        logger.info(f"已保存夹具页面: {path}")
+
+def trim_page(page):
+    """去掉样式、SVG、注释和不含 window.google.finance.data 的脚本，保留其余 HTML 结构"""
+    for pattern in TRIM_PATTERNS:
+        page = pattern.sub('', page)
+    return SCRIPT_PATTERN.sub(lambda match: match.group(0) if 'google.finance.data' in match.group(0) else '', page)
+
+def capture_fixtures(queries):
+    """
+    抓取真实报价页面，裁剪后保存为 *.captured.html
+
+    裁剪后任一解析方式的结果改变时保存未裁剪的页面；没有价格的页面不保存
+
+    Returns:
+        int: 失败的页面数
+    """
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    failed = 0
+    for query in queries:
+        url = f'{FINANCE_BASE_URL}/quote/{query}?hl=zh&gl=CN'
+        try:
+            page = http_client.get(url, headers=CurrencyChecker.HEADERS, timeout=15).text
+        except Exception as e:
+            logger.error(f"抓取 {query} 失败: {str(e)}")
+            failed += 1
+            continue
+
+        if parse_with_scan(page)[0] is None:
+            logger.error(f"{query} 的页面中没有找到价格，未保存")
+            failed += 1
+            continue
+
+        trimmed = trim_page(page)
+        if parse_with_soup(trimmed) != parse_with_soup(page) or parse_with_scan(trimmed) != parse_with_scan(page):
+            logger.warning(f"{query} 裁剪后解析结果改变，保存未裁剪的页面")
+            trimmed = page
+
+        path = fixture_path(query, CAPTURED_SUFFIX)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'<!-- {url} {datetime.now():%Y-%m-%d %H:%M} {len(page)} -> {len(trimmed)} bytes -->\n')
+            f.write(trimmed)
+        logger.info(f"已保存真实页面: {path} ({len(page) // 1024} KB -> {len(trimmed) // 1024} KB)")
+    return failed
+
+def load_fixtures():
+    """读取夹具页面"""
+    if not os.path.isdir(FIXTURE_DIR):
+        return []
+    pages = []
+    for filename in sorted(os.listdir(FIXTURE_DIR)):
+        if filename.endswith('.html'):
+            with open(os.path.join(FIXTURE_DIR, filename), encoding='utf-8') as f:
+                pages.append((filename, f.read()))
+    return pages
+
+def parse_with_soup(page):
+    """原有方式：构建完整DOM后读取"""
+    soup = BeautifulSoup(page, 'html.parser')
+    price_div = soup.find('div', {'data-last-price': True})
+    price = float(price_div.get('data-last-price')) if price_div else None
+    name_element = soup.find('div', {'class': 'zzDege'})
+    data = None
+    pattern = re.compile(r'window.google.finance.data\s*=\s*({.*?});', re.DOTALL)
+    for script in soup.find_all('script'):
+        if script.string:
+            match = pattern.search(script.string)
+            if match:
+                data = json.loads(match.group(1))
+                break
+    return price, name_element.text if name_element else None, data
+
+def parse_with_scan(page):
+    """定向扫描"""
+    result = quote_page.parse_quote(page)
+    return result['price'], result['name'], quote_page.extract_finance_data(page)
+
+def cpu_per_page(parser, pages, rounds):
+    """返回每页平均CPU时间（毫秒）"""
+    started = time.process_time()
+    for _ in range(rounds):
+        for _, page in pages:
+            parser(page)
+    return (time.process_time() - started) * 1000 / (rounds * len(pages))
+
+def main():
+    parser = argparse.ArgumentParser(description='报价页面解析性能测试')
+    parser.add_argument('--rounds', type=int, default=20, help='每个页面的解析次数')
+    parser.add_argument('--save', action='store_true', help='重新生成夹具页面')
+    parser.add_argument('--capture', nargs='*', metavar='QUERY',
+                        help='抓取真实页面，不指定时抓取每个市场的默认页面')
+    args = parser.parse_args()
+
+    if args.save:
+        save_fixtures()
+    if args.capture is not None:
+        if capture_fixtures(args.capture or CAPTURE_QUERIES):
+            sys.exit(1)
+    pages = load_fixtures()
+    if not pages:
+        logger.error(f"没有找到夹具页面，请先运行 --save: {FIXTURE_DIR}")
+        sys.exit(1)
+
+    for filename, page in pages:
+        if parse_with_soup(page) != parse_with_scan(page):
+            logger.error(f"解析结果不一致: {filename}")
+            sys.exit(1)
+
+    soup_ms = cpu_per_page(parse_with_soup, pages, args.rounds)
+    scan_ms = cpu_per_page(parse_with_scan, pages, args.rounds)
+    average_size = sum(len(page) for _, page in pages) / len(pages) / 1024
+    print(f"夹具页面: {len(pages)} 个, 平均 {average_size:.0f} KB")
+    print(f"BeautifulSoup: {soup_ms:.2f} ms CPU/页")
+    print(f"定向扫描: {scan_ms:.3f} ms CPU/页")
+    if scan_ms > 0:
+        print(f"提升: {soup_ms / scan_ms:.0f} 倍")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+交易分单记录写回性能测试
+
+在临时表中比较逐条 UPDATE 与集合 UPDATE ... JOIN 两种写回方式的每秒更新行数，
+不会修改 transaction_splits 中的数据。
+
+用法: python scripts/benchmark_split_writer.py --rows 5000 --batch-size 100
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+from datetime import date, timedelta
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.db import get_db_connection
+from utils.transaction_recalculator import update_rows_one_by_one, update_rows_set_based
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BENCH_TABLE = 'bench_transaction_splits'
+
+def prepare_table(conn, rows):
+    """创建临时表并写入测试数据"""
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE TEMPORARY TABLE {BENCH_TABLE} LIKE transaction_splits")
+        insert_sql = f"""
+        INSERT INTO {BENCH_TABLE}
+        (original_transaction_id, holder_id, split_ratio, transaction_date, stock_code, stock_name,
+         market, transaction_type, total_amount, total_quantity)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        start_date = date(2015, 1, 1)
+        cursor.executemany(insert_sql, [
+            (index + 1, 1, 1.0, start_date + timedelta(days=index % 3000), '00700', 'BENCH',
+             'HK', 'buy', 1000.0, 100)
+            for index in range(rows)
+        ])
+        cursor.execute(f"SELECT id FROM {BENCH_TABLE} ORDER BY id")
+        ids = [row['id'] for row in cursor.fetchall()]
+    conn.commit()
+    return ids
+
+def make_updates(ids):
+    """生成与重新计算结果相同字段的更新数据"""
+    updates = []
+    for split_id in ids:
+        quantity = float(random.randint(100, 10000))
+        cost = round(random.uniform(1000, 100000), 2)
+        updates.append((split_id, {
+            'prev_quantity': quantity,
+            'prev_cost': cost,
+            'prev_avg_cost': round(cost / quantity, 5),
+            'current_quantity': quantity + 100,
+            'current_cost': cost + 1000,
+            'current_avg_cost': round((cost + 1000) / (quantity + 100), 5),
+            'total_fees': 10.5,
+            'net_amount': -1010.5,
+            'running_quantity': quantity + 100,
+            'running_cost': cost + 1000,
+            'realized_profit': 0.0,
+            'profit_rate': 0.0
+        }))
+    return updates
+
+def run_writer(conn, writer, updates, batch_size):
+    """按批次执行写回并返回每秒更新行数"""
+    started = time.perf_counter()
+    with conn.cursor() as cursor:
+        for start in range(0, len(updates), batch_size):
+            writer(cursor, BENCH_TABLE, updates[start:start + batch_size])
+            conn.commit()
+    elapsed = time.perf_counter() - started
+    return len(updates) / elapsed if elapsed > 0 else float('inf'), elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='交易分单记录写回性能测试')
+    parser.add_argument('--rows', type=int, default=5000, help='测试行数')
+    parser.add_argument('--batch-size', type=int, default=100, help='每批更新行数')
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        ids = prepare_table(conn, args.rows)
+        logger.info(f"已在临时表 {BENCH_TABLE} 中写入 {len(ids)} 条测试数据")
+
+        results = {}
+        for name, writer in (('逐条 UPDATE', update_rows_one_by_one), ('集合 UPDATE ... JOIN', update_rows_set_based)):
+            rows_per_second, elapsed = run_writer(conn, writer, make_updates(ids), args.batch_size)
+            results[name] = rows_per_second
+            print(f"{name}: {len(ids)} 行, 耗时 {elapsed:.2f} 秒, {rows_per_second:.0f} 行/秒")
+
+        baseline = results['逐条 UPDATE']
+        if baseline > 0:
+            print(f"提升: {results['集合 UPDATE ... JOIN'] / baseline:.1f} 倍")
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
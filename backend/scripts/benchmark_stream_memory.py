@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+流式读取内存测试
+
+在临时表中写入不同规模的交易分单记录，分别用 fetchall 和 utils.db.stream 读取并交给
+ProfitAggregator 汇总，比较读取过程中的峰值内存 (RSS) 增量。
+每种规模和读取方式在独立子进程中运行，峰值内存互不影响；流式读取的峰值内存应基本不随规模增长。
+不会修改 transaction_splits 中的数据。
+
+用法: python scripts/benchmark_stream_memory.py --sizes 10000,100000,1000000
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import resource
+import subprocess
+from datetime import date, timedelta
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.db import get_db_connection, stream
+from services.profit_aggregator import ProfitAggregator
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BENCH_TABLE = 'bench_stream_splits'
+INSERT_CHUNK = 10000
+STOCKS = 200
+
+SELECT_SQL = f"""
+SELECT id, market, stock_code, stock_name, transaction_type, transaction_date,
+       total_amount, total_quantity, total_fees, prev_avg_cost, current_avg_cost
+FROM {BENCH_TABLE}
+ORDER BY market, stock_code, transaction_date, id
+"""
+
+def peak_rss_mb():
+    """当前进程的峰值内存，Linux 下 ru_maxrss 单位为 KB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def prepare_table(conn, rows):
+    """创建临时表并分批写入测试数据，写入过程的内存与规模无关"""
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE TEMPORARY TABLE {BENCH_TABLE} LIKE transaction_splits")
+        insert_sql = f"""
+        INSERT INTO {BENCH_TABLE}
+        (original_transaction_id, holder_id, split_ratio, transaction_date, stock_code, stock_name,
+         market, transaction_type, total_amount, total_quantity, total_fees, prev_avg_cost, current_avg_cost)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        start_date = date(2015, 1, 1)
+        for offset in range(0, rows, INSERT_CHUNK):
+            cursor.executemany(insert_sql, [
+                (index + 1, 1, 1.0, start_date + timedelta(days=index % 3000), f'{index % STOCKS:05d}', 'BENCH',
+                 'HK', 'buy' if index % 3 else 'sell', 1000.0, 100, 10.5, 10.0, 10.0)
+                for index in range(offset, min(offset + INSERT_CHUNK, rows))
+            ])
+    conn.commit()
+
+def read_fetchall(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(SELECT_SQL)
+        return cursor.fetchall()
+
+def read_stream(conn):
+    return stream(SELECT_SQL, db_conn=conn)
+
+MODES = {
+    'fetchall': read_fetchall,
+    'stream': read_stream
+}
+
+def run_child(mode, rows):
+    """子进程：写入测试数据后读取并汇总，输出 "耗时 基线内存 峰值内存" """
+    conn = get_db_connection()
+    try:
+        prepare_table(conn, rows)
+        baseline = peak_rss_mb()
+        started = time.perf_counter()
+        ProfitAggregator(keep_details=False).add_all(MODES[mode](conn)).finish()
+        elapsed = time.perf_counter() - started
+        print(f"{elapsed:.3f} {baseline:.1f} {peak_rss_mb():.1f}")
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='流式读取内存测试')
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='分单数，逗号分隔')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'ROWS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], int(args.child[1]))
+        return
+
+    for size in (int(value) for value in args.sizes.split(',')):
+        results = []
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', mode, str(size)],
+                check=True, capture_output=True, text=True
+            ).stdout.split()
+            elapsed, baseline, peak = (float(value) for value in output[-3:])
+            results.append(f"{mode} 峰值增量 {peak - baseline:8.1f} MB, 耗时 {elapsed:6.1f} 秒")
+        print(f"{size:>8} 条: " + ', '.join(results))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+交易列表可见性查询性能测试
+
+在 bench_ 前缀的测试表中生成每笔交易拆分给多个持有人的测试数据，以持有人关联用户的身份查询交易列表，
+比较原有 LEFT JOIN 分单 + SELECT DISTINCT 与当前按本人交易/分单可见交易 UNION ALL 两种写法
+在不同分单数下的每页耗时，并输出两者的 EXPLAIN 执行计划；当前写法中分单表没有按索引查找时以非零状态退出。
+测试表在结束时删除，不会修改正式表中的数据。
+当前写法在同一查询中多次引用 stock_transactions，MySQL 不允许临时表在一个查询中被引用多次，因此使用普通表。
+
+用法: python scripts/benchmark_transaction_list.py --transactions 2000 --fanouts 1,10,50
+      python scripts/benchmark_transaction_list.py --explain-out explain_transaction_list.txt
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.db import get_db_connection
+from services.transaction_query import TransactionQuery
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# 正式表 -> 测试表
+BENCH_TABLES = {
+    'stock.stock_transactions': 'bench_stock_transactions',
+    'stock.transaction_splits': 'bench_transaction_splits',
+    'stock.holders': 'bench_holders',
+    'stock.stocks': 'bench_stocks'
+}
+
+OWNER_USER_ID = 1
+VIEWER_USER_ID = 2
+
+# 原有写法：展开分单行后用 DISTINCT 去重
+LEGACY_LIST_SQL = """
+    SELECT DISTINCT
+        t.*,
+        s.code_name as stock_name
+    FROM stock.stock_transactions t
+    LEFT JOIN stock.stocks s ON t.stock_code = s.code AND t.market = s.market
+    LEFT JOIN stock.transaction_splits ts ON t.id = ts.original_transaction_id
+    LEFT JOIN stock.holders h ON ts.holder_id = h.id
+    WHERE (t.user_id = %s OR h.user_id = %s)
+    ORDER BY t.transaction_date DESC, t.id DESC LIMIT %s OFFSET %s
+"""
+
+def to_bench(sql):
+    """将查询中的正式表替换为测试表"""
+    for table, bench_table in BENCH_TABLES.items():
+        sql = sql.replace(table, bench_table)
+    return sql
+
+def union_list_sql(per_page, offset):
+    """当前写法：TransactionQuery 的列表查询"""
+    sql, params = TransactionQuery._build_list_query(VIEWER_USER_ID, limit=per_page, offset=offset)
+    return to_bench(sql), params
+
+def prepare_tables(conn, transactions, fanout):
+    """创建测试表并写入测试数据，每笔交易拆分给 fanout 个持有人"""
+    with conn.cursor() as cursor:
+        for table, bench_table in BENCH_TABLES.items():
+            cursor.execute(f"DROP TABLE IF EXISTS {bench_table}")
+            cursor.execute(f"CREATE TABLE {bench_table} LIKE {table.split('.')[1]}")
+
+        cursor.execute(
+            "INSERT INTO bench_stocks (code, market, code_name) VALUES (%s, %s, %s)",
+            ('00700', 'HK', 'BENCH')
+        )
+        # 一半持有人关联查询用户
+        cursor.executemany(
+            "INSERT INTO bench_holders (id, name, user_id) VALUES (%s, %s, %s)",
+            [(index + 1, f'bench_holder_{index + 1}', VIEWER_USER_ID if index % 2 == 0 else None)
+             for index in range(fanout)]
+        )
+
+        start = datetime(2015, 1, 1, 9, 30)
+        cursor.executemany("""
+            INSERT INTO bench_stock_transactions
+            (id, user_id, transaction_code, stock_code, market, transaction_type, transaction_date,
+             total_amount, total_quantity, broker_fee, stamp_duty, transaction_levy, trading_fee, deposit_fee)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 0, 0, 0, 0, 0)
+        """, [
+            (index + 1, OWNER_USER_ID, f'BENCH{index + 1}', '00700', 'HK', 'buy',
+             start + timedelta(hours=index), 1000.0, 100)
+            for index in range(transactions)
+        ])
+
+        split_rows = [
+            (index + 1, holder + 1, round(1.0 / fanout, 4), (start + timedelta(hours=index)).date(),
+             '00700', 'BENCH', 'HK', 'buy', 1000.0 / fanout, 100)
+            for index in range(transactions)
+            for holder in range(fanout)
+        ]
+        cursor.executemany("""
+            INSERT INTO bench_transaction_splits
+            (original_transaction_id, holder_id, split_ratio, transaction_date, stock_code, stock_name,
+             market, transaction_type, total_amount, total_quantity)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, split_rows)
+        for bench_table in BENCH_TABLES.values():
+            cursor.execute(f"ANALYZE TABLE {bench_table}")
+            cursor.fetchall()
+    conn.commit()
+    return len(split_rows)
+
+def drop_tables(conn):
+    """删除测试表"""
+    with conn.cursor() as cursor:
+        for bench_table in BENCH_TABLES.values():
+            cursor.execute(f"DROP TABLE IF EXISTS {bench_table}")
+    conn.commit()
+
+def time_query(conn, sql, params, rounds):
+    """返回中位耗时（毫秒）和返回行数"""
+    timings = []
+    rows = []
+    with conn.cursor() as cursor:
+        for _ in range(rounds):
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), len(rows)
+
+def explain(conn, sql, params):
+    """获取执行计划"""
+    with conn.cursor() as cursor:
+        cursor.execute("EXPLAIN " + sql, params)
+        return cursor.fetchall()
+
+def format_explain(title, plan):
+    """格式化执行计划"""
+    lines = [f"{title} EXPLAIN:"]
+    for row in plan:
+        lines.append(f"  {row.get('select_type')} {row.get('table')} type={row.get('type')} "
+                     f"key={row.get('key')} rows={row.get('rows')} extra={row.get('Extra')}")
+    return '\n'.join(lines)
+
+def check_union_plan(plan):
+    """
+    检查当前写法中分单表的访问方式
+
+    Returns:
+        list: 问题描述，分单表按索引查找时为空
+    """
+    problems = []
+    split_rows = [row for row in plan if row.get('table') == 'ts']
+    if not split_rows:
+        problems.append("执行计划中没有分单表 ts")
+    for row in split_rows:
+        if row.get('type') in ('ALL', 'index') or not row.get('key'):
+            problems.append(f"分单表 ts 未使用索引查找: type={row.get('type')} key={row.get('key')}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description='交易列表可见性查询性能测试')
+    parser.add_argument('--transactions', type=int, default=2000, help='交易笔数')
+    parser.add_argument('--fanouts', default='1,10,50', help='每笔交易的分单数，逗号分隔')
+    parser.add_argument('--per-page', type=int, default=15, help='每页记录数')
+    parser.add_argument('--rounds', type=int, default=20, help='每种查询的执行次数')
+    parser.add_argument('--explain-out', help='将两种写法的执行计划写入该文件')
+    args = parser.parse_args()
+
+    fanouts = [int(value) for value in args.fanouts.split(',')]
+    legacy_sql = to_bench(LEGACY_LIST_SQL)
+    offsets = (0, (args.transactions // 2 // args.per_page) * args.per_page)
+
+    conn = get_db_connection()
+    try:
+        for fanout in fanouts:
+            split_count = prepare_tables(conn, args.transactions, fanout)
+            logger.info(f"已写入 {args.transactions} 笔交易, {split_count} 条分单记录（每笔 {fanout} 个持有人）")
+            for offset in offsets:
+                legacy_params = [VIEWER_USER_ID, VIEWER_USER_ID, args.per_page, offset]
+                legacy_ms, legacy_rows = time_query(conn, legacy_sql, legacy_params, args.rounds)
+                union_ms, union_rows = time_query(conn, *union_list_sql(args.per_page, offset), args.rounds)
+                if legacy_rows != union_rows:
+                    logger.error(f"两种写法返回行数不一致: {legacy_rows} != {union_rows}")
+                    sys.exit(1)
+                print(f"分单数 {fanout:>3}, OFFSET {offset:>5}: "
+                      f"DISTINCT {legacy_ms:8.2f} ms, UNION ALL {union_ms:8.2f} ms")
+
+        legacy_plan = explain(conn, legacy_sql, [VIEWER_USER_ID, VIEWER_USER_ID, args.per_page, 0])
+        union_plan = explain(conn, *union_list_sql(args.per_page, 0))
+        report = format_explain('DISTINCT', legacy_plan) + '\n\n' + format_explain('UNION ALL', union_plan)
+        print('\n' + report)
+        if args.explain_out:
+            with open(args.explain_out, 'w', encoding='utf-8') as f:
+                f.write(report + '\n')
+            logger.info(f"执行计划已写入 {args.explain_out}")
+
+        problems = check_union_plan(union_plan)
+        for problem in problems:
+            logger.error(problem)
+        if problems:
+            sys.exit(1)
+    finally:
+        drop_tables(conn)
+        conn.close()
+
+if __name__ == '__main__':
+    main()
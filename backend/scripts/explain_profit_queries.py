@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+盈利查询执行计划检查
+
+输出 stock_transactions、stocks、transaction_splits、holder_positions 字符列的排序规则，
+以及盈利统计查询、持仓快照查询和交易列表查询（第一页和游标翻页）的 EXPLAIN。
+交易列表本人交易分支的 stock_transactions 应使用 idx_user_date_id。在运行
+migrations/align_collations_and_split_indexes.py 前后各运行一次即可对比执行计划；
+--with-casts 输出在连接条件上加回 COLLATE 转换的旧写法的执行计划。
+
+用法: python scripts/explain_profit_queries.py --user-id 1
+      python scripts/explain_profit_queries.py --user-id 1 --with-casts
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.db import get_db_connection
+from models.visibility_scope import VisibilityScope
+from models.holder_position import SNAPSHOT_SELECT_SQL
+from routes.profit import build_profit_stats_query
+from services.transaction_query import TransactionQuery
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+TABLES = ('stock_transactions', 'stocks', 'transaction_splits', 'holder_positions')
+
+# 旧写法的连接条件
+COLLATE_CASTS = {
+    'ts.stock_code = s.code AND ts.market = s.market':
+        'ts.stock_code COLLATE utf8mb4_unicode_ci = s.code AND ts.market COLLATE utf8mb4_unicode_ci = s.market',
+    'ts.market = ltd.market AND ts.stock_code = ltd.stock_code':
+        'ts.market COLLATE utf8mb4_unicode_ci = ltd.market AND ts.stock_code COLLATE utf8mb4_unicode_ci = ltd.stock_code'
+}
+
+def with_collate_casts(sql):
+    """在连接条件上加回 COLLATE 转换"""
+    for condition, cast_condition in COLLATE_CASTS.items():
+        sql = sql.replace(condition, cast_condition)
+    return sql
+
+def print_collations(cursor):
+    """输出字符列的排序规则"""
+    placeholders = ', '.join(['%s'] * len(TABLES))
+    cursor.execute(f"""
+        SELECT TABLE_NAME, COLLATION_NAME, COUNT(*) AS columns
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders}) AND COLLATION_NAME IS NOT NULL
+        GROUP BY TABLE_NAME, COLLATION_NAME
+        ORDER BY TABLE_NAME, COLLATION_NAME
+    """, TABLES)
+    print("字符列排序规则:")
+    for row in cursor.fetchall():
+        print(f"  {row['TABLE_NAME']}: {row['COLLATION_NAME']} ({row['columns']} 列)")
+
+def print_explain(cursor, title, sql, params):
+    """输出执行计划"""
+    print(f"\n{title} EXPLAIN:")
+    cursor.execute("EXPLAIN " + sql, params)
+    for row in cursor.fetchall():
+        print(f"  {row.get('id')} {row.get('select_type')} {row.get('table')} type={row.get('type')} "
+              f"key={row.get('key')} rows={row.get('rows')} extra={row.get('Extra')}")
+
+def main():
+    parser = argparse.ArgumentParser(description='盈利查询执行计划检查')
+    parser.add_argument('--user-id', type=int, required=True, help='按该用户的可见范围生成查询')
+    parser.add_argument('--with-casts', action='store_true', help='同时输出加回 COLLATE 转换的旧写法')
+    args = parser.parse_args()
+
+    scope = VisibilityScope.for_user(args.user_id)
+    sql, params = build_profit_stats_query(scope)
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            print_collations(cursor)
+            print_explain(cursor, '盈利统计', sql, params)
+            if args.with_casts:
+                print_explain(cursor, '盈利统计（COLLATE 转换）', with_collate_casts(sql), params)
+
+            cursor.execute("SELECT holder_id, market, stock_code FROM holder_positions LIMIT 1")
+            key = cursor.fetchone()
+            if key:
+                snapshot_sql = SNAPSHOT_SELECT_SQL.format(
+                    filter='ts.holder_id = %s AND ts.market = %s AND ts.stock_code = %s'
+                )
+                snapshot_params = [key['holder_id'], key['market'], key['stock_code']] * 3
+                print_explain(cursor, '持仓快照', snapshot_sql, snapshot_params)
+            else:
+                logger.info("holder_positions 为空，跳过持仓快照查询")
+
+            list_sql, list_params = TransactionQuery._build_list_query(args.user_id, limit=16)
+            print_explain(cursor, '交易列表', list_sql, list_params)
+            cursor.execute(
+                "SELECT transaction_date, id FROM stock_transactions WHERE user_id = %s "
+                "ORDER BY transaction_date DESC, id DESC LIMIT 1 OFFSET 15", (args.user_id,)
+            )
+            last = cursor.fetchone()
+            if last:
+                list_sql, list_params = TransactionQuery._build_list_query(
+                    args.user_id, cursor_key=(last['transaction_date'], last['id']), limit=16
+                )
+                print_explain(cursor, '交易列表（游标翻页）', list_sql, list_params)
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
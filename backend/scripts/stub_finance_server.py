@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Google Finance 本地桩服务器
+
+响应 /finance/quote/<query> 请求，返回带 data-last-price 属性的报价页面，
+可通过 FINANCE_BASE_URL=http://127.0.0.1:<port>/finance 让 CurrencyChecker 使用它。
+
+用法: python scripts/stub_finance_server.py --port 8765 --delay 0.05 --fail-rate 0.1
+"""
+
+import gzip
+import random
+import zlib
+import time
+import logging
+import argparse
+import threading
+from urllib.parse import urlparse, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+QUOTE_PREFIX = '/finance/quote/'
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh"><head><meta charset="utf-8"><title>{query}</title></head>
+<body>
+<div class="zzDege">{name}</div>
+<main>
+<div class="P6K39c"><div class="YMlKec fxKbKc">{price:.2f}</div></div>
+<div data-last-price="{price:.4f}" data-currency-code="HKD"></div>
+</main>
+{padding}
+</body></html>
+"""
+
+def quote_price(query):
+    """每个查询返回固定的价格，便于校验"""
+    return 1 + (zlib.crc32(query.encode('utf-8')) % 100000) / 100
+
+def render_quote(query, padding=0):
+    """生成报价页面，padding 为附加的无关内容长度，用于模拟真实页面大小"""
+    return PAGE_TEMPLATE.format(
+        query=query,
+        name=f'STUB {query}',
+        price=quote_price(query),
+        padding='<div class="filler">' + 'x' * padding + '</div>' if padding else ''
+    )
+
+class StubFinanceHandler(BaseHTTPRequestHandler):
+    """报价请求处理"""
+
+    protocol_version = 'HTTP/1.1'
+    # 长连接下响应头和响应体分开写出，关闭 Nagle 避免与延迟确认叠加产生的等待
+    disable_nagle_algorithm = True
+    delay = 0.0
+    fail_rate = 0.0
+    padding = 0
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if not path.startswith(QUOTE_PREFIX):
+            self._send(404, b'not found')
+            return
+
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail_rate and random.random() < self.fail_rate:
+            self._send(503, b'unavailable')
+            return
+
+        body = render_quote(unquote(path[len(QUOTE_PREFIX):]), self.padding).encode('utf-8')
+        encoding = None
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            encoding = 'gzip'
+        self._send(200, body, encoding)
+
+    def _send(self, status, body, encoding=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+def start_server(port=0, delay=0.0, fail_rate=0.0, padding=0):
+    """
+    在后台线程启动桩服务器
+
+    Returns:
+        tuple: (server, base_url)，base_url 可直接用作 FINANCE_BASE_URL
+    """
+    handler = type('ConfiguredStubFinanceHandler', (StubFinanceHandler,), {
+        'delay': delay,
+        'fail_rate': fail_rate,
+        'padding': padding
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/finance'
+
+def main():
+    parser = argparse.ArgumentParser(description='Google Finance 本地桩服务器')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    parser.add_argument('--delay', type=float, default=0.0, help='每个请求的延迟（秒）')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='返回503的比例')
+    parser.add_argument('--padding', type=int, default=0, help='页面附加内容长度')
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.port, args.delay, args.fail_rate, args.padding)
+    logger.info(f"桩服务器已启动: FINANCE_BASE_URL={base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
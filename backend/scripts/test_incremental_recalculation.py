@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试交易分单记录的增量重新计算
+
+用 TransactionCalculator.calculate_position_change（正常写入路径）逐条生成一个持有人-股票的
+交易分单记录，保存在内存中并按数据库列精度舍入；再用 recalculate_incremental 模拟编辑后的重放，校验：
+- 未修改任何值的编辑，买入记录的存储值保持不变（包括 net_amount 的符号），并在下一条记录处收敛
+- 修改一条买入记录的金额后，之前的记录不变，之后的记录与正常写入路径的结果一致
+不需要数据库连接。
+
+用法: python scripts/test_incremental_recalculation.py
+"""
+
+import os
+import re
+import sys
+import logging
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.transaction_calculator import TransactionCalculator
+from utils.transaction_recalculator import recalculate_incremental
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+HOLDER_ID, MARKET, STOCK_CODE = 1, 'HK', '00700'
+
+# transaction_splits 各计算字段在数据库中的精度
+COLUMN_PLACES = {
+    'prev_quantity': 0, 'current_quantity': 0, 'running_quantity': 0,
+    'prev_cost': 2, 'prev_avg_cost': 2, 'current_cost': 2, 'current_avg_cost': 2, 'running_cost': 2,
+    'total_fees': 2, 'net_amount': 2, 'realized_profit': 2, 'profit_rate': 2, 'avg_price': 4
+}
+
+def to_column(field, value):
+    """按数据库列精度舍入"""
+    places = COLUMN_PLACES.get(field)
+    if places is None:
+        return value
+    return Decimal(str(value)).quantize(Decimal(1).scaleb(-places), rounding=ROUND_HALF_UP)
+
+class MemorySplits:
+    """在内存中执行 recalculate_incremental 使用的三类语句：检查点查询、键集分页查询和批量更新"""
+
+    def __init__(self, rows):
+        self.rows = {row['id']: row for row in rows}
+        self.updated_ids = []
+
+    def _ordered(self, holder_id, market, stock_code):
+        rows = [row for row in self.rows.values()
+                if (row['holder_id'], row['market'], row['stock_code']) == (holder_id, market, stock_code)]
+        return sorted(rows, key=lambda row: (row['transaction_date'], row['id']))
+
+    def fetch_one(self, sql, params=None):
+        holder_id, market, stock_code, before_date = params[:4]
+        before_id = params[5] if len(params) > 4 else 0
+        rows = [row for row in self._ordered(holder_id, market, stock_code)
+                if (row['transaction_date'], row['id']) < (before_date, before_id)]
+        if not rows:
+            return None
+        last = rows[-1]
+        return {'quantity': last['current_quantity'], 'cost': last['current_cost'], 'avg_cost': last['current_avg_cost']}
+
+    def fetch_all(self, sql, params=None):
+        holder_id, market, stock_code, after_date, _, after_id, limit = params
+        inclusive = 'ts.id >=' in sql
+        rows = [row for row in self._ordered(holder_id, market, stock_code)
+                if (row['transaction_date'], row['id']) > (after_date, after_id)
+                or (inclusive and (row['transaction_date'], row['id']) == (after_date, after_id))]
+        return [dict(row) for row in rows[:limit]]
+
+    def execute(self, sql, params=None):
+        fields = re.findall(r'%s AS (\w+)', sql)
+        width = len(fields)
+        for offset in range(0, len(params), width):
+            values = dict(zip(fields, params[offset:offset + width]))
+            row = self.rows[values.pop('id')]
+            row.update({field: to_column(field, value) for field, value in values.items()})
+            self.updated_ids.append(row['id'])
+        return len(params) // width
+
+def build_splits(trades, start=date(2024, 1, 2)):
+    """
+    用正常写入路径逐条计算交易分单记录
+
+    Args:
+        trades: [(交易类型, 数量, 金额, 佣金), ...]，按交易顺序
+    """
+    rows = []
+    prev_state = {'quantity': 0, 'cost': 0, 'avg_cost': 0}
+    for index, (transaction_type, quantity, amount, broker_fee) in enumerate(trades):
+        split = {
+            'id': index + 1,
+            'holder_id': HOLDER_ID,
+            'market': MARKET,
+            'stock_code': STOCK_CODE,
+            # 每两条记录同一天，覆盖同日多笔交易
+            'transaction_date': start + timedelta(days=index // 2),
+            'transaction_type': transaction_type,
+            'total_quantity': quantity,
+            'total_amount': Decimal(str(amount)),
+            'broker_fee': Decimal(str(broker_fee)),
+            'stamp_duty': Decimal('0'),
+            'transaction_levy': Decimal('0'),
+            'trading_fee': Decimal('0'),
+            'deposit_fee': Decimal('0')
+        }
+        change = TransactionCalculator.calculate_position_change(split, prev_state, is_split=True)
+        change['running_quantity'] = change['current_quantity']
+        change['running_cost'] = change['current_cost']
+        split.update({field: to_column(field, value) for field, value in change.items()})
+        rows.append(split)
+        prev_state = {'quantity': split['current_quantity'], 'cost': split['current_cost'],
+                      'avg_cost': split['current_avg_cost']}
+    return rows
+
+BUY_TRADES = [('buy', 100 * (index % 4 + 1), 1000 + 37.5 * index, 12.5) for index in range(12)]
+
+def test_unchanged_edit_keeps_buy_splits():
+    """编辑后值未改变时，买入记录保持原值并在下一条记录处收敛"""
+    rows = build_splits(BUY_TRADES)
+    stored = {row['id']: dict(row) for row in rows}
+    store = MemorySplits(rows)
+
+    edited = rows[4]
+    checked, updated = recalculate_incremental(
+        HOLDER_ID, MARKET, STOCK_CODE, edited['transaction_date'], edited['id'], page_size=3, db_conn=store
+    )
+
+    assert (checked, updated) == (1, 1), (checked, updated)
+    for split_id, row in store.rows.items():
+        assert row == stored[split_id], (split_id, {f: (stored[split_id][f], v) for f, v in row.items() if stored[split_id][f] != v})
+        assert row['net_amount'] > 0, (split_id, row['net_amount'])
+
+def test_amount_edit_matches_write_path():
+    """修改一条买入记录的金额后，之前的记录不变，之后的记录与正常写入路径的结果一致"""
+    rows = build_splits(BUY_TRADES)
+    store = MemorySplits(rows)
+
+    edited_index = 5
+    trades = list(BUY_TRADES)
+    transaction_type, quantity, amount, broker_fee = trades[edited_index]
+    trades[edited_index] = (transaction_type, quantity, amount + 500, broker_fee)
+    expected = build_splits(trades)
+
+    edited = store.rows[edited_index + 1]
+    edited['total_amount'] = expected[edited_index]['total_amount']
+    recalculate_incremental(
+        HOLDER_ID, MARKET, STOCK_CODE, edited['transaction_date'], edited['id'], page_size=4, db_conn=store
+    )
+
+    assert min(store.updated_ids) == edited['id'], store.updated_ids
+    for row in expected:
+        stored = store.rows[row['id']]
+        mismatched = {field: (stored[field], row[field]) for field in COLUMN_PLACES if stored[field] != row[field]}
+        assert not mismatched, (row['id'], mismatched)
+
+if __name__ == '__main__':
+    failed = 0
+    for test in (test_unchanged_edit_keeps_buy_splits, test_amount_edit_matches_write_path):
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
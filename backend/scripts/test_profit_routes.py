@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试盈利统计接口的各种输出方式
+
+用 Flask 测试客户端调用 /api/profit/，数据库读取替换为固定的交易分单记录，
+校验 details=none、details=page、stream=1 的结果与一次性返回全部明细（details=all）一致，
+以及市场统计的港币金额按交易日期的汇率换算。不需要数据库连接。
+
+用法: python scripts/test_profit_routes.py
+"""
+
+import os
+import sys
+import json
+import math
+import logging
+from datetime import date, timedelta
+from unittest import mock
+from flask import Flask
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import routes.profit as profit
+import services.rate_table as rate_table_module
+from routes.profit import build_profit_stats_query
+from models.visibility_scope import VisibilityScope
+from services.profit_aggregator import ProfitAggregator
+from scripts.verify_profit_aggregation import make_splits
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SPLITS = make_splits(300, 12, seed=2)
+
+# 美元汇率每三天一条，覆盖全部交易日期
+USD_RATES = [
+    {'currency': 'USD', 'rate_date': date(2017, 12, 29) + timedelta(days=3 * index), 'rate': 7.75 + 0.001 * index}
+    for index in range(60)
+]
+
+# 最近一次构建查询时指定的股票，fake_stream 按它筛选
+requested_stock_keys = []
+
+def build_query(*args, stock_keys=None, **kwargs):
+    """记录查询指定的股票后构建真实的查询语句"""
+    requested_stock_keys[:] = [stock_keys]
+    return build_profit_stats_query(*args, stock_keys=stock_keys, **kwargs)
+
+def fake_stream(sql, params=None, batch_size=None, db_conn=None):
+    """按查询要求的股票和顺序产出固定的交易分单记录"""
+    rows = [dict(row) for row in SPLITS]
+    stock_keys = requested_stock_keys[0] if requested_stock_keys else None
+    if stock_keys is not None:
+        rows = [row for row in rows if (row['market'], row['stock_code']) in stock_keys]
+    if profit.STOCK_ORDER in sql:
+        rows.sort(key=lambda row: (row['market'], row['stock_code'], row['transaction_date'], row['id']))
+    return iter(rows)
+
+def request_profit(query):
+    """以已登录、有权限的用户请求 /api/profit/，返回 (状态码, JSON)"""
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(profit.profit_bp, url_prefix='/api/profit')
+
+    fake_db = mock.Mock()
+    fake_db.fetch_all.side_effect = lambda sql, params=None: list(fake_stream(sql, params))
+    rates_db = mock.Mock()
+    rates_db.fetch_all.return_value = USD_RATES
+
+    with mock.patch.object(profit, 'stream', fake_stream), \
+            mock.patch.object(profit, 'build_profit_stats_query', build_query), \
+            mock.patch.object(profit, 'db', fake_db), \
+            mock.patch.object(profit, 'rate_table', rate_table_module.RateTable()), \
+            mock.patch.object(rate_table_module, 'db', rates_db), \
+            mock.patch.object(VisibilityScope, 'for_user', lambda user_id: VisibilityScope(user_id, [1])), \
+            mock.patch('utils.auth.PermissionCache.has_permission', return_value=True):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = 1
+        response = client.get(f'/api/profit/{query}')
+        return response.status_code, json.loads(response.get_data(as_text=True))
+
+def test_details_none():
+    """details=none 只返回汇总，与 details=all 的汇总相同"""
+    status, full = request_profit('?details=all')
+    assert status == 200 and full['success'], full
+    status, summary = request_profit('?details=none')
+    assert status == 200 and summary['success'], summary
+    assert 'transaction_details' not in summary['data']
+    assert summary['data']['market_stats'] == full['data']['market_stats']
+    assert summary['data']['stock_stats'] == full['data']['stock_stats']
+
+def test_stream():
+    """stream=1 流式输出的结果与 details=all 一次性返回的结果相同"""
+    status, full = request_profit('?details=all')
+    assert status == 200 and full['success'], full
+    status, streamed = request_profit('?stream=1')
+    assert status == 200 and streamed['success'], streamed
+    assert streamed == full
+
+def test_details_page():
+    """details=page 返回指定页股票的明细"""
+    status, full = request_profit('?details=all')
+    assert status == 200 and full['success'], full
+    status, page = request_profit('?details=page&page=2&per_page=5')
+    assert status == 200 and page['success'], page
+    # 分页按汇总结果中股票的顺序，JSON 响应中的键已排序，因此从汇总结果取顺序
+    _, stock_stats = ProfitAggregator(keep_details=False).add_all([dict(row) for row in SPLITS]).finish()
+    stock_keys = list(stock_stats)[5:10]
+    assert list(page['data']['transaction_details']) == stock_keys
+    for stock_key in stock_keys:
+        assert page['data']['transaction_details'][stock_key] == full['data']['transaction_details'][stock_key]
+    assert page['data']['details_page']['total'] == len(full['data']['stock_stats'])
+
+def usd_rate(trade_date):
+    """交易日期当天或之前最近一天的美元汇率"""
+    return [row['rate'] for row in USD_RATES if row['rate_date'] <= trade_date.date()][-1]
+
+def test_hkd_totals():
+    """市场统计的港币金额按各笔交易日期的汇率换算，港币市场与原币金额相同"""
+    status, summary = request_profit('?details=none')
+    assert status == 200 and summary['success'], summary
+    market_stats = summary['data']['market_stats']
+
+    hk = market_stats['HK']
+    for field in ('total_buy', 'total_sell', 'total_fees'):
+        assert math.isclose(hk[f'{field}_hkd'], hk[field]), (field, hk[f'{field}_hkd'], hk[field])
+
+    expected = {'total_buy_hkd': 0, 'total_sell_hkd': 0, 'total_fees_hkd': 0}
+    for row in SPLITS:
+        if row['market'] != 'US':
+            continue
+        rate = usd_rate(row['transaction_date'])
+        field = 'total_buy_hkd' if (row['transaction_type'] or 'BUY').upper() == 'BUY' else 'total_sell_hkd'
+        expected[field] += float(row['total_amount']) * rate
+        expected['total_fees_hkd'] += float(row['total_fees'] or 0) * rate
+    for field, value in expected.items():
+        assert math.isclose(market_stats['US'][field], value), (field, market_stats['US'][field], value)
+
+if __name__ == '__main__':
+    failed = 0
+    for test in (test_details_none, test_stream, test_details_page, test_hkd_totals):
+        try:
+            test()
+            logger.info(f"{test.__name__} 通过")
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"{test.__name__} 失败: {e}")
+    sys.exit(1 if failed else 0)
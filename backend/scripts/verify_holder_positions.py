@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+持仓快照校验脚本
+
+从交易分单记录重新聚合持仓，与 holder_positions 中的快照逐项比较，
+输出不一致的持有人-股票和字段。
+
+用法: python scripts/verify_holder_positions.py [--rebuild] [--tolerance 0.01]
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models.holder_position import HolderPosition
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description='持仓快照校验')
+    parser.add_argument('--rebuild', action='store_true', help='校验前先从交易分单记录重建全部快照')
+    parser.add_argument('--tolerance', type=float, default=0.01, help='数值字段允许的误差')
+    args = parser.parse_args()
+
+    if args.rebuild and not HolderPosition.rebuild_all():
+        logger.error("重建持仓快照失败")
+        sys.exit(1)
+
+    drifts = HolderPosition.verify(tolerance=args.tolerance)
+    for drift in drifts:
+        holder_id, market, stock_code = drift['key']
+        print(f"持有人 {holder_id} {market}-{stock_code}: 字段={drift['field']}, "
+              f"快照={drift['snapshot']}, 期望={drift['expected']}")
+
+    if drifts:
+        print(f"共发现 {len(drifts)} 处不一致")
+        sys.exit(1)
+    print("持仓快照与交易分单记录一致")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+盈利统计聚合校验脚本
+
+用固定随机种子生成几组交易分单记录（含空数据、单只股票、None 和无法转换的数值、
+同日多笔交易、多市场），将 ProfitAggregator 的输出与 fixtures/profit_golden.json
+中固定的结果逐项比较，并校验打乱输入顺序后结果不变、各种输出格式一致。
+
+用法: python scripts/verify_profit_aggregation.py
+      python scripts/verify_profit_aggregation.py --save   # 重新生成固定结果
+"""
+
+import os
+import sys
+import json
+import math
+import random
+import logging
+import argparse
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.profit_aggregator import ProfitAggregator
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'profit_golden.json')
+
+# (用例名, 分单数, 股票数, 随机种子)
+CASES = [
+    ('empty', 0, 1, 0),
+    ('single_stock', 40, 1, 1),
+    ('few_stocks', 300, 12, 2),
+    ('many_stocks', 1000, 80, 3)
+]
+
+def make_splits(count, stocks, seed=0, start=datetime(2018, 1, 1)):
+    """
+    生成与盈利统计查询结果结构相同的交易分单记录
+
+    Args:
+        count: 分单数
+        stocks: 股票数
+        seed: 随机种子
+        start: 最早交易日期
+    """
+    rng = random.Random(seed)
+    markets = ('HK', 'US', 'CN')
+    rows = []
+    for index in range(count):
+        stock = rng.randrange(stocks)
+        market = markets[stock % len(markets)]
+        quantity = rng.choice((100, 200, 500, 1000, None))
+        price = Decimal(str(round(rng.uniform(1, 500), 4)))
+        rows.append({
+            'id': index + 1,
+            'market': market,
+            'stock_code': f'{stock:05d}',
+            'stock_name': f'股票{stock}',
+            'transaction_type': rng.choice(('BUY', 'BUY', 'SELL', 'buy', 'Sell', None)),
+            # 日期范围较小，保证有同日多笔交易
+            'transaction_date': start + timedelta(days=rng.randrange(max(count // 3, 1))),
+            'total_quantity': quantity,
+            'total_amount': price * (quantity or 0),
+            'total_fees': rng.choice((Decimal('12.50'), Decimal('3.20'), None)),
+            'prev_avg_cost': rng.choice((price, Decimal('0'), None, 'n/a')),
+            'current_avg_cost': rng.choice((price, None)),
+            'transaction_count': 1
+        })
+    return rows
+
+def snapshot(market_stats, stock_stats, transaction_details):
+    """转换为可比较、可保存的结构，保留各部分的顺序"""
+    return json.loads(json.dumps({
+        'market_stats': list(market_stats.items()),
+        'stock_stats': list(stock_stats.items()),
+        'transaction_details': [
+            [stock_key, [[row['id'], row['transaction_type']] for row in rows]]
+            for stock_key, rows in transaction_details.items()
+        ]
+    }, default=str))
+
+def aggregate(rows):
+    return ProfitAggregator().add_all(rows).to_dict()
+
+def diff(expected, actual, path=''):
+    """比较两个结构，浮点数允许相对误差 1e-9，返回不一致的路径"""
+    if isinstance(expected, float) or isinstance(actual, float):
+        if isinstance(expected, (int, float)) and isinstance(actual, (int, float)) \
+                and math.isclose(expected, actual, rel_tol=1e-9, abs_tol=1e-9):
+            return []
+        return [f'{path}: {expected} != {actual}']
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [f'{path}: 长度 {len(expected)} != {len(actual)}']
+        problems = []
+        for index, (left, right) in enumerate(zip(expected, actual)):
+            problems.extend(diff(left, right, f'{path}[{index}]'))
+        return problems
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        if list(expected) != list(actual):
+            return [f'{path}: 字段 {list(expected)} != {list(actual)}']
+        problems = []
+        for key in expected:
+            problems.extend(diff(expected[key], actual[key], f'{path}.{key}'))
+        return problems
+    return [] if expected == actual else [f'{path}: {expected} != {actual}']
+
+def verify_case(name, rows, golden):
+    """校验一个用例，返回不一致的描述列表"""
+    problems = [f'{name} 固定结果 {p}' for p in diff(golden, snapshot(*aggregate([dict(r) for r in rows])))]
+
+    # 打乱输入顺序，结果应不变
+    shuffled = [dict(r) for r in rows]
+    random.Random(len(rows)).shuffle(shuffled)
+    problems.extend(f'{name} 打乱顺序 {p}' for p in diff(golden, snapshot(*aggregate(shuffled))))
+
+    # 扁平行和 JSON 输出与字典输出一致
+    aggregator = ProfitAggregator().add_all([dict(r) for r in rows])
+    market_stats, stock_stats, transaction_details = aggregator.to_dict()
+    if [row['stock_key'] for row in aggregator.to_rows()] != list(stock_stats):
+        problems.append(f'{name} to_rows 顺序与 stock_stats 不一致')
+    streamed = json.loads(''.join(aggregator.iter_json(lambda obj: json.dumps(obj, default=str))))
+    expected = json.loads(json.dumps({
+        'market_stats': market_stats,
+        'stock_stats': stock_stats,
+        'transaction_details': transaction_details
+    }, default=str))
+    if streamed != expected:
+        problems.append(f'{name} iter_json 输出与 to_dict 不一致')
+
+    # 不保留明细时汇总结果相同
+    summary = ProfitAggregator(keep_details=False).add_all([dict(r) for r in rows]).finish()
+    problems.extend(f'{name} 不保留明细 {p}' for p in diff(golden, snapshot(*summary, {}))
+                    if not p.startswith('.transaction_details'))
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description='盈利统计聚合校验')
+    parser.add_argument('--save', action='store_true', help='用当前实现重新生成固定结果')
+    args = parser.parse_args()
+
+    if args.save:
+        golden = {name: snapshot(*aggregate(make_splits(count, stocks, seed))) for name, count, stocks, seed in CASES}
+        with open(GOLDEN_PATH, 'w', encoding='utf-8') as f:
+            json.dump(golden, f, ensure_ascii=False, indent=1)
+        logger.info(f"已保存固定结果: {GOLDEN_PATH}")
+        return
+
+    with open(GOLDEN_PATH, encoding='utf-8') as f:
+        golden = json.load(f)
+
+    problems = []
+    for name, count, stocks, seed in CASES:
+        problems.extend(verify_case(name, make_splits(count, stocks, seed), golden[name]))
+
+    if problems:
+        for problem in problems[:50]:
+            logger.error(problem)
+        logger.error(f"校验失败: {len(problems)} 处不一致")
+        sys.exit(1)
+    logger.info(f"校验通过: {len(CASES)} 个用例")
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,17 @@
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
+import time
 import logging
-import json
-import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from config.database import db
 from models.exchange import ExchangeRate
+from services.quote_cache import quote_cache
+from services import http_client
+from services.http_client import FINANCE_BASE_URL
+from services import quote_page
+from services.time_series import time_series
+from services.rate_table import rate_table
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +24,9 @@ class CurrencyChecker:
         'SZ': 'SHE'      # 深圳证券交易所
     }
 
+    # 搜索股票的整体截止时间（秒）
+    SEARCH_DEADLINE = 20
+
     HEADERS = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -28,52 +37,99 @@ class CurrencyChecker:
     def update_temporary_rates():
         """
         查询并更新所有标记为TEMPORARY的汇率记录
-        使用实时汇率API更新，并将数据来源修改为EXCHANGE_RATES_API
         :return: 更新的记录数量
         """
+        return CurrencyChecker.update_temporary_rates_report()['updated_count']
+
+    @staticmethod
+    def update_temporary_rates_report():
+        """
+        按货币分组更新所有标记为TEMPORARY的汇率记录，并将数据来源修改为EXCHANGE_RATES_API
+        
+        每种货币的历史汇率只抓取一次，各记录按自己的日期从时间序列取值，
+        没有历史数据的日期使用该货币的实时汇率（同样只获取一次），最后一次性批量写回。
+        :return: 包含 updated_count、elapsed 和按货币统计的 currencies 列表的字典
+        """
+        started = time.monotonic()
+        report = {'updated_count': 0, 'elapsed': 0.0, 'currencies': []}
         try:
             # 查询所有TEMPORARY汇率记录
             temp_rates = ExchangeRate.find_temporary_rates()
             
             if not temp_rates:
                 logger.info("没有找到临时汇率记录")
-                return 0
-                
-            updated_count = 0
+                return report
             
+            rates_by_currency = {}
             for rate in temp_rates:
-                try:
-                    currency = rate.currency
-                    rate_date = rate.rate_date
-                    
-                    # 获取最新汇率
-                    new_rate_value = CurrencyChecker.get_exchange_rate(currency)
-                    
-                    if new_rate_value:
-                        # 更新汇率记录
-                        rate.rate = new_rate_value
-                        rate.source = 'EXCHANGE_RATES_API'
-                        
-                        if rate.save():
-                            updated_count += 1
-                            logger.info(f"已更新汇率: {currency} @ {rate_date}, 新汇率: {new_rate_value}")
-                    else:
-                        logger.warning(f"无法获取汇率: {currency}")
+                rates_by_currency.setdefault(rate.currency, []).append(rate)
+            
+            updates = []
+            updated_rates = []
+            for currency, rates in rates_by_currency.items():
+                currency_started = time.monotonic()
+                stats = {'currency': currency, 'total': len(rates), 'historical': 0, 'live': 0, 'failed': 0}
+                live_rate = None
+                
+                for rate in rates:
+                    try:
+                        new_rate_value = time_series.lookup(f'{currency}-HKD', rate.rate_date)
+                        if new_rate_value:
+                            stats['historical'] += 1
+                        else:
+                            # 没有历史数据时使用实时汇率
+                            if live_rate is None:
+                                live_rate = CurrencyChecker.get_exchange_rate(currency) or 0
+                            new_rate_value = live_rate
+                            if new_rate_value:
+                                stats['live'] += 1
                         
-                except Exception as e:
-                    logger.error(f"更新汇率记录时出错: {str(e)}")
-                    continue
-                    
-            return updated_count
+                        if new_rate_value:
+                            updates.append((rate.id, new_rate_value, 'EXCHANGE_RATES_API'))
+                            updated_rates.append((rate, new_rate_value))
+                        else:
+                            stats['failed'] += 1
+                            logger.warning(f"无法获取汇率: {currency} @ {rate.rate_date}")
+                    except Exception as e:
+                        stats['failed'] += 1
+                        logger.error(f"获取汇率 {currency} @ {rate.rate_date} 时出错: {str(e)}")
+                
+                stats['elapsed'] = round(time.monotonic() - currency_started, 3)
+                report['currencies'].append(stats)
+                logger.info(f"货币 {currency}: {stats}")
+            
+            # 一次性批量写回
+            report['updated_count'] = ExchangeRate.bulk_update(updates)
+            if report['updated_count'] < len(updates):
+                # 部分批次写入失败，无法确定哪些汇率已写入，重新装载查找表
+                rate_table.bump_version()
+            else:
+                for rate, new_rate_value in updated_rates:
+                    rate_table.upsert(rate.currency, rate.rate_date, new_rate_value)
+            logger.info(f"已更新 {report['updated_count']} 条临时汇率记录")
             
         except Exception as e:
             logger.error(f"更新临时汇率记录失败: {str(e)}")
-            return 0
+        
+        report['elapsed'] = round(time.monotonic() - started, 3)
+        return report
 
     @staticmethod
     def get_stock_price(query):
         """
-        使用确定的股票代码查询股价
+        使用确定的股票代码查询股价，优先使用进程内报价缓存
+        :param query: 完整的查询字符串，如 'NVDA:NASDAQ'
+        :return: 股票价格或 None
+        """
+        if not query:
+            logger.error('查询字符串为空')
+            return None
+        return quote_cache.get(query, lambda: CurrencyChecker._fetch_stock_price(query))
+
+    @staticmethod
+    def _fetch_stock_price(query):
+        """
+        从 Google Finance 查询股价
         :param query: 完整的查询字符串，如 'NVDA:NASDAQ'
         :return: 股票价格或 None
         """
@@ -87,7 +143,7 @@ class CurrencyChecker:
             
             # 添加时间戳防止缓存
             timestamp = int(datetime.now().timestamp() * 1000)
-            url = f'https://www.google.com/finance/quote/{query}?hl=zh&gl=CN&_={timestamp}'
+            url = f'{FINANCE_BASE_URL}/quote/{query}?hl=zh&gl=CN&_={timestamp}'
             
             # 增强请求头，添加缓存控制
             headers = CurrencyChecker.HEADERS.copy()
@@ -101,36 +157,21 @@ class CurrencyChecker:
             
             logger.info(f'请求URL: {url}')
             
-            # 增加超时时间和重试
-            for retry in range(3):
-                try:
-                    response = requests.get(url, headers=headers, timeout=15)
-                    response.raise_for_status()
-                    break
-                except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
-                    if retry < 2:  # 如果不是最后一次重试
-                        logger.warning(f'查询股票 {query} 超时或连接错误，正在重试 ({retry+1}/3): {str(e)}')
-                        continue
-                    else:
-                        raise  # 最后一次重试仍失败，抛出异常
+            response = http_client.get(url, headers=headers, timeout=15)
             
             # 检查响应内容
             if not response.text:
                 logger.error(f'查询股票 {query} 返回空响应')
                 return None
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 检查是否有价格元素
-            if not CurrencyChecker._check_price_exists(soup):
+            # 提取价格
+            result = CurrencyChecker._parse_quote_page(response.text)
+            if result['price'] is None:
                 logger.warning(f'查询股票 {query} 未找到价格元素')
                 # 保存响应内容以便调试
                 logger.debug(f'响应内容: {response.text[:500]}...')
                 return None
             
-            # 提取价格
-            result = CurrencyChecker._extract_price(soup)
-            
             if result and result.get('price'):
                 logger.info(f'成功获取股票 {query} 的价格: {result["price"]}')
                 return result['price']
@@ -149,10 +190,81 @@ class CurrencyChecker:
             return None
 
     @staticmethod
-    def search_stock(code):
+    def _search_candidates(code):
+        """
+        按优先级生成搜索股票时要尝试的查询
+        :param code: 股票代码
+        :return: (market, exchange, query, is_hk_variant) 列表，港股代码变体在前
+        """
+        candidates = []
+        
+        # 如果输入的是纯数字，优先尝试港股市场
+        if code.isdigit():
+            codes_to_try = []
+            
+            # 处理不同长度的数字
+            if len(code) <= 3:
+                # 补0到4位用于查询
+                codes_to_try.append(code.zfill(4))
+            elif len(code) == 5 and code.startswith('0'):
+                # 如果是5位数且以0开头，尝试去掉前导0
+                codes_to_try.append(code[1:])
+            elif len(code) == 4:
+                codes_to_try.append(code)
+            
+            logger.info(f"处理后的股票代码: {codes_to_try}")
+            candidates.extend(('HK', 'HKG', f"{try_code}:HKG", True) for try_code in codes_to_try)
+        
+        # 其他市场
+        for market, exchange in CurrencyChecker.MARKETS.items():
+            query = f"{code}:{exchange}"
+            if query not in {candidate[2] for candidate in candidates}:
+                candidates.append((market, exchange, query, False))
+        return candidates
+
+    @staticmethod
+    def _fetch_search_result(query, fallback_name):
+        """
+        查询一个候选股票的价格和名称
+        :param query: 查询字符串，如 '0700:HKG'
+        :param fallback_name: 页面中没有名称时使用的名称
+        :return: 包含 price 和 code_name 的字典，未找到价格时为 None
+        """
+        timestamp = int(datetime.now().timestamp() * 1000)
+        url = f'{FINANCE_BASE_URL}/quote/{query}?hl=zh&gl=CN&_={timestamp}'
+        
+        headers = CurrencyChecker.HEADERS.copy()
+        headers.update({
+            'Cache-Control': 'no-cache, no-store, must-revalidate',
+            'Pragma': 'no-cache',
+            'Expires': '0',
+            'If-None-Match': '*',
+            'If-Modified-Since': '0'
+        })
+        
+        logger.info(f"尝试查询: {query}, URL: {url}")
+        response = http_client.get(url, headers=headers, timeout=15)
+        
+        result = CurrencyChecker._parse_quote_page(response.text)
+        if not result['price']:
+            return None
+        
+        price = result['price']
+        quote_cache.put(query, price)
+        return {
+            'price': price,
+            'code_name': result['name'] or fallback_name
+        }
+
+    @staticmethod
+    def search_stock(code, deadline=None):
         """
-        搜索新股票时遍历不同市场
+        搜索新股票时并发查询所有候选市场
+        
+        港股代码变体和各市场的查询同时发出：任一港股变体找到价格时立即返回该结果，
+        否则等待其他市场的查询（最长到截止时间），结果按市场优先级排序。
         :param code: 股票代码
+        :param deadline: 整体截止时间（秒），默认 SEARCH_DEADLINE
         :return: 包含市场和价格信息的字典列表
         """
         try:
@@ -161,136 +273,55 @@ class CurrencyChecker:
                 return []
             
             logger.info(f"开始搜索股票: {code}")
-            results = []
             original_code = code
+            candidates = CurrencyChecker._search_candidates(code)
+            deadline_at = time.monotonic() + (deadline or CurrencyChecker.SEARCH_DEADLINE)
+            found = {}
             
-            # 如果输入的是纯数字，优先尝试港股市场
-            if code.isdigit():
-                codes_to_try = set()  # 使用集合去重
-                
-                # 处理不同长度的数字
-                if len(code) <= 3:
-                    # 补0到4位用于查询
-                    codes_to_try.add(code.zfill(4))
-                elif len(code) == 5 and code.startswith('0'):
-                    # 如果是5位数且以0开头，尝试去掉前导0
-                    codes_to_try.add(code[1:])
-                elif len(code) == 4:
-                    codes_to_try.add(code)
-                
-                logger.info(f"处理后的股票代码: {codes_to_try}")
-                
-                # 优先尝试港股市场
-                for try_code in codes_to_try:
-                    try:
-                        timestamp = int(datetime.now().timestamp() * 1000)
-                        query = f"{try_code}:HKG"
-                        url = f'https://www.google.com/finance/quote/{query}?hl=zh&gl=CN&_={timestamp}'
-                        
-                        logger.info(f"尝试查询港股: {query}, URL: {url}")
-                        
-                        headers = CurrencyChecker.HEADERS.copy()
-                        headers.update({
-                            'Cache-Control': 'no-cache, no-store, must-revalidate',
-                            'Pragma': 'no-cache',
-                            'Expires': '0',
-                            'If-None-Match': '*',
-                            'If-Modified-Since': '0'
-                        })
-                        
-                        # 增加重试和超时设置
-                        for retry in range(3):
-                            try:
-                                response = requests.get(url, headers=headers, timeout=15)
-                                response.raise_for_status()
-                                break
-                            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
-                                if retry < 2:
-                                    logger.warning(f"查询港股 {query} 超时或连接错误，正在重试 ({retry+1}/3): {str(e)}")
-                                    continue
-                                else:
-                                    raise
-                        
-                        soup = BeautifulSoup(response.text, 'html.parser')
-                        result = CurrencyChecker._extract_price(soup)
-                        
-                        if result and result.get('price'):
-                            price = result['price']
-                            name_element = soup.find('div', {'class': 'zzDege'})
-                            stock_name = name_element.text if name_element else try_code
-                            
-                            logger.info(f"找到港股: {try_code}, 名称: {stock_name}, 价格: {price}")
-                            
-                            results.append({
-                                'market': 'HK',
-                                'exchange': 'HKG',
-                                'price': price,
-                                'query': query,
-                                'code_name': stock_name,
-                                'code': original_code  # 保持原始代码
-                            })
-                            # 如果找到了港股，直接返回结果
-                            if results:
-                                return results
-                    except Exception as e:
-                        logger.error(f"搜索港股 {try_code} 时发生错误: {str(e)}")
-                        continue
-
-            # 如果没有找到港股或输入不是纯数字，遍历其他市场
-            for market, exchange in CurrencyChecker.MARKETS.items():
-                if market == 'HK' and results:  # 如果已经找到港股结果，跳过
-                    continue
-                
-                try:
-                    timestamp = int(datetime.now().timestamp() * 1000)
-                    query = f"{original_code}:{exchange}"
-                    url = f'https://www.google.com/finance/quote/{query}?hl=zh&gl=CN&_={timestamp}'
-                    
-                    logger.info(f"尝试查询市场 {market}: {query}, URL: {url}")
-                    
-                    headers = CurrencyChecker.HEADERS.copy()
-                    headers.update({
-                        'Cache-Control': 'no-cache, no-store, must-revalidate',
-                        'Pragma': 'no-cache',
-                        'Expires': '0',
-                        'If-None-Match': '*',
-                        'If-Modified-Since': '0'
-                    })
-                    
-                    # 增加重试和超时设置
-                    for retry in range(3):
+            executor = ThreadPoolExecutor(max_workers=len(candidates))
+            try:
+                pending = {
+                    executor.submit(CurrencyChecker._fetch_search_result, query, query.split(':')[0]): index
+                    for index, (market, exchange, query, is_hk_variant) in enumerate(candidates)
+                }
+                hk_variants = {index for index, candidate in enumerate(candidates) if candidate[3]}
+                while pending:
+                    remaining = deadline_at - time.monotonic()
+                    if remaining <= 0:
+                        logger.warning(f"搜索股票 {code} 超过截止时间，{len(pending)} 个查询未完成")
+                        break
+                    done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index = pending.pop(future)
+                        market, exchange, query, is_hk_variant = candidates[index]
                         try:
-                            response = requests.get(url, headers=headers, timeout=15)
-                            response.raise_for_status()
-                            break
-                        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
-                            if retry < 2:
-                                logger.warning(f"查询市场 {market} 股票 {query} 超时或连接错误，正在重试 ({retry+1}/3): {str(e)}")
-                                continue
-                            else:
-                                raise
-                    
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    result = CurrencyChecker._extract_price(soup)
+                            result = future.result()
+                        except Exception as e:
+                            logger.error(f"搜索市场 {market} ({query}) 时发生错误: {str(e)}")
+                            continue
+                        if result:
+                            logger.info(f"找到市场 {market} 股票: {query}, 名称: {result['code_name']}, 价格: {result['price']}")
+                            found[index] = result
                     
-                    if result and result.get('price'):
-                        price = result['price']
-                        name_element = soup.find('div', {'class': 'zzDege'})
-                        stock_name = name_element.text if name_element else original_code
-                        
-                        logger.info(f"找到市场 {market} 股票: {original_code}, 名称: {stock_name}, 价格: {price}")
-                        
-                        results.append({
-                            'market': market,
-                            'exchange': exchange,
-                            'price': price,
-                            'query': query,
-                            'code_name': stock_name,
-                            'code': original_code  # 保持原始代码
-                        })
-                except Exception as e:
-                    logger.error(f"搜索市场 {market} 时发生错误: {str(e)}")
-                    continue
+                    # 找到港股代码变体时直接返回，不再等待其他市场
+                    if found.keys() & hk_variants:
+                        break
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+            
+            hk_found = sorted(found.keys() & hk_variants)
+            indexes = hk_found[:1] if hk_found else sorted(found)
+            results = []
+            for index in indexes:
+                market, exchange, query, is_hk_variant = candidates[index]
+                results.append({
+                    'market': market,
+                    'exchange': exchange,
+                    'price': found[index]['price'],
+                    'query': query,
+                    'code_name': found[index]['code_name'],
+                    'code': original_code  # 保持原始代码
+                })
             
             logger.info(f"搜索结果: 找到 {len(results)} 条记录")
             return results
@@ -301,20 +332,31 @@ class CurrencyChecker:
     @staticmethod
     def get_exchange_rate(from_currency, to_currency='HKD'):
         """
-        获取汇率
+        获取汇率，优先使用进程内报价缓存
+        :param from_currency: 源货币代码，如 'USD'
+        :param to_currency: 目标货币代码，默认为 'HKD'
+        :return: 汇率值或 None
+        """
+        return quote_cache.get(
+            f'{from_currency}-{to_currency}',
+            lambda: CurrencyChecker._fetch_exchange_rate(from_currency, to_currency)
+        )
+
+    @staticmethod
+    def _fetch_exchange_rate(from_currency, to_currency='HKD'):
+        """
+        从 Google Finance 获取汇率
         :param from_currency: 源货币代码，如 'USD'
         :param to_currency: 目标货币代码，默认为 'HKD'
         :return: 汇率值或 None
         """
         try:
-            url = f'https://www.google.com/finance/quote/{from_currency}-{to_currency}'
-            response = requests.get(url, headers=CurrencyChecker.HEADERS, timeout=10)
-            response.raise_for_status()
+            url = f'{FINANCE_BASE_URL}/quote/{from_currency}-{to_currency}'
+            response = http_client.get(url, headers=CurrencyChecker.HEADERS, timeout=10)
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            result = CurrencyChecker._extract_price(soup)
+            result = CurrencyChecker._parse_quote_page(response.text)
             
-            if result and result['price']:
+            if result['price']:
                 return result['price']
             return None
             
@@ -322,6 +364,36 @@ class CurrencyChecker:
             logger.error(f'获取汇率 {from_currency}/{to_currency} 失败: {str(e)}')
             return None
 
+    @staticmethod
+    def get_quote_cache_stats():
+        """
+        获取报价缓存的命中计数
+        :return: 计数字典
+        """
+        return quote_cache.stats()
+
+    @staticmethod
+    def _parse_quote_page(page):
+        """
+        解析报价页面中的价格和名称
+        先在原始HTML上定向扫描，找不到价格时再用 BeautifulSoup 构建DOM解析
+        :param page: 页面HTML文本
+        :return: 包含 price 和 name 的字典
+        """
+        result = quote_page.parse_quote(page)
+        if result['price'] is not None:
+            return result
+        
+        soup = BeautifulSoup(page, 'html.parser')
+        if not CurrencyChecker._check_price_exists(soup):
+            return result
+        
+        name_element = soup.find('div', {'class': 'zzDege'})
+        return {
+            'price': CurrencyChecker._extract_price(soup).get('price'),
+            'name': name_element.text if name_element else result['name']
+        }
+
     @staticmethod
     def _check_price_exists(soup):
         """检查页面中是否存在价格元素"""
@@ -388,59 +460,47 @@ class CurrencyChecker:
             logger.error(f"提取价格时出错: {str(e)}")
             return {'price': None}
 
+    @staticmethod
+    def get_history(symbol, window='1Y'):
+        """
+        抓取一个货币对或股票的整段历史数据
+        :param symbol: 货币对（如 'USD-HKD'）或股票代码（如 '0981:HKG'）
+        :param window: 图表窗口，如 '1Y'、'5Y'、'MAX'
+        :return: 按日期升序的 (date, value) 列表，失败时为空列表
+        """
+        try:
+            url = f'{FINANCE_BASE_URL}/quote/{symbol}?window={window}'
+            response = http_client.get(url, headers=CurrencyChecker.HEADERS, timeout=10)
+
+            # 直接在原始页面中查找数据脚本，不构建DOM
+            data = quote_page.extract_finance_data(response.text)
+            if not data or 'lines' not in data or len(data['lines']) == 0:
+                return []
+
+            history = {}
+            for point in data['lines'][0].get('points', []):
+                history[datetime.fromtimestamp(point[0]/1000).date()] = point[1]
+            return sorted(history.items())
+
+        except Exception as e:
+            logger.error(f'获取 {symbol} 历史数据时出错: {str(e)}')
+            return []
+
     @staticmethod
     def get_historical_rate(currency_pair, date):
         """
-        获取历史汇率
+        获取历史汇率，从本地时间序列按日期查找，本地没有时整段抓取一次
         :param currency_pair: 货币对（如 'USD/HKD'）或股票代码（如 '0981:HKG'）
         :param date: 日期（datetime对象或YYYY-MM-DD格式的字符串）
         :return: 该日期的汇率值或股票价格，或 None
         """
         try:
-            if isinstance(date, str):
-                target_date = datetime.strptime(date, '%Y-%m-%d')
-            elif isinstance(date, datetime):
-                target_date = date
-            else:
+            if not isinstance(date, (str, datetime)):
                 raise ValueError("日期格式不正确")
 
-            if '/' in currency_pair:
-                from_currency, to_currency = currency_pair.split('/')
-                url = f'https://www.google.com/finance/quote/{from_currency}-{to_currency}?window=1Y'
-            else:
-                url = f'https://www.google.com/finance/quote/{currency_pair}?window=1Y'
-
-            response = requests.get(url, headers=CurrencyChecker.HEADERS, timeout=10)
-            response.raise_for_status()
-
-            soup = BeautifulSoup(response.text, 'html.parser')
-            scripts = soup.find_all('script')
-            data_pattern = re.compile(r'window.google.finance.data\s*=\s*({.*?});', re.DOTALL)
-            
-            historical_data = None
-            target_date_str = target_date.strftime('%Y-%m-%d')
-            
-            for script in scripts:
-                if script.string:
-                    match = data_pattern.search(script.string)
-                    if match:
-                        data_json = match.group(1)
-                        try:
-                            data = json.loads(data_json)
-                            if 'lines' in data and len(data['lines']) > 0:
-                                points = data['lines'][0].get('points', [])
-                                
-                                for point in points:
-                                    point_date = datetime.fromtimestamp(point[0]/1000).strftime('%Y-%m-%d')
-                                    if point_date == target_date_str:
-                                        historical_data = point[1]
-                                        return historical_data
-                                
-                        except json.JSONDecodeError:
-                            continue
-
-            return None
+            symbol = currency_pair.replace('/', '-')
+            return time_series.lookup(symbol, date, exact=True)
 
         except Exception as e:
             logger.error(f'获取历史数据时出错: {str(e)}')
-            return None 
\ No newline at end of file
+            return None
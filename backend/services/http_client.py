@@ -0,0 +1,96 @@
+"""
+共享HTTP客户端
+
+所有抓取请求共用一个带连接池的 requests.Session，保持长连接并启用压缩传输；
+超时、连接错误以及 429/5xx 响应按指数退避加随机抖动重试。
+FINANCE_BASE_URL 可以指向本地桩服务器，用于测试和性能测试。
+"""
+import os
+import time
+import random
+import threading
+import logging
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Google Finance 地址，可指向本地桩服务器（如 http://127.0.0.1:8765/finance）
+FINANCE_BASE_URL = os.environ.get('FINANCE_BASE_URL', 'https://www.google.com/finance').rstrip('/')
+FINANCE_HOST = urlparse(FINANCE_BASE_URL).netloc
+
+# 每个主机保持的连接数
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 16))
+# 最大重试次数（不含第一次请求）
+HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', 2))
+# 退避基数和上限（秒）
+HTTP_BACKOFF_BASE = float(os.environ.get('HTTP_BACKOFF_BASE', 0.5))
+HTTP_BACKOFF_MAX = float(os.environ.get('HTTP_BACKOFF_MAX', 8))
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """获取进程内共享的 Session"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update({
+                    'Accept-Encoding': 'gzip, deflate',
+                    'Connection': 'keep-alive'
+                })
+                _session = session
+    return _session
+
+def backoff_delay(attempt, base=None, cap=None):
+    """
+    第 attempt 次重试前的等待时间：在 [0, min(cap, base * 2^attempt)] 内随机取值
+
+    Args:
+        attempt: 重试序号，从0开始
+        base: 退避基数（秒）
+        cap: 退避上限（秒）
+    """
+    base = HTTP_BACKOFF_BASE if base is None else base
+    cap = HTTP_BACKOFF_MAX if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def get(url, headers=None, timeout=15, max_retries=None, **kwargs):
+    """
+    发送GET请求，失败时按指数退避加抖动重试
+
+    Args:
+        url: 请求地址
+        headers: 请求头
+        timeout: 单次请求超时（秒）
+        max_retries: 最大重试次数，默认 HTTP_MAX_RETRIES
+
+    Returns:
+        requests.Response: 状态码为2xx的响应
+
+    Raises:
+        requests.exceptions.RequestException: 重试后仍失败
+    """
+    max_retries = HTTP_MAX_RETRIES if max_retries is None else max_retries
+    session = get_session()
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.get(url, headers=headers, timeout=timeout, **kwargs)
+            if response.status_code in RETRY_STATUS_CODES and attempt < max_retries:
+                logger.warning(f"请求 {url} 返回 {response.status_code}，正在重试 ({attempt + 1}/{max_retries})")
+            else:
+                response.raise_for_status()
+                return response
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            if attempt >= max_retries:
+                raise
+            logger.warning(f"请求 {url} 超时或连接错误，正在重试 ({attempt + 1}/{max_retries}): {str(e)}")
+        time.sleep(backoff_delay(attempt))
@@ -0,0 +1,71 @@
+"""
+并发只读查询
+
+在有上限的线程池中并发执行互不依赖的阻塞查询，一组查询的耗时取决于最慢的一个，
+而不是各查询耗时之和。每个查询从连接池借出自己的连接（ConnectionPool 是线程安全的），
+不与其他线程共享全局 db 对象：config.database.db 未约定线程安全，不能在工作线程中使用。
+工作线程没有请求上下文，需要的请求数据（如 VisibilityScope）在提交前计算好。
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.db import get_pooled_connection, ConnectionQueries
+
+logger = logging.getLogger(__name__)
+
+# 同时执行的查询数量上限
+PARALLEL_READ_WORKERS = int(os.environ.get('PARALLEL_READ_WORKERS', 8))
+
+class ParallelReader:
+    """并发只读查询"""
+
+    def __init__(self, max_workers=PARALLEL_READ_WORKERS):
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        """线程池在首次使用时创建，fork 出的子进程重新创建"""
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='parallel-read')
+                self._pid = os.getpid()
+            return self._executor
+
+    @staticmethod
+    def _read(read):
+        """借出连接执行一个查询，返回 (结果, 耗时)"""
+        started = time.perf_counter()
+        with get_pooled_connection() as conn:
+            result = read(ConnectionQueries(conn))
+        return result, time.perf_counter() - started
+
+    def run(self, **reads):
+        """
+        并发执行多个查询
+
+        Args:
+            reads: 名称到查询函数的映射，查询函数接收一个提供 fetch_one、fetch_all、cursor 的 db_conn
+
+        Returns:
+            dict: 名称到查询结果的映射，任一查询失败时抛出其异常
+        """
+        started = time.perf_counter()
+        executor = self._get_executor()
+        futures = {name: executor.submit(ParallelReader._read, read) for name, read in reads.items()}
+
+        results = {}
+        elapsed = {}
+        for name, future in futures.items():
+            results[name], elapsed[name] = future.result()
+
+        logger.info(
+            f"并发查询完成，总耗时 {time.perf_counter() - started:.3f} 秒: "
+            + ', '.join(f"{name} {seconds:.3f} 秒" for name, seconds in elapsed.items())
+        )
+        return results
+
+parallel_reader = ParallelReader()
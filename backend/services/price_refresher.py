@@ -0,0 +1,127 @@
+"""
+股票价格并发刷新
+
+用有上限的线程池并发查询多只股票的价格，按主机限制请求速率，并设置整体截止时间：
+截止时间到达时直接返回已完成的结果，未完成的查询记为超时。
+刷新耗时取决于最慢的一次查询，而不是所有查询耗时之和。
+"""
+import os
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from services.currency_checker import CurrencyChecker
+from services.http_client import FINANCE_HOST
+
+logger = logging.getLogger(__name__)
+
+# 并发查询数量上限
+PRICE_REFRESH_WORKERS = int(os.environ.get('PRICE_REFRESH_WORKERS', 8))
+# 每个主机每秒最多发起的请求数
+PRICE_REFRESH_RATE_PER_HOST = float(os.environ.get('PRICE_REFRESH_RATE_PER_HOST', 5))
+# 整体截止时间（秒）
+PRICE_REFRESH_DEADLINE = float(os.environ.get('PRICE_REFRESH_DEADLINE', 20))
+
+# 股票报价查询都发往同一主机
+PRICE_HOST = FINANCE_HOST
+
+class HostRateLimiter:
+    """按主机限制请求速率，同一主机相邻两次请求至少间隔 1/rate 秒"""
+
+    def __init__(self, rate_per_host):
+        self.interval = 1.0 / rate_per_host if rate_per_host and rate_per_host > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def acquire(self, host, deadline=None):
+        """
+        等待主机的下一个请求时段
+
+        Args:
+            host: 主机名
+            deadline: time.monotonic() 表示的截止时间，等待会超过截止时间时放弃
+
+        Returns:
+            bool: 是否获得请求时段
+        """
+        if self.interval <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            if deadline is not None and slot > deadline:
+                return False
+            self._next_slot[host] = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+class PriceRefresher:
+    """股票价格并发刷新"""
+
+    def __init__(self, max_workers=None, rate_per_host=None, deadline=None, fetch=None):
+        """
+        Args:
+            max_workers: 并发查询数量上限，默认 PRICE_REFRESH_WORKERS
+            rate_per_host: 每个主机每秒请求数，默认 PRICE_REFRESH_RATE_PER_HOST
+            deadline: 整体截止时间（秒），默认 PRICE_REFRESH_DEADLINE
+            fetch: 查询单个价格的函数，默认 CurrencyChecker.get_stock_price
+        """
+        self.max_workers = max_workers or PRICE_REFRESH_WORKERS
+        self.deadline = deadline or PRICE_REFRESH_DEADLINE
+        self.rate_limiter = HostRateLimiter(PRICE_REFRESH_RATE_PER_HOST if rate_per_host is None else rate_per_host)
+        self.fetch = fetch or CurrencyChecker.get_stock_price
+
+    def _fetch_one(self, query, deadline_at):
+        """在速率限制下查询一个价格，截止时间前没有轮到时抛出 TimeoutError"""
+        if not self.rate_limiter.acquire(PRICE_HOST, deadline_at):
+            raise TimeoutError(f"查询 {query} 在截止时间前未获得请求时段")
+        return self.fetch(query)
+
+    def fetch_prices(self, queries):
+        """
+        并发查询多个价格
+
+        Args:
+            queries: 查询字符串列表，如 ['0700:HKG', 'NVDA:NASDAQ']
+
+        Returns:
+            dict: prices 为 {query: price}（价格可能为 None），timed_out 为截止时间前未完成的查询，
+                  elapsed 为耗时（秒）
+        """
+        queries = list(dict.fromkeys(q for q in queries if q))
+        started = time.monotonic()
+        deadline_at = started + self.deadline
+        prices = {}
+
+        if not queries:
+            return {'prices': prices, 'timed_out': [], 'elapsed': 0.0}
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(queries)))
+        try:
+            pending = {executor.submit(self._fetch_one, query, deadline_at): query for query in queries}
+            while pending:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    query = pending.pop(future)
+                    try:
+                        prices[query] = future.result()
+                    except TimeoutError:
+                        continue
+                    except Exception as e:
+                        logger.error(f"查询股票 {query} 价格失败: {str(e)}")
+                        prices[query] = None
+        finally:
+            # 截止时间已到时不等待仍在进行的查询
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        timed_out = [query for query in queries if query not in prices]
+        elapsed = time.monotonic() - started
+        if timed_out:
+            logger.warning(f"价格刷新超过截止时间 {self.deadline} 秒，{len(timed_out)} 个查询未完成: {timed_out}")
+        logger.info(f"价格刷新完成: {len(prices)}/{len(queries)} 个查询完成，耗时 {elapsed:.2f} 秒")
+        return {'prices': prices, 'timed_out': timed_out, 'elapsed': elapsed}
@@ -0,0 +1,349 @@
+"""
+盈利统计聚合
+
+单次遍历交易分单记录，按股票累加统计，不要求输入有序：每只股票的第一条记录、最后一次买入
+和最后交易日期按 (transaction_date, id) 比较得到，结束时只对股票和市场排序。
+汇总结果可输出为 /api/profit 的字典结构、逐段的 JSON 文本或扁平的股票行。
+指定港币换算函数时，市场统计另外按交易日期的汇率累加港币金额，持仓市值按当天汇率换算。
+"""
+import json
+import logging
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+# 持仓股票累加到 holding_stats 的字段
+HOLDING_FIELDS = ('total_buy', 'total_sell', 'total_fees', 'realized_profit', 'market_value', 'holding_profit')
+# 已清仓股票累加到 closed_stats 的字段
+CLOSED_FIELDS = ('total_buy', 'total_sell', 'total_fees', 'realized_profit')
+# 指定港币换算函数时市场统计的港币字段
+HKD_FIELDS = ('total_buy_hkd', 'total_sell_hkd', 'total_fees_hkd', 'realized_profit_hkd',
+              'market_value_hkd', 'holding_profit_hkd', 'total_profit_hkd')
+
+def _new_market_stats(with_hkd=False):
+    """初始化市场统计"""
+    market_stats = {
+        'transaction_count': 0,
+        'total_buy': 0,
+        'total_sell': 0,
+        'total_fees': 0,
+        'realized_profit': 0,
+        'market_value': 0,
+        'holding_profit': 0,
+        'total_profit': 0,
+        'profit_rate': 0,
+        'holding_stats': {
+            'count': 0,
+            'total_buy': 0,
+            'total_sell': 0,
+            'total_fees': 0,
+            'realized_profit': 0,
+            'market_value': 0,
+            'holding_profit': 0,
+            'total_profit': 0,
+            'profit_rate': 0
+        },
+        'closed_stats': {
+            'count': 0,
+            'total_buy': 0,
+            'total_sell': 0,
+            'total_fees': 0,
+            'realized_profit': 0,
+            'profit_rate': 0
+        }
+    }
+    if with_hkd:
+        market_stats.update(dict.fromkeys(HKD_FIELDS, 0), hkd_missing_count=0)
+    return market_stats
+
+def normalize_transaction_type(row):
+    """将交易记录的交易类型转换为大写，缺失时视为买入，返回转换后的交易类型"""
+    row['transaction_type'] = row['transaction_type'].upper() if row.get('transaction_type') else 'BUY'
+    return row['transaction_type']
+
+def _to_float(value):
+    """安全地转换数值，None 或无法转换时为 0"""
+    if value is None:
+        return 0
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0
+
+class _StockState:
+    """单只股票的累加状态"""
+
+    __slots__ = ('market', 'stock_code', 'stock_name', 'first_key', 'first_avg_cost', 'last_key',
+                 'last_buy_key', 'last_buy_avg_cost', 'quantity', 'total_buy', 'total_sell',
+                 'total_fees', 'realized_profit', 'count', 'details')
+
+    def __init__(self, market, stock_code, key, row, keep_details):
+        self.market = market
+        self.stock_code = stock_code
+        self.stock_name = row.get('stock_name', stock_code)
+        self.first_key = key
+        self.first_avg_cost = row.get('current_avg_cost')
+        self.last_key = key
+        self.last_buy_key = None
+        self.last_buy_avg_cost = None
+        self.quantity = 0
+        self.total_buy = 0
+        self.total_sell = 0
+        self.total_fees = 0
+        self.realized_profit = 0
+        self.count = 0
+        self.details = [] if keep_details else None
+
+class ProfitAggregator:
+    """
+    盈利统计聚合器
+
+    用法:
+        aggregator = ProfitAggregator()
+        aggregator.add_all(rows)
+        market_stats, stock_stats, transaction_details = aggregator.to_dict()
+    """
+
+    def __init__(self, keep_details=True, to_hkd=None):
+        """
+        Args:
+            keep_details: 是否保留交易记录用于输出 transaction_details，
+                          为 False 时内存只与股票数有关
+            to_hkd: 港币换算函数 (金额, 市场, 日期) -> 港币金额，没有汇率时返回 None；
+                    为 None 时不输出港币字段
+        """
+        self.keep_details = keep_details
+        self.to_hkd = to_hkd
+        self._stocks = {}
+        self._markets = {}
+        self._result = None
+
+    def add(self, row):
+        """累加一条交易分单记录，交易类型会被转换为大写"""
+        transaction_type = normalize_transaction_type(row)
+        key = (row['transaction_date'], row['id'])
+        market = row['market']
+        stock_key = f"{market}-{row['stock_code']}"
+
+        state = self._stocks.get(stock_key)
+        if state is None:
+            state = self._stocks[stock_key] = _StockState(market, row['stock_code'], key, row, self.keep_details)
+        elif key < state.first_key:
+            state.first_key = key
+            state.stock_name = row.get('stock_name', state.stock_code)
+            state.first_avg_cost = row.get('current_avg_cost')
+        elif key > state.last_key:
+            state.last_key = key
+
+        market_entry = self._markets.get(market)
+        if market_entry is None:
+            market_entry = self._markets[market] = [key, _new_market_stats(self.to_hkd is not None)]
+        elif key < market_entry[0]:
+            market_entry[0] = key
+        market_stat = market_entry[1]
+
+        total_amount = _to_float(row.get('total_amount'))
+        total_quantity = _to_float(row.get('total_quantity'))
+        total_fees = _to_float(row.get('total_fees'))
+
+        state.count += 1
+        state.total_fees += total_fees
+        market_stat['transaction_count'] += row.get('transaction_count', 1)
+        market_stat['total_fees'] += total_fees
+        if transaction_type == 'BUY':
+            state.quantity += total_quantity
+            state.total_buy += total_amount
+            market_stat['total_buy'] += total_amount
+            if state.last_buy_key is None or key > state.last_buy_key:
+                state.last_buy_key = key
+                state.last_buy_avg_cost = row.get('current_avg_cost')
+            if self.to_hkd is not None:
+                market_stat['total_buy_hkd'] += self._hkd(market_stat, total_amount, market, key[0])
+        else:
+            state.quantity -= total_quantity
+            state.total_sell += total_amount
+            market_stat['total_sell'] += total_amount
+
+            # 卖出收入 - 买入成本 - 相关费用
+            realized_profit = total_amount - (total_quantity * _to_float(row.get('prev_avg_cost'))) - total_fees
+            state.realized_profit += realized_profit
+            market_stat['realized_profit'] += realized_profit
+            if self.to_hkd is not None:
+                market_stat['total_sell_hkd'] += self._hkd(market_stat, total_amount, market, key[0])
+                market_stat['realized_profit_hkd'] += self._hkd(market_stat, realized_profit, market, key[0])
+        if self.to_hkd is not None:
+            market_stat['total_fees_hkd'] += self._hkd(market_stat, total_fees, market, key[0])
+
+        if state.details is not None:
+            state.details.append(row)
+
+    def _hkd(self, market_stat, amount, market, rate_date):
+        """换算为港币，没有汇率时按 0 累加并计入 hkd_missing_count"""
+        if not amount:
+            return 0
+        value = self.to_hkd(amount, market, rate_date)
+        if value is None:
+            market_stat['hkd_missing_count'] += 1
+            return 0
+        return value
+
+    def add_all(self, rows):
+        """累加多条交易分单记录"""
+        for row in rows:
+            self.add(row)
+        return self
+
+    def _stock_stat(self, state):
+        """根据累加状态计算股票统计"""
+        current_price = _to_float(state.first_avg_cost)
+        stat = {
+            'market': state.market,
+            'stock_code': state.stock_code,
+            'stock_name': state.stock_name,
+            'current_quantity': state.quantity,
+            'transaction_count': state.count,
+            'total_buy': state.total_buy,
+            'total_sell': state.total_sell,
+            'total_fees': state.total_fees,
+            'realized_profit': state.realized_profit,
+            'current_price': current_price,
+            'market_value': 0,
+            'holding_profit': 0,
+            'total_profit': 0,
+            'profit_rate': 0,
+            'average_cost': 0,
+            'last_transaction_date': state.last_key[0]
+        }
+        if state.quantity > 0:
+            # 使用最后一次买入的移动加权平均价格作为平均成本
+            stat['average_cost'] = _to_float(state.last_buy_avg_cost)
+            stat['market_value'] = state.quantity * current_price
+            stat['holding_profit'] = stat['market_value'] - state.quantity * stat['average_cost']
+        stat['total_profit'] = stat['realized_profit'] + stat['holding_profit']
+        if stat['total_buy'] > 0:
+            stat['profit_rate'] = stat['total_profit'] / stat['total_buy'] * 100
+        return stat
+
+    def finish(self):
+        """
+        计算汇总结果，可重复调用
+
+        Returns:
+            tuple: (market_stats, stock_stats)，市场按首笔交易排序，
+                   股票按市场分组、组内按最后交易日期降序
+        """
+        if self._result is not None:
+            return self._result
+
+        market_stats = {
+            market: entry[1]
+            for market, entry in sorted(self._markets.items(), key=lambda item: item[1][0])
+        }
+
+        # 按首笔交易顺序计算股票统计并累加到市场统计，持仓市值按当天汇率换算港币
+        today = date.today()
+        stocks_by_market = {market: [] for market in market_stats}
+        for stock_key, state in sorted(self._stocks.items(), key=lambda item: item[1].first_key):
+            stat = self._stock_stat(state)
+            stocks_by_market[state.market].append((stock_key, stat))
+
+            market_stat = market_stats[state.market]
+            market_stat['realized_profit'] += stat['realized_profit']
+            if stat['current_quantity'] > 0:
+                holding_stats = market_stat['holding_stats']
+                holding_stats['count'] += 1
+                for field in HOLDING_FIELDS:
+                    holding_stats[field] += stat[field]
+                market_stat['market_value'] += stat['market_value']
+                market_stat['holding_profit'] += stat['holding_profit']
+                if self.to_hkd is not None:
+                    market_stat['market_value_hkd'] += self._hkd(market_stat, stat['market_value'], state.market, today)
+                    market_stat['holding_profit_hkd'] += self._hkd(market_stat, stat['holding_profit'], state.market, today)
+            else:
+                closed_stats = market_stat['closed_stats']
+                closed_stats['count'] += 1
+                for field in CLOSED_FIELDS:
+                    closed_stats[field] += stat[field]
+
+        for market_stat in market_stats.values():
+            holding_stats = market_stat['holding_stats']
+            holding_stats['total_profit'] = holding_stats['realized_profit'] + holding_stats['holding_profit']
+            if holding_stats['total_buy'] > 0:
+                holding_stats['profit_rate'] = (holding_stats['total_profit'] / holding_stats['total_buy']) * 100
+
+            closed_stats = market_stat['closed_stats']
+            if closed_stats['total_buy'] > 0:
+                closed_stats['profit_rate'] = (closed_stats['realized_profit'] / closed_stats['total_buy']) * 100
+
+            market_stat['total_profit'] = market_stat['realized_profit'] + market_stat['holding_profit']
+            if self.to_hkd is not None:
+                market_stat['total_profit_hkd'] = market_stat['realized_profit_hkd'] + market_stat['holding_profit_hkd']
+            if market_stat['total_buy'] > 0:
+                market_stat['profit_rate'] = (market_stat['total_profit'] / market_stat['total_buy']) * 100
+
+        # 组内按最后交易日期降序，日期相同时保持首笔交易顺序
+        stock_stats = {}
+        for market_stocks in stocks_by_market.values():
+            market_stocks.sort(key=lambda item: item[1]['last_transaction_date'], reverse=True)
+            stock_stats.update(market_stocks)
+
+        self._result = (market_stats, stock_stats)
+        return self._result
+
+    def iter_details(self):
+        """
+        按首笔交易顺序逐只股票产出交易记录，股票内按 (transaction_date, id) 升序
+
+        Yields:
+            tuple: (stock_key, 交易记录列表)
+        """
+        if not self.keep_details:
+            return
+        for stock_key, state in sorted(self._stocks.items(), key=lambda item: item[1].first_key):
+            state.details.sort(key=lambda row: (row['transaction_date'], row['id']))
+            yield stock_key, state.details
+
+    def to_dict(self):
+        """
+        输出为 /api/profit 的字典结构
+
+        Returns:
+            tuple: (market_stats, stock_stats, transaction_details)
+        """
+        market_stats, stock_stats = self.finish()
+        return market_stats, stock_stats, dict(self.iter_details())
+
+    def to_rows(self):
+        """
+        输出为扁平的股票行，每行为一只股票的统计加上 stock_key
+
+        Returns:
+            list: 按 stock_stats 顺序排列的股票行
+        """
+        _, stock_stats = self.finish()
+        return [dict(stat, stock_key=stock_key) for stock_key, stat in stock_stats.items()]
+
+    def iter_json(self, dumps=json.dumps):
+        """逐段输出 JSON 文本，结构与 to_dict 相同"""
+        market_stats, stock_stats = self.finish()
+        summary = {'market_stats': market_stats, 'stock_stats': stock_stats}
+        return iter_json(summary, self.iter_details() if self.keep_details else None, dumps)
+
+def iter_json(summary, detail_groups, dumps=json.dumps):
+    """
+    逐段输出 JSON 文本：先输出汇总部分，再按股票逐段输出 transaction_details
+
+    Args:
+        summary: 汇总部分的字典
+        detail_groups: (stock_key, 交易记录列表) 迭代器，None 表示不输出明细
+        dumps: JSON 序列化函数
+    """
+    yield dumps(summary)[:-1]
+    if detail_groups is not None:
+        yield ', "transaction_details": {'
+        separator = ''
+        for stock_key, stock_transactions in detail_groups:
+            yield separator + dumps(stock_key) + ': ' + dumps(stock_transactions)
+            separator = ', '
+        yield '}'
+    yield '}'
@@ -0,0 +1,158 @@
+"""
+进程内报价缓存
+
+按 Google Finance 查询字符串（如 '0700:HKG'、'USD-HKD'）缓存报价：
+- 按市场设置有效期（TTL），有效期内直接返回缓存值
+- 过期后的一段时间内先返回旧值，同时在后台刷新（stale-while-revalidate）
+- 同一查询的并发未命中只发起一次请求，其余请求等待其结果（single-flight）
+- 记录命中、未命中等计数，用于调整有效期
+"""
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 各市场报价的有效期（秒），键为查询字符串中冒号后的交易所代码
+QUOTE_TTL = {
+    'HKG': 60,
+    'SHA': 60,
+    'SHE': 60,
+    'NASDAQ': 60,
+    'NYSE': 60,
+}
+# 汇率查询（如 'USD-HKD'）的有效期
+EXCHANGE_RATE_TTL = 300
+# 其他查询的有效期
+DEFAULT_TTL = 60
+# 过期后仍可返回旧值的时长
+STALE_TTL = 600
+
+class QuoteCache:
+    """报价缓存"""
+
+    def __init__(self, ttl=None, exchange_rate_ttl=EXCHANGE_RATE_TTL, default_ttl=DEFAULT_TTL, stale_ttl=STALE_TTL):
+        self.ttl = dict(QUOTE_TTL if ttl is None else ttl)
+        self.exchange_rate_ttl = exchange_rate_ttl
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._inflight = {}
+        self._stats = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'refreshes': 0,
+            'errors': 0
+        }
+
+    def ttl_for(self, key):
+        """查询字符串对应的有效期"""
+        if ':' in key:
+            return self.ttl.get(key.rsplit(':', 1)[1].upper(), self.default_ttl)
+        if '-' in key:
+            return self.exchange_rate_ttl
+        return self.default_ttl
+
+    def get(self, key, loader):
+        """
+        获取报价
+
+        Args:
+            key: 查询字符串
+            loader: 未命中时调用的加载函数，返回 None 表示获取失败（不缓存）
+
+        Returns:
+            报价，获取失败时为 None
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = now - fetched_at
+                ttl = self.ttl_for(key)
+                if age < ttl:
+                    self._stats['hits'] += 1
+                    return value
+                if age < ttl + self.stale_ttl:
+                    self._stats['stale_hits'] += 1
+                    if key not in self._inflight:
+                        self._inflight[key] = threading.Event()
+                        threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+                    return value
+
+            event = self._inflight.get(key)
+            if event is None:
+                self._stats['misses'] += 1
+                event = self._inflight[key] = threading.Event()
+                leader = True
+            else:
+                self._stats['coalesced'] += 1
+                leader = False
+
+        if leader:
+            return self._load(key, loader, event)
+
+        # 等待正在进行的同一查询
+        event.wait()
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def put(self, key, value):
+        """写入已获取的报价"""
+        if value is None:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+
+    def _load(self, key, loader, event):
+        """调用加载函数并写入缓存，完成后唤醒等待的请求"""
+        try:
+            value = loader()
+            if value is not None:
+                self.put(key, value)
+            return value
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            logger.error(f"加载报价 {key} 失败: {str(e)}")
+            return None
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def _refresh(self, key, loader):
+        """后台刷新过期的报价"""
+        with self._lock:
+            self._stats['refreshes'] += 1
+            event = self._inflight[key]
+        self._load(key, loader, event)
+
+    def clear(self):
+        """清空缓存和计数"""
+        with self._lock:
+            self._entries.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def stats(self):
+        """
+        获取缓存计数
+
+        Returns:
+            dict: hits、stale_hits、misses、coalesced、refreshes、errors、size 和 hit_rate
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_rate'] = (stats['hits'] + stats['stale_hits'] + stats['coalesced']) / lookups if lookups else 0.0
+        return stats
+
+# 进程内共享的报价缓存
+quote_cache = QuoteCache()
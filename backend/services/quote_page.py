@@ -0,0 +1,74 @@
+"""
+Google Finance 报价页面的快速解析
+
+报价页面很大，而我们只需要 data-last-price 属性、股票名称和 window.google.finance.data，
+这里直接在原始 HTML 上做定向扫描，不构建完整的 DOM 树。
+扫描不到价格时由调用方回退到 BeautifulSoup 解析。
+"""
+import re
+import html
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+LAST_PRICE_PATTERN = re.compile(r'data-last-price\s*=\s*"([^"]*)"')
+NAME_PATTERN = re.compile(r'<div[^>]*\bclass\s*=\s*"zzDege"[^>]*>(.*?)</div>', re.S)
+FINANCE_DATA_PATTERN = re.compile(r'window.google.finance.data\s*=\s*({.*?});', re.S)
+
+# 有效价格范围，与 CurrencyChecker._extract_price 一致
+MIN_PRICE = 0
+MAX_PRICE = 1000000
+
+def extract_last_price(page):
+    """
+    读取第一个有效的 data-last-price 属性
+
+    Args:
+        page: 页面HTML文本
+
+    Returns:
+        float: 价格，没有找到有效价格时为 None
+    """
+    for match in LAST_PRICE_PATTERN.finditer(page):
+        try:
+            price = float(html.unescape(match.group(1)))
+        except (ValueError, TypeError):
+            continue
+        if MIN_PRICE < price < MAX_PRICE:
+            return price
+    return None
+
+def extract_name(page):
+    """读取股票名称，没有找到时为 None"""
+    match = NAME_PATTERN.search(page)
+    if not match:
+        return None
+    name = html.unescape(re.sub(r'<[^>]+>', '', match.group(1))).strip()
+    return name or None
+
+def extract_finance_data(page):
+    """
+    读取 window.google.finance.data 中的JSON数据
+
+    Returns:
+        dict: 解析后的数据，没有找到或无法解析时为 None
+    """
+    for match in FINANCE_DATA_PATTERN.finditer(page):
+        try:
+            return json.loads(match.group(1))
+        except json.JSONDecodeError:
+            continue
+    return None
+
+def parse_quote(page):
+    """
+    快速解析报价页面
+
+    Returns:
+        dict: price 和 name，找不到的字段为 None
+    """
+    return {
+        'price': extract_last_price(page),
+        'name': extract_name(page)
+    }
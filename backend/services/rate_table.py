@@ -0,0 +1,139 @@
+"""
+进程内汇率查找表
+
+将 exchange_rates 一次性装载为按货币分组、按日期排序的数组，按日期二分查找
+当天或之前最近一个有汇率的日期，批量换算港币时不再逐条查询数据库。
+/exchange_rates 的新增、更新、删除接口会同步更新查找表；其他途径写入汇率后递增版本号，
+查找表的版本号与当前版本不一致时重新装载。版本号只在本进程内有效，
+多进程部署时查找表最长保留 RATE_TABLE_TTL 秒。
+"""
+import os
+import time
+import threading
+import logging
+from bisect import bisect_left, bisect_right
+from config.database import db
+from services.time_series import to_date, MAX_GAP_DAYS
+
+logger = logging.getLogger(__name__)
+
+# 港币及其别名，汇率固定为1
+HKD_CURRENCIES = ('HKD', 'HK')
+# 市场的交易货币，未列出的市场按美元
+MARKET_CURRENCIES = {'HK': 'HKD', 'SH': 'CNY', 'SZ': 'CNY'}
+DEFAULT_MARKET_CURRENCY = 'USD'
+
+# 查找表最长保留时间（秒）
+RATE_TABLE_TTL = float(os.environ.get('RATE_TABLE_TTL', 300))
+
+class RateTable:
+    """汇率查找表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dates = {}
+        self._rates = {}
+        self._version = 0
+        # 已装载的 (版本号, 装载时间)，None 表示未装载
+        self._loaded = None
+
+    def bump_version(self):
+        """汇率在查找表之外发生变更，下次查询时重新装载"""
+        with self._lock:
+            self._version += 1
+
+    def load(self):
+        """从 exchange_rates 装载全部汇率"""
+        version = self._version
+        loaded_at = time.monotonic()
+        rows = db.fetch_all("SELECT currency, rate_date, rate FROM exchange_rates ORDER BY currency, rate_date") or []
+        dates, rates = {}, {}
+        for row in rows:
+            currency = row['currency'].upper()
+            dates.setdefault(currency, []).append(to_date(row['rate_date']))
+            rates.setdefault(currency, []).append(float(row['rate']))
+        with self._lock:
+            self._dates, self._rates = dates, rates
+            # 装载期间版本已变更时不记录版本，下次查询时再次装载
+            self._loaded = (version, loaded_at) if version == self._version else None
+        logger.info(f"汇率查找表已装载: {len(rows)} 条记录, {len(dates)} 种货币")
+
+    def _is_current(self):
+        """查找表已装载、版本号一致且未超过保留时间"""
+        loaded = self._loaded
+        return (loaded is not None and loaded[0] == self._version
+                and time.monotonic() - loaded[1] < RATE_TABLE_TTL)
+
+    def _ensure_loaded(self):
+        if not self._is_current():
+            self.load()
+
+    def lookup(self, currency, rate_date, max_gap_days=MAX_GAP_DAYS):
+        """
+        查找某日的汇率，当天没有汇率时取之前最近一个有汇率的日期
+
+        Args:
+            currency: 货币代码
+            rate_date: 日期、datetime 或 YYYY-MM-DD 字符串
+            max_gap_days: 向前取值的最大天数，None 表示不限制
+
+        Returns:
+            float: 汇率，没有符合条件的汇率时为 None
+        """
+        currency = (currency or '').upper()
+        if currency in HKD_CURRENCIES:
+            return 1.0
+        self._ensure_loaded()
+        rate_date = to_date(rate_date)
+        with self._lock:
+            dates = self._dates.get(currency)
+            if not dates:
+                return None
+            index = bisect_right(dates, rate_date) - 1
+            if index < 0:
+                return None
+            if max_gap_days is not None and (rate_date - dates[index]).days > max_gap_days:
+                return None
+            return self._rates[currency][index]
+
+    def to_hkd(self, amount, currency, rate_date, max_gap_days=MAX_GAP_DAYS):
+        """将金额换算为港币，没有汇率时返回 None"""
+        rate = self.lookup(currency, rate_date, max_gap_days)
+        return None if rate is None or amount is None else float(amount) * rate
+
+    def market_to_hkd(self, amount, market, rate_date, max_gap_days=MAX_GAP_DAYS):
+        """按市场的交易货币将金额换算为港币，没有汇率时返回 None"""
+        currency = MARKET_CURRENCIES.get(market, DEFAULT_MARKET_CURRENCY)
+        return self.to_hkd(amount, currency, rate_date, max_gap_days)
+
+    def upsert(self, currency, rate_date, rate):
+        """新增或更新一个日期的汇率"""
+        if self._loaded is None:
+            return
+        currency = currency.upper()
+        rate_date = to_date(rate_date)
+        with self._lock:
+            dates = self._dates.setdefault(currency, [])
+            rates = self._rates.setdefault(currency, [])
+            index = bisect_left(dates, rate_date)
+            if index < len(dates) and dates[index] == rate_date:
+                rates[index] = float(rate)
+            else:
+                dates.insert(index, rate_date)
+                rates.insert(index, float(rate))
+
+    def remove(self, currency, rate_date):
+        """删除一个日期的汇率"""
+        if self._loaded is None:
+            return
+        currency = currency.upper()
+        rate_date = to_date(rate_date)
+        with self._lock:
+            dates = self._dates.get(currency, [])
+            index = bisect_left(dates, rate_date)
+            if index < len(dates) and dates[index] == rate_date:
+                del dates[index]
+                del self._rates[currency][index]
+
+# 进程内共享的汇率查找表
+rate_table = RateTable()
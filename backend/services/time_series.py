@@ -0,0 +1,142 @@
+"""
+本地历史汇率/股价时间序列
+
+每个 symbol 的历史数据从 price_history 表装载到内存中的有序日期数组，按日期用二分查找取值。
+查不到时按日期距今的长度选择图表窗口（1Y/5Y/MAX），整段抓取一次并批量写入 price_history，
+同一 symbol 同一窗口在 REFETCH_INTERVAL 内不会重复抓取。
+"""
+import time
+import threading
+import logging
+from bisect import bisect_right
+from datetime import date, datetime
+from models.price_history import PriceHistory
+
+logger = logging.getLogger(__name__)
+
+# 非交易日向前取值的最大天数
+MAX_GAP_DAYS = 7
+# 同一 symbol 同一窗口两次抓取的最小间隔（秒）
+REFETCH_INTERVAL = 3600
+
+def to_date(value):
+    """将日期字符串、datetime 转换为 date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+def chart_window(target_date, today=None):
+    """覆盖目标日期所需的最短图表窗口"""
+    age = ((today or date.today()) - target_date).days
+    if age <= 365:
+        return '1Y'
+    if age <= 5 * 365:
+        return '5Y'
+    return 'MAX'
+
+class TimeSeriesStore:
+    """历史时间序列"""
+
+    def __init__(self, fetch=None, max_gap_days=MAX_GAP_DAYS, refetch_interval=REFETCH_INTERVAL):
+        """
+        Args:
+            fetch: 抓取整段历史的函数 fetch(symbol, window) -> [(date, value)]，
+                   默认 CurrencyChecker.get_history
+            max_gap_days: 非交易日向前取值的最大天数
+            refetch_interval: 同一 symbol 同一窗口两次抓取的最小间隔（秒）
+        """
+        self._fetch = fetch
+        self.max_gap_days = max_gap_days
+        self.refetch_interval = refetch_interval
+        self._lock = threading.Lock()
+        self._series = {}
+        self._fetched = {}
+        self._symbol_locks = {}
+
+    def _fetcher(self):
+        if self._fetch is None:
+            from services.currency_checker import CurrencyChecker
+            self._fetch = CurrencyChecker.get_history
+        return self._fetch
+
+    def _symbol_lock(self, symbol):
+        with self._lock:
+            return self._symbol_locks.setdefault(symbol, threading.Lock())
+
+    def _get_series(self, symbol):
+        """装载 symbol 的有序日期和数值数组"""
+        series = self._series.get(symbol)
+        if series is None:
+            points = PriceHistory.get_series(symbol)
+            series = ([to_date(d) for d, _ in points], [v for _, v in points])
+            with self._lock:
+                self._series[symbol] = series
+        return series
+
+    def _find(self, series, target_date, exact):
+        """二分查找目标日期的值，非交易日取之前最近一天（不超过 max_gap_days）"""
+        dates, values = series
+        index = bisect_right(dates, target_date) - 1
+        if index < 0:
+            return None
+        if exact and dates[index] != target_date:
+            return None
+        if (target_date - dates[index]).days > self.max_gap_days:
+            return None
+        return values[index]
+
+    def _refresh(self, symbol, window):
+        """抓取整段历史并写入 price_history，返回是否实际抓取"""
+        key = (symbol, window)
+        now = time.monotonic()
+        last = self._fetched.get(key)
+        if last is not None and now - last < self.refetch_interval:
+            return False
+        self._fetched[key] = now
+
+        points = self._fetcher()(symbol, window) or []
+        logger.info(f"抓取 {symbol} {window} 历史数据 {len(points)} 条")
+        if not points:
+            return True
+
+        PriceHistory.save_points(symbol, points)
+        with self._lock:
+            self._series.pop(symbol, None)
+        return True
+
+    def lookup(self, symbol, target_date, exact=False):
+        """
+        查询 symbol 在某日的值
+
+        Args:
+            symbol: 货币对（如 'USD-HKD'）或股票查询字符串（如 '0700:HKG'）
+            target_date: 日期、datetime 或 YYYY-MM-DD 字符串
+            exact: 是否只接受该日期当天的值
+
+        Returns:
+            float: 数值，没有数据时为 None
+        """
+        target_date = to_date(target_date)
+        value = self._find(self._get_series(symbol), target_date, exact)
+        if value is not None or target_date > date.today():
+            return value
+
+        # 本地没有数据时整段抓取一次，同一 symbol 的并发查询只抓取一次
+        with self._symbol_lock(symbol):
+            value = self._find(self._get_series(symbol), target_date, exact)
+            if value is None and self._refresh(symbol, chart_window(target_date)):
+                value = self._find(self._get_series(symbol), target_date, exact)
+        return value
+
+    def invalidate(self, symbol=None):
+        """清除内存中的序列，下次查询时重新从 price_history 装载"""
+        with self._lock:
+            if symbol is None:
+                self._series.clear()
+            else:
+                self._series.pop(symbol, None)
+
+# 进程内共享的时间序列
+time_series = TimeSeriesStore()
@@ -2,7 +2,9 @@ from datetime import datetime
 from decimal import Decimal, ROUND_HALF_UP
 import logging
 from typing import Dict, List, Tuple, Optional, Any
-from utils.db import get_db_connection
+from utils.db import get_db_connection, build_batch_update
+from utils.transaction_recalculator import recalculate_incremental
+from models.holder_position import HolderPosition
 import pymysql
 import re
 
@@ -156,6 +158,10 @@ class TransactionCalculator:
                     return False, {'message': '数据验证失败', 'errors': errors}
                 logger.info(f"交易数据验证通过")
 
+            # 记录操作前该交易的分单涉及的持有人-股票，用于刷新持仓快照
+            existing_transaction_id = transaction_data.get('id') if operation_type == 'delete' else original_transaction_id
+            affected_keys = HolderPosition.get_split_keys(existing_transaction_id, db_conn) if existing_transaction_id else set()
+
             # 计算持仓变化
             if operation_type == 'add':
                 # 获取之前的持仓状态
@@ -229,6 +235,13 @@ class TransactionCalculator:
             else:
                 logger.error(f"未知的操作类型: {operation_type}")
                 return False, {'message': f'未知的操作类型: {operation_type}'}
+
+            if success:
+                if operation_type != 'delete':
+                    transaction_id = existing_transaction_id or (result.get('id') if isinstance(result, dict) else None)
+                    if transaction_id:
+                        affected_keys |= HolderPosition.get_split_keys(transaction_id, db_conn)
+                TransactionCalculator._refresh_holder_positions(db_conn, affected_keys)
                 
             return success, result
             
@@ -236,6 +249,23 @@ class TransactionCalculator:
             logger.error(f"处理交易记录失败: {str(e)}", exc_info=True)
             return False, {'message': f'处理交易记录失败: {str(e)}'}
 
+    @staticmethod
+    def _refresh_holder_positions(db_conn, keys) -> None:
+        """
+        刷新持仓快照，失败只记录日志，不影响交易处理结果
+        
+        Args:
+            db_conn: 数据库连接或Database对象
+            keys: (holder_id, market, stock_code) 元组的集合
+        """
+        if not keys:
+            return
+        try:
+            refreshed = HolderPosition.refresh_many(keys, db_conn)
+            logger.info(f"已刷新 {refreshed}/{len(keys)} 个持仓快照")
+        except Exception as e:
+            logger.error(f"刷新持仓快照失败: {str(e)}", exc_info=True)
+
     @staticmethod
     def _get_previous_holding_state(
         db_conn,
@@ -1775,28 +1805,23 @@ class TransactionCalculator:
             bool: 是否成功
         """
         try:
-            # 获取需要重新计算的交易记录
+            # 持有人的分单记录使用增量引擎：从检查点开始重放，持仓状态收敛后立即停止
             if holder_id:
-                sql = """
-                    SELECT *
-                    FROM transaction_splits
-                    WHERE holder_id = %s
-                        AND stock_code = %s
-                        AND market = %s
-                        AND transaction_date >= %s
-                    ORDER BY transaction_date, id
-                """
-                params = [holder_id, stock_code, market, start_date]
-            else:
-                sql = """
-                    SELECT *
-                    FROM stock_transactions
-                    WHERE stock_code = %s
-                        AND market = %s
-                        AND transaction_date >= %s
-                    ORDER BY transaction_date, id
-                """
-                params = [stock_code, market, start_date]
+                recalculate_incremental(holder_id, market, stock_code, start_date, db_conn=db_conn)
+                # 后续记录的成本变化会影响快照中的成本和已实现盈亏
+                TransactionCalculator._refresh_holder_positions(db_conn, {(holder_id, market, stock_code)})
+                return True
+            
+            # 获取需要重新计算的交易记录
+            sql = """
+                SELECT *
+                FROM stock_transactions
+                WHERE stock_code = %s
+                    AND market = %s
+                    AND transaction_date >= %s
+                ORDER BY transaction_date, id
+            """
+            params = [stock_code, market, start_date]
             
             # 使用db_conn.fetch_all而不是cursor
             transactions = db_conn.fetch_all(sql, params)
@@ -1807,14 +1832,14 @@ class TransactionCalculator:
             # 获取第一条记录之前的状态
             prev_state = TransactionCalculator._get_previous_holding_state(
                 db_conn,
-                holder_id if holder_id else transactions[0]['user_id'],
+                transactions[0]['user_id'],
                 stock_code,
                 market,
-                start_date,
-                is_split=bool(holder_id)
+                start_date
             )
             
-            # 逐条重新计算
+            # 逐条重新计算，结果收集后按批次用一条语句写回
+            updates = []
             for trans in transactions:
                 # 构建交易数据
                 transaction_data = {
@@ -1836,58 +1861,11 @@ class TransactionCalculator:
                 except ValueError:
                     return False
                 
-                # 更新数据库
-                if holder_id:
-                    update_sql = """
-                        UPDATE transaction_splits
-                        SET prev_quantity = %s,
-                            prev_cost = %s,
-                            prev_avg_cost = %s,
-                            current_quantity = %s,
-                            current_cost = %s,
-                            current_avg_cost = %s,
-                            total_fees = %s,
-                            net_amount = %s,
-                            realized_profit = %s,
-                            profit_rate = %s,
-                            avg_price = %s,
-                            updated_at = NOW()
-                        WHERE id = %s
-                    """
-                    
-                    params = [
-                        position_change['prev_quantity'],
-                        position_change['prev_cost'],
-                        position_change['prev_avg_cost'],
-                        position_change['current_quantity'],
-                        position_change['current_cost'],
-                        position_change['current_avg_cost'],
-                        position_change['total_fees'],
-                        position_change['net_amount'],
-                        position_change['realized_profit'],
-                        position_change['profit_rate'],
-                        position_change['avg_price'],
-                        trans['id']
-                    ]
-                else:
-                    update_sql = """
-                        UPDATE stock_transactions
-                        SET total_fees = %s,
-                            net_amount = %s,
-                            avg_price = %s,
-                            updated_at = NOW()
-                        WHERE id = %s
-                    """
-                    
-                    params = [
-                        position_change['total_fees'],
-                        position_change['net_amount'],
-                        position_change['avg_price'],
-                        trans['id']
-                    ]
-                
-                # 使用db_conn.execute而不是cursor
-                db_conn.execute(update_sql, params)
+                updates.append((trans['id'], {
+                    'total_fees': position_change['total_fees'],
+                    'net_amount': position_change['net_amount'],
+                    'avg_price': position_change['avg_price']
+                }))
                 
                 # 更新前值状态用于下一次计算
                 prev_state = {
@@ -1896,6 +1874,14 @@ class TransactionCalculator:
                     'avg_cost': position_change['current_avg_cost']
                 }
             
+            # 更新数据库
+            batch_size = 100
+            for start in range(0, len(updates), batch_size):
+                update_sql, params = build_batch_update(
+                    'stock_transactions', updates[start:start + batch_size], set_updated_at=True
+                )
+                db_conn.execute(update_sql, params)
+            
             return True
             
         except Exception as e:
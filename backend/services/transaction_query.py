@@ -1,13 +1,40 @@
 from datetime import datetime
+import os
+import json
+import time
+import base64
 import logging
+import threading
 from decimal import Decimal
 from config.database import db
 
 logger = logging.getLogger(__name__)
 
+# 游标分页返回的交易总数缓存时间（秒）
+TRANSACTION_COUNT_TTL = int(os.environ.get('TRANSACTION_COUNT_TTL', 60))
+# 交易总数缓存的最大条目数
+TRANSACTION_COUNT_CACHE_SIZE = 1024
+
 class TransactionQuery:
     """交易查询服务类，统一处理交易记录的查询操作"""
     
+    _LIST_SELECT = """
+        SELECT
+            t.*,
+            s.code_name as stock_name,
+            (t.broker_fee + t.transaction_levy + t.stamp_duty + t.trading_fee + t.deposit_fee) as total_fees,
+            CASE 
+                WHEN LOWER(t.transaction_type) = 'buy' THEN 
+                    t.total_amount + (t.broker_fee + t.transaction_levy + t.stamp_duty + t.trading_fee + t.deposit_fee)
+                ELSE 
+                    t.total_amount - (t.broker_fee + t.transaction_levy + t.stamp_duty + t.trading_fee + t.deposit_fee)
+            END as net_amount
+    """
+    
+    # 交易总数缓存: (user_id, 过滤条件) -> (时间, 总数)
+    _count_lock = threading.Lock()
+    _count_cache = {}
+    
     @staticmethod
     def get_transaction_by_id(transaction_id, user_id=None):
         """
@@ -59,38 +86,15 @@ class TransactionQuery:
         return transaction
     
     @staticmethod
-    def get_transactions(user_id, filters=None, page=1, per_page=15):
+    def _build_filter_conditions(filters=None):
         """
-        获取交易记录列表
-        
-        Args:
-            user_id: 用户ID
-            filters: 过滤条件字典
-            page: 页码
-            per_page: 每页记录数
-            
+        构建交易列表的过滤条件，各分支共用
+
         Returns:
-            dict: 包含分页信息和交易记录的字典
+            tuple: (以 AND 开头的条件, params)
         """
-        # 构建基础查询
-        sql = """
-            SELECT DISTINCT
-                t.*,
-                s.code_name as stock_name,
-                (t.broker_fee + t.transaction_levy + t.stamp_duty + t.trading_fee + t.deposit_fee) as total_fees,
-                CASE 
-                    WHEN LOWER(t.transaction_type) = 'buy' THEN 
-                        t.total_amount + (t.broker_fee + t.transaction_levy + t.stamp_duty + t.trading_fee + t.deposit_fee)
-                    ELSE 
-                        t.total_amount - (t.broker_fee + t.transaction_levy + t.stamp_duty + t.trading_fee + t.deposit_fee)
-                END as net_amount
-            FROM stock.stock_transactions t
-            LEFT JOIN stock.stocks s ON t.stock_code = s.code AND t.market = s.market
-            LEFT JOIN stock.transaction_splits ts ON t.id = ts.original_transaction_id
-            LEFT JOIN stock.holders h ON ts.holder_id = h.id
-            WHERE (t.user_id = %s OR h.user_id = %s)
-        """
-        params = [user_id, user_id]
+        sql = ""
+        params = []
         
         # 添加过滤条件
         if filters:
@@ -119,48 +123,217 @@ class TransactionQuery:
                 sql += " AND LOWER(t.transaction_type) = %s"
                 params.append(filters['transaction_type'].lower())
         
-        # 计算总记录数
-        count_sql = "SELECT COUNT(*) as total FROM stock.stock_transactions t WHERE t.user_id = %s"
-        count_params = [user_id]  # 创建一个新的参数列表，只包含user_id
+        return sql, params
+    
+    @staticmethod
+    def _build_list_branches(user_id, filters=None, cursor_key=None):
+        """
+        构建交易列表的两个互不重叠的分支，列表查询与总数查询共用：
+        本人创建的交易按 idx_user_date_id 范围扫描；通过分单持有人可见的其他用户的交易
+        先由 holders.idx_user_id 和分单表的持有人索引得到交易ID，再按主键读取。
+        两个条件用 OR 合并时 idx_user_date_id 无法使用，执行计划用 scripts/explain_profit_queries.py 检查
+
+        Args:
+            user_id: 用户ID
+            filters: 过滤条件字典
+            cursor_key: 游标分页时上一页最后一条记录的 (transaction_date, id)
+
+        Returns:
+            list: [(FROM/WHERE 子句, params), ...]
+        """
+        filter_sql, filter_params = TransactionQuery._build_filter_conditions(filters)
+        if cursor_key:
+            cursor_date, cursor_id = cursor_key
+            filter_sql += " AND (t.transaction_date < %s OR (t.transaction_date = %s AND t.id < %s))"
+            filter_params = filter_params + [cursor_date, cursor_date, cursor_id]
         
-        # 添加与主查询相同的过滤条件
-        if filters:
-            if filters.get('start_date'):
-                count_sql += " AND t.transaction_date >= %s"
-                count_params.append(filters['start_date'])
+        owned_sql = """
+            FROM stock.stock_transactions t
+            WHERE t.user_id = %s
+        """ + filter_sql
+        split_sql = """
+            FROM stock.stock_transactions t
+            WHERE t.id IN (
+                SELECT ts.original_transaction_id
+                FROM stock.transaction_splits ts
+                JOIN stock.holders h ON ts.holder_id = h.id
+                WHERE h.user_id = %s
+            )
+            AND t.user_id <> %s
+        """ + filter_sql
+        return [
+            (owned_sql, [user_id] + filter_params),
+            (split_sql, [user_id, user_id] + filter_params)
+        ]
+    
+    @staticmethod
+    def _build_list_query(user_id, filters=None, cursor_key=None, limit=15, offset=0):
+        """
+        构建交易列表查询：每个分支按 (transaction_date, id) 倒序各取 offset + limit 条 ID，
+        UNION ALL 合并后再排序分页，最后按主键读取交易记录
+
+        Returns:
+            tuple: (sql, params)
+        """
+        branch_sqls = []
+        params = []
+        for branch_sql, branch_params in TransactionQuery._build_list_branches(user_id, filters, cursor_key):
+            branch_sqls.append(
+                "(SELECT t.id, t.transaction_date " + branch_sql +
+                " ORDER BY t.transaction_date DESC, t.id DESC LIMIT %s)"
+            )
+            params.extend(branch_params + [offset + limit])
+        
+        sql = TransactionQuery._LIST_SELECT + """
+            FROM (
+                """ + "\n                UNION ALL\n                ".join(branch_sqls) + """
+            ) page
+            JOIN stock.stock_transactions t ON t.id = page.id
+            LEFT JOIN stock.stocks s ON t.stock_code = s.code AND t.market = s.market
+            ORDER BY page.transaction_date DESC, page.id DESC
+            LIMIT %s OFFSET %s
+        """
+        params.extend([limit, offset])
+        return sql, params
+    
+    @staticmethod
+    def encode_cursor(transaction):
+        """
+        根据一页的最后一条记录生成下一页游标
+        
+        游标是 (transaction_date, id) 的 base64 编码，对客户端不透明
+        """
+        transaction_date = transaction['transaction_date']
+        if isinstance(transaction_date, datetime):
+            transaction_date = transaction_date.strftime('%Y-%m-%d %H:%M:%S')
+        payload = json.dumps([str(transaction_date), int(transaction['id'])])
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        解析游标
+        
+        Returns:
+            tuple: (transaction_date, id)
             
-            if filters.get('end_date'):
-                count_sql += " AND t.transaction_date <= %s"
-                count_params.append(filters['end_date'])
+        Raises:
+            ValueError: 游标无效
+        """
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            transaction_date, transaction_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            transaction_date = datetime.strptime(transaction_date, '%Y-%m-%d %H:%M:%S')
+            return transaction_date, int(transaction_id)
+        except Exception:
+            raise ValueError('无效的分页游标')
+    
+    @staticmethod
+    def count_transactions(user_id, filters=None, cached=False):
+        """
+        统计交易记录总数，与列表查询使用相同的过滤条件
+        
+        Args:
+            user_id: 用户ID
+            filters: 过滤条件字典
+            cached: 是否允许使用 TRANSACTION_COUNT_TTL 秒内缓存的结果
             
-            if filters.get('market'):
-                count_sql += " AND t.market = %s"
-                count_params.append(filters['market'])
+        Returns:
+            int: 总记录数
+        """
+        cache_key = (user_id, json.dumps(filters or {}, sort_keys=True, default=str))
+        now = time.monotonic()
+        if cached:
+            entry = TransactionQuery._count_cache.get(cache_key)
+            if entry and now - entry[0] < TRANSACTION_COUNT_TTL:
+                return entry[1]
+        
+        # 两个分支互不重叠，总数为各分支计数之和
+        branches = TransactionQuery._build_list_branches(user_id, filters)
+        sql = "SELECT " + " + ".join("(SELECT COUNT(*) " + branch_sql + ")" for branch_sql, _ in branches) + " as total"
+        params = [param for _, branch_params in branches for param in branch_params]
+        total_result = db.fetch_one(sql, params)
+        total_count = total_result['total'] if total_result else 0
+        
+        with TransactionQuery._count_lock:
+            if len(TransactionQuery._count_cache) >= TRANSACTION_COUNT_CACHE_SIZE:
+                TransactionQuery._count_cache.clear()
+            TransactionQuery._count_cache[cache_key] = (now, total_count)
+        return total_count
+    
+    @staticmethod
+    def _attach_details(transactions):
+        """批量加载交易明细和分单记录，并转换数值字段"""
+        if not transactions:
+            return
+        transaction_ids = [t['id'] for t in transactions]
+        details_map = TransactionQuery.get_transaction_details_batch(transaction_ids)
+        
+        # 获取分单记录
+        splits_map = TransactionQuery.get_transaction_splits_batch(transaction_ids)
+        
+        # 将明细和分单记录添加到交易记录
+        for transaction in transactions:
+            transaction_id = transaction['id']
+            transaction['details'] = details_map.get(transaction_id, [])
+            transaction['splits'] = splits_map.get(transaction_id, [])
+            transaction['has_splits'] = len(transaction['splits']) > 0
             
-            if filters.get('stock_codes') and isinstance(filters['stock_codes'], list) and filters['stock_codes']:
-                placeholders = ','.join(['%s'] * len(filters['stock_codes']))
-                count_sql += f" AND t.stock_code IN ({placeholders})"
-                count_params.extend(filters['stock_codes'])
+            # 转换数值字段为浮点数
+            TransactionQuery._convert_numeric_fields(transaction)
+    
+    @staticmethod
+    def get_transactions(user_id, filters=None, page=1, per_page=15, cursor=None, with_total=True):
+        """
+        获取交易记录列表
+        
+        cursor 为 None 时按页码分页；否则按 (transaction_date, id) 游标分页，
+        空字符串表示第一页。游标分页每页耗时与翻页深度无关，总数使用缓存的结果。
+        
+        Args:
+            user_id: 用户ID
+            filters: 过滤条件字典
+            page: 页码（页码分页）
+            per_page: 每页记录数
+            cursor: 上一页返回的 next_cursor（游标分页）
+            with_total: 游标分页时是否返回总记录数
             
-            if filters.get('transaction_code'):
-                count_sql += " AND t.transaction_code LIKE %s"
-                count_params.append(f"%{filters['transaction_code']}%")
+        Returns:
+            dict: 包含分页信息和交易记录的字典
             
-            if filters.get('transaction_type'):
-                count_sql += " AND LOWER(t.transaction_type) = %s"
-                count_params.append(filters['transaction_type'].lower())
-        
-        # 记录SQL语句和参数，用于调试
-        logger.info(f"Count SQL: {count_sql}")
-        logger.info(f"Count params: {count_params}")
+        Raises:
+            ValueError: 游标无效
+        """
+        if cursor is not None:
+            cursor_key = TransactionQuery.decode_cursor(cursor) if cursor else None
+            
+            # 多取一条用于判断是否还有下一页
+            sql, params = TransactionQuery._build_list_query(user_id, filters, cursor_key, limit=per_page + 1)
+            
+            logger.debug(f"Main SQL: {sql}")
+            logger.debug(f"Main params: {params}")
+            
+            transactions = db.fetch_all(sql, params) or []
+            has_more = len(transactions) > per_page
+            transactions = transactions[:per_page]
+            next_cursor = TransactionQuery.encode_cursor(transactions[-1]) if has_more else None
+            TransactionQuery._attach_details(transactions)
+            
+            result = {
+                'items': transactions,
+                'per_page': per_page,
+                'next_cursor': next_cursor,
+                'has_more': has_more
+            }
+            if with_total:
+                result['total'] = TransactionQuery.count_transactions(user_id, filters, cached=True)
+            return result
         
-        total_result = db.fetch_one(count_sql, count_params)
-        total_count = total_result['total'] if total_result else 0
+        total_count = TransactionQuery.count_transactions(user_id, filters)
         
         # 添加排序和分页
-        sql += " ORDER BY t.transaction_date DESC, t.id DESC LIMIT %s OFFSET %s"
         offset = (page - 1) * per_page
-        params.extend([per_page, offset])
+        sql, params = TransactionQuery._build_list_query(user_id, filters, limit=per_page, offset=offset)
         
         # 记录SQL语句和参数，用于调试
         logger.info(f"Main SQL: {sql}")
@@ -168,24 +341,7 @@ class TransactionQuery:
         
         # 获取交易记录
         transactions = db.fetch_all(sql, params)
-        
-        # 获取交易明细
-        if transactions:
-            transaction_ids = [t['id'] for t in transactions]
-            details_map = TransactionQuery.get_transaction_details_batch(transaction_ids)
-            
-            # 获取分单记录
-            splits_map = TransactionQuery.get_transaction_splits_batch(transaction_ids)
-            
-            # 将明细和分单记录添加到交易记录
-            for transaction in transactions:
-                transaction_id = transaction['id']
-                transaction['details'] = details_map.get(transaction_id, [])
-                transaction['splits'] = splits_map.get(transaction_id, [])
-                transaction['has_splits'] = len(transaction['splits']) > 0
-                
-                # 转换数值字段为浮点数
-                TransactionQuery._convert_numeric_fields(transaction)
+        TransactionQuery._attach_details(transactions)
         
         return {
             'items': transactions,
@@ -3,7 +3,9 @@ from decimal import Decimal
 from .transaction_calculator import TransactionCalculator
 import pymysql.cursors
 import logging
-from utils.transaction_recalculator import recalculate_transaction_splits
+from utils.transaction_recalculator import recalculate_transaction_splits, recalculate_incremental
+from utils.db import ConnectionQueries
+from models.holder_position import HolderPosition
 
 logger = logging.getLogger(__name__)
 
@@ -129,6 +131,10 @@ class TransactionService:
                 # 关闭自动提交，开始事务
                 connection.autocommit = False
                 
+                # 删除前记录分单涉及的持有人-股票组合，删除后在同一事务中重放并刷新其持仓快照
+                queries = ConnectionQueries(connection)
+                position_keys = HolderPosition.get_split_keys(transaction_id, queries)
+                
                 with connection.cursor() as cursor:
                     # 先删除交易分单记录
                     cursor.execute("DELETE FROM stock.transaction_splits WHERE original_transaction_id = %s", [transaction_id])
@@ -152,18 +158,15 @@ class TransactionService:
                         logger.error(f"删除交易记录失败：未找到交易ID={transaction_id}或用户ID={user_id}不匹配")
                         return False, {'message': '删除交易记录失败：未找到记录或无权限删除'}
                 
+                # 更新各持有人的后续交易记录
+                for holder_id, market, stock_code in position_keys:
+                    recalculate_incremental(holder_id, market, stock_code, transaction_data['transaction_date'], db_conn=queries)
+                if HolderPosition.refresh_many(position_keys, queries) < len(position_keys):
+                    raise RuntimeError("刷新持仓快照失败")
+                
                 # 提交事务
                 connection.commit()
                 
-                # 更新后续交易记录
-                TransactionCalculator.recalculate_subsequent_transactions(
-                    db, 
-                    transaction_data['stock_code'],
-                    transaction_data['market'], 
-                    transaction_data['transaction_date'],
-                    holder_id=user_id
-                )
-                
                 return True, {'message': '删除交易记录成功'}
                 
             except Exception as e:
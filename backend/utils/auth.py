@@ -3,7 +3,8 @@
 """
 import functools
 from flask import request, jsonify, session
-from models import User, Permission
+from models import User
+from models.permission_cache import PermissionCache
 
 def login_required(f):
     """登录验证装饰器"""
@@ -31,12 +32,8 @@ def permission_required(permission_code):
                 
             user_id = session['user_id']
             
-            # 获取用户权限
-            user_permissions = Permission.get_user_permissions(user_id)
-            user_permission_codes = [p.code for p in user_permissions]
-            
-            # 验证权限
-            if permission_code not in user_permission_codes:
+            # 验证权限（使用缓存的权限代码集合）
+            if not PermissionCache.has_permission(user_id, permission_code):
                 return jsonify({
                     'success': False,
                     'message': '权限不足'
@@ -56,9 +53,4 @@ def get_current_user():
 
 def has_permission(user_id, permission_code):
     """检查用户是否有指定权限"""
-    # 获取用户权限
-    user_permissions = Permission.get_user_permissions(user_id)
-    user_permission_codes = [p.code for p in user_permissions]
-    
-    # 验证权限
-    return permission_code in user_permission_codes 
\ No newline at end of file
+    return PermissionCache.has_permission(user_id, permission_code) 
\ No newline at end of file
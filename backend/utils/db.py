@@ -5,47 +5,64 @@
 数据库连接工具模块
 """
 
+import os
 import pymysql
 import logging
 import time
-from pymysql.cursors import DictCursor
+import threading
+from collections import deque
+from pymysql.cursors import DictCursor, SSCursor, SSDictCursor
 from config.db_config import get_db_config
 
 logger = logging.getLogger(__name__)
 
-def get_db_connection(env='development'):
+# 数据库环境 ('development', 'testing', 'production')
+DB_ENV = os.environ.get('DB_ENV', 'development')
+
+# 流式读取时每次从服务端取回的行数
+STREAM_BATCH_SIZE = 1000
+
+# 连接池启动时预先建立的连接数
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', 2))
+# 连接池最多同时持有的物理连接数
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 20))
+# 物理连接的最长使用时间（秒），超过后在归还时关闭
+DB_POOL_MAX_LIFETIME = float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800))
+# 连接全部借出时等待归还的最长时间（秒）
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+
+
+def get_db_connection(env=DB_ENV, config=None):
     """
     获取数据库连接
     :param env: 环境名称 ('development', 'testing', 'production')
+    :param config: 已解析的数据库配置，不提供时按 env 获取
     :return: 数据库连接对象
     """
     max_retries = 3
     retry_count = 0
     last_exception = None
-    
+
     while retry_count < max_retries:
         try:
             logger.info("尝试连接数据库...")
-            # 获取数据库配置
-            config = get_db_config(env)
-            
             # 数据库连接配置
             conn = pymysql.connect(
-                **config,
+                **(config or get_db_config(env)),
                 cursorclass=DictCursor,
                 autocommit=False,
                 connect_timeout=10,
                 read_timeout=30,
                 write_timeout=30
             )
-            
+
             # 初始化连接设置
             with conn.cursor() as cursor:
                 cursor.execute("SET SESSION sql_mode='STRICT_TRANS_TABLES,NO_ZERO_IN_DATE,NO_ZERO_DATE,ERROR_FOR_DIVISION_BY_ZERO,NO_ENGINE_SUBSTITUTION'")
                 cursor.execute("SET SESSION time_zone='+8:00'")
                 cursor.execute("SET CHARACTER SET utf8mb4")
                 cursor.execute("SET NAMES utf8mb4 COLLATE utf8mb4_unicode_ci")
-            
+
             logger.info("数据库连接成功")
             return conn
         except Exception as e:
@@ -54,6 +71,459 @@ def get_db_connection(env='development'):
             logger.error(f"数据库连接失败 (尝试 {retry_count}/{max_retries}): {str(e)}")
             if retry_count < max_retries:
                 time.sleep(1)  # 等待1秒后重试
-    
+
     logger.error(f"数据库连接失败，已达到最大重试次数: {str(last_exception)}")
-    raise last_exception 
\ No newline at end of file
+    raise last_exception
+
+
+# 查询记录回调 hook(sql, elapsed_ms, rows)，由 set_query_hook 设置，未设置时不包装游标
+_query_hook = None
+
+
+def set_query_hook(hook):
+    """
+    设置查询记录回调，连接池借出的连接和 stream() 的每次查询都会调用
+    :param hook: hook(sql, elapsed_ms, rows)，None 表示不记录
+    """
+    global _query_hook
+    _query_hook = hook
+
+
+class ProfiledCursor:
+    """
+    记录每次查询耗时和返回行数的游标
+
+    缓冲游标在 execute 返回时记录；服务端游标（SSCursor）的结果在读取时才传输，
+    累计读取的耗时和行数，在下一次 execute 或关闭时记录。其余属性和方法转发给原游标。
+    """
+
+    def __init__(self, cursor, hook):
+        self._cursor = cursor
+        self._hook = hook
+        self._unbuffered = isinstance(cursor, SSCursor)
+        self._pending = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _flush(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            self._hook(pending[0], pending[1] * 1000, pending[2])
+
+    def _timed(self, sql, method, *args):
+        self._flush()
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            if self._unbuffered:
+                self._pending = [sql, elapsed, 0]
+            else:
+                # 写操作的 rowcount 是影响行数，不计入返回行数
+                self._hook(sql, elapsed * 1000, self._cursor.rowcount if self._cursor.description else 0)
+
+    def execute(self, query, args=None):
+        return self._timed(query, self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        return self._timed(query, self._cursor.executemany, query, args)
+
+    def _fetched(self, started, rows):
+        if self._pending is not None:
+            self._pending[1] += time.perf_counter() - started
+            self._pending[2] += rows
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def close(self):
+        self._flush()
+        self._cursor.close()
+
+
+def _profiled(cursor):
+    """设置了查询记录回调时包装游标"""
+    hook = _query_hook
+    if hook is None or isinstance(cursor, ProfiledCursor):
+        return cursor
+    return ProfiledCursor(cursor, hook)
+
+
+class PooledConnection:
+    """
+    从连接池借出的连接
+
+    其余属性和方法都转发给物理连接；close() 回滚未提交的事务后把物理连接归还连接池，
+    因此按 get_db_connection() 的用法在 finally 中调用 close() 即可。
+    设置了查询记录回调时 cursor() 返回 ProfiledCursor。
+    """
+
+    def __init__(self, pool, conn, created_at):
+        self._pool = pool
+        self._conn = conn
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise pymysql.err.InterfaceError(0, '连接已归还连接池')
+        return getattr(conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def cursor(self, *args, **kwargs):
+        """创建游标，设置了查询记录回调时记录每次查询"""
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise pymysql.err.InterfaceError(0, '连接已归还连接池')
+        return _profiled(conn.cursor(*args, **kwargs))
+
+    def close(self):
+        """归还连接，可重复调用"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn, self._created_at)
+
+
+class ConnectionPool:
+    """
+    进程内的数据库连接池
+
+    物理连接只在创建时解析配置并执行一次会话初始化；借出时 ping 检查连接，失效则重建；
+    归还时回滚未提交的事务，超过最长使用时间的连接关闭而不放回。
+    """
+
+    def __init__(self, env=DB_ENV, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE,
+                 max_lifetime=DB_POOL_MAX_LIFETIME, timeout=DB_POOL_TIMEOUT):
+        self.env = env
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._config = None
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'creates': 0,
+            'closes': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'ping_failures': 0
+        }
+
+    def _create(self):
+        """建立物理连接，调用前已在 _size 中预留名额"""
+        try:
+            if self._config is None:
+                self._config = get_db_config(self.env)
+            conn = get_db_connection(self.env, self._config)
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._stats['creates'] += 1
+        return conn, time.monotonic()
+
+    def _discard(self, conn):
+        """关闭物理连接并释放名额"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._size -= 1
+            self._stats['closes'] += 1
+            self._condition.notify()
+
+    def fill(self):
+        """预先建立 min_size 个空闲连接"""
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn, created_at = self._create()
+            with self._condition:
+                self._idle.append((conn, created_at))
+                self._condition.notify()
+
+    def acquire(self):
+        """
+        借出连接，连接全部借出时最多等待 timeout 秒
+
+        :return: PooledConnection
+        """
+        deadline = None
+        with self._condition:
+            self._stats['checkouts'] += 1
+            while not self._idle and self._size >= self.max_size:
+                now = time.monotonic()
+                if deadline is None:
+                    deadline = now + self.timeout
+                    self._stats['waits'] += 1
+                    wait_started = now
+                if now >= deadline:
+                    self._stats['timeouts'] += 1
+                    raise TimeoutError(f"等待数据库连接超时 ({self.timeout} 秒)")
+                self._condition.wait(deadline - now)
+            if deadline is not None:
+                self._stats['wait_time'] += time.monotonic() - wait_started
+            entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                self._size += 1
+            self._in_use += 1
+
+        try:
+            if entry is not None:
+                conn, created_at = entry
+                try:
+                    conn.ping(reconnect=False)
+                except Exception as e:
+                    logger.warning(f"连接池中的数据库连接已失效，重新建立: {str(e)}")
+                    with self._condition:
+                        self._stats['ping_failures'] += 1
+                        self._stats['closes'] += 1
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                    entry = None
+            if entry is None:
+                conn, created_at = self._create()
+        except Exception:
+            with self._condition:
+                self._in_use -= 1
+            raise
+        return PooledConnection(self, conn, created_at)
+
+    def release(self, conn, created_at):
+        """归还物理连接"""
+        with self._condition:
+            self._in_use -= 1
+
+        if os.getpid() != self.pid or time.monotonic() - created_at > self.max_lifetime:
+            self._discard(conn)
+            return
+        try:
+            conn.rollback()
+        except Exception as e:
+            logger.warning(f"归还数据库连接时回滚失败，关闭该连接: {str(e)}")
+            self._discard(conn)
+            return
+        with self._condition:
+            self._idle.append((conn, created_at))
+            self._condition.notify()
+
+    def close(self):
+        """关闭所有空闲连接，已借出的连接归还后仍可复用"""
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """
+        连接池统计
+
+        :return: 当前物理连接数、空闲数、借出数和累计的借出、创建、关闭、等待次数等
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'min_size': self.min_size,
+                'max_size': self.max_size
+            })
+        return stats
+
+
+class ConnectionQueries:
+    """
+    在 PyMySQL 连接上提供与 Database 对象相同的 fetch_one、fetch_all、execute 接口
+
+    不提交也不关闭连接，由借出连接的调用方负责；cursor() 转发给连接，可直接传给 stream()。
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return self.conn.cursor(*args, **kwargs)
+
+    def fetch_one(self, sql, params=None):
+        with self.conn.cursor(DictCursor) as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()
+
+    def fetch_all(self, sql, params=None):
+        with self.conn.cursor(DictCursor) as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def execute(self, sql, params=None):
+        with self.conn.cursor() as cursor:
+            return cursor.execute(sql, params)
+
+
+_pool = None
+_pool_env = DB_ENV
+_pool_lock = threading.Lock()
+
+
+def configure_pool(env):
+    """
+    设置连接池使用的数据库环境，不建立连接；连接池在首次借出连接时创建
+    """
+    global _pool, _pool_env
+    with _pool_lock:
+        if env == _pool_env:
+            return
+        _pool_env = env
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+def get_pool():
+    """
+    获取进程内的连接池，首次调用时创建；fork 出的子进程会重新创建自己的连接池
+    """
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            pool = ConnectionPool(_pool_env)
+            try:
+                pool.fill()
+            except Exception as e:
+                logger.error(f"连接池预建连接失败: {str(e)}")
+            _pool = pool
+        return _pool
+
+
+def get_pooled_connection():
+    """
+    从连接池借出数据库连接，用完调用 close() 归还
+    :return: PooledConnection
+    """
+    return get_pool().acquire()
+
+
+def get_pool_stats():
+    """获取连接池统计，本进程尚未创建连接池时返回 None，不会因此建立连接"""
+    pool = _pool
+    if pool is None or pool.pid != os.getpid():
+        return None
+    return pool.stats()
+
+
+def build_batch_update(table, updates, key='id', set_updated_at=False):
+    """
+    构建一次更新多行的 UPDATE ... JOIN 语句
+
+    将每行的新值作为 UNION ALL 派生表，与目标表按主键连接后一次性更新，
+    一个批次只需要一次数据库往返。
+    :param table: 表名
+    :param updates: 更新数据列表，每项为(row_id, updated_fields)元组，所有行的字段必须相同
+    :param key: 主键字段名
+    :param set_updated_at: 是否同时将updated_at设置为当前时间
+    :return: (sql, params)
+    """
+    fields = list(updates[0][1].keys())
+
+    first_select = "SELECT " + ", ".join([f"%s AS {key}"] + [f"%s AS {field}" for field in fields])
+    other_select = "SELECT " + ", ".join(["%s"] * (len(fields) + 1))
+    derived_table = " UNION ALL ".join([first_select] + [other_select] * (len(updates) - 1))
+
+    assignments = [f"t.{field} = v.{field}" for field in fields]
+    if set_updated_at:
+        assignments.append("t.updated_at = NOW()")
+
+    sql = f"""
+    UPDATE {table} t
+    JOIN ({derived_table}) v ON t.{key} = v.{key}
+    SET {", ".join(assignments)}
+    """
+
+    params = []
+    for row_id, updated_fields in updates:
+        params.append(row_id)
+        params.extend(updated_fields[field] for field in fields)
+
+    return sql, params
+
+
+def _stream_rows(conn, sql, params, batch_size):
+    """在连接上用服务端游标逐批取回结果"""
+    with _profiled(conn.cursor(SSDictCursor)) as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+
+def stream(sql, params=None, batch_size=STREAM_BATCH_SIZE, db_conn=None):
+    """
+    使用服务端游标逐批读取查询结果，内存占用只与 batch_size 有关，与结果集大小无关
+
+    结果读完或生成器关闭之前，所用的连接不能执行其他语句；两次读取的间隔不应超过服务端的 net_write_timeout。
+    :param sql: 查询语句
+    :param params: 查询参数
+    :param batch_size: 每次从服务端取回的行数
+    :param db_conn: 数据库连接或Database对象；不提供时从连接池借出连接，读完后归还
+    :return: 逐行产出字典的生成器
+    """
+    if db_conn is None:
+        conn = get_pooled_connection()
+        try:
+            yield from _stream_rows(conn, sql, params, batch_size)
+        finally:
+            conn.close()
+    elif hasattr(db_conn, 'get_connection'):
+        with db_conn.get_connection() as conn:
+            yield from _stream_rows(conn, sql, params, batch_size)
+    else:
+        yield from _stream_rows(db_conn, sql, params, batch_size)
@@ -1,5 +1,6 @@
-from datetime import datetime
 from services.currency_checker import CurrencyChecker
+from services.time_series import time_series
+from services.rate_table import rate_table
 
 checker = CurrencyChecker()
 
@@ -13,10 +14,14 @@ def get_exchange_rate(currency, date=None):
     Returns:
         float: 汇率值，如果获取失败则返回 None
     """
-    if currency == 'HK':
+    if currency in ('HK', 'HKD'):
         return 1.0
         
-    if isinstance(date, str):
-        date = datetime.strptime(date, '%Y-%m-%d')
+    if date is None:
+        return checker.get_exchange_rate(currency)
         
-    return checker.get_exchange_rate(currency, date) 
\ No newline at end of file
+    # 优先使用 exchange_rates 中的汇率（当天或之前最近一天），没有时查本地时间序列
+    rate = rate_table.lookup(currency, date)
+    if rate is not None:
+        return rate
+    return time_series.lookup(f'{currency}-HKD', date)
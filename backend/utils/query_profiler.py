@@ -0,0 +1,232 @@
+"""
+请求级查询分析
+
+包装数据库对象的 fetch_one、fetch_all、execute、insert，并通过 utils.db.set_query_hook 记录
+连接池借出的连接（包括交易分单重新计算、并发查询）和 utils.db.stream 的每次查询，
+统计语句指纹、耗时和返回行数：
+- 每个请求累计查询次数、数据库耗时、返回行数和最慢的语句，调试模式下通过 X-DB-Profile 响应头返回
+- 进程内按语句指纹和接口累计，通过 QueryProfiler.snapshot() 输出（/api/health/metrics）
+- 超过 SLOW_QUERY_THRESHOLD_MS 的查询写入慢查询日志；同一请求内同一语句执行超过
+  N_PLUS_ONE_THRESHOLD 次时记录一次警告，用于发现 N+1 查询
+语句指纹把字面量和参数占位符替换为 ?，IN 列表合并为 IN (?)，不包含参数值。
+"""
+import os
+import re
+import time
+import logging
+import functools
+import threading
+from flask import g, has_request_context, request
+from utils.db import set_query_hook
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger('slow_query')
+
+# 慢查询阈值（毫秒）
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 500))
+# 同一请求内同一语句执行次数超过该值时记录 N+1 警告
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 20))
+# 进程内最多累计的语句指纹数，超出后计入 <other>
+QUERY_PROFILER_MAX_FINGERPRINTS = int(os.environ.get('QUERY_PROFILER_MAX_FINGERPRINTS', 500))
+
+# 被包装的数据库方法
+PROFILED_METHODS = ('fetch_one', 'fetch_all', 'execute', 'insert')
+
+OTHER_FINGERPRINT = '<other>'
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|%\(\w+\)s')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+')
+_WHITESPACE = re.compile(r'\s+')
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """
+    生成语句指纹
+
+    Args:
+        sql: SQL 语句
+
+    Returns:
+        str: 去掉字面量和多余空白后的语句
+    """
+    text = _STRING_LITERAL.sub('?', str(sql))
+    text = _PLACEHOLDER.sub('?', text)
+    text = _NUMBER_LITERAL.sub('?', text)
+    text = _IN_LIST.sub('IN (?)', text)
+    text = _VALUES_LIST.sub(r'\1', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+def _count_rows(method_name, result):
+    """查询返回的行数，写操作记为 0"""
+    if method_name == 'fetch_all':
+        return len(result) if result else 0
+    if method_name == 'fetch_one':
+        return 1 if result else 0
+    return 0
+
+class QueryProfiler:
+    """请求级查询分析"""
+
+    _lock = threading.Lock()
+    _fingerprints = {}
+    _endpoints = {}
+    _started_at = time.time()
+
+    @staticmethod
+    def instrument(db):
+        """包装数据库对象的查询方法，重复调用不会重复包装"""
+        if getattr(db, '_query_profiler_installed', False):
+            return db
+        for name in PROFILED_METHODS:
+            method = getattr(db, name, None)
+            if method is not None:
+                setattr(db, name, QueryProfiler._wrap(name, method))
+        db._query_profiler_installed = True
+        return db
+
+    @staticmethod
+    def _wrap(name, method):
+        @functools.wraps(method)
+        def wrapper(sql, *args, **kwargs):
+            started = time.perf_counter()
+            result = None
+            try:
+                result = method(sql, *args, **kwargs)
+                return result
+            finally:
+                QueryProfiler.record(sql, (time.perf_counter() - started) * 1000, _count_rows(name, result))
+        return wrapper
+
+    @staticmethod
+    def record(sql, elapsed_ms, rows=0):
+        """
+        记录一次查询
+
+        Args:
+            sql: SQL 语句
+            elapsed_ms: 耗时（毫秒）
+            rows: 返回行数
+        """
+        key = fingerprint(sql)
+
+        with QueryProfiler._lock:
+            stats = QueryProfiler._fingerprints.get(key)
+            if stats is None:
+                if len(QueryProfiler._fingerprints) >= QUERY_PROFILER_MAX_FINGERPRINTS:
+                    key = OTHER_FINGERPRINT
+                    stats = QueryProfiler._fingerprints.get(key)
+                if stats is None:
+                    stats = QueryProfiler._fingerprints[key] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0}
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['rows'] += rows
+
+        endpoint = None
+        # 并发查询的工作线程没有请求上下文，只计入进程内累计
+        if has_request_context():
+            endpoint = request.endpoint
+            profile = g.get('query_profile')
+            if profile is None:
+                profile = g.query_profile = QueryProfiler._new_profile()
+            profile['count'] += 1
+            profile['total_ms'] += elapsed_ms
+            profile['rows'] += rows
+            if elapsed_ms > profile['slowest_ms']:
+                profile['slowest_ms'] = elapsed_ms
+                profile['slowest'] = key
+            repeats = profile['fingerprints'][key] = profile['fingerprints'].get(key, 0) + 1
+            if repeats == N_PLUS_ONE_THRESHOLD + 1:
+                slow_query_logger.warning(f"疑似 N+1 查询: {endpoint} 在一个请求内执行同一语句超过 {N_PLUS_ONE_THRESHOLD} 次: {key}")
+
+        if elapsed_ms >= SLOW_QUERY_THRESHOLD_MS:
+            slow_query_logger.warning(f"慢查询 {elapsed_ms:.1f} ms, {rows} 行, 接口 {endpoint}: {key}")
+
+    @staticmethod
+    def _new_profile():
+        return {'count': 0, 'total_ms': 0.0, 'rows': 0, 'slowest_ms': 0.0, 'slowest': None, 'fingerprints': {}}
+
+    @staticmethod
+    def current():
+        """当前请求的查询统计，没有查询时为空统计"""
+        if has_request_context():
+            return g.get('query_profile') or QueryProfiler._new_profile()
+        return QueryProfiler._new_profile()
+
+    @staticmethod
+    def finish_request(endpoint):
+        """把当前请求的统计累计到接口统计，返回当前请求的统计"""
+        profile = QueryProfiler.current()
+        with QueryProfiler._lock:
+            stats = QueryProfiler._endpoints.get(endpoint)
+            if stats is None:
+                stats = QueryProfiler._endpoints[endpoint] = {
+                    'requests': 0, 'queries': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0
+                }
+            stats['requests'] += 1
+            stats['queries'] += profile['count']
+            stats['total_ms'] += profile['total_ms']
+            stats['max_ms'] = max(stats['max_ms'], profile['total_ms'])
+            stats['rows'] += profile['rows']
+        return profile
+
+    @staticmethod
+    def header_value(profile):
+        """X-DB-Profile 响应头，只包含 ASCII 字符"""
+        value = f"count={profile['count']}; time_ms={profile['total_ms']:.1f}; rows={profile['rows']}"
+        if profile['slowest']:
+            value += f"; slowest_ms={profile['slowest_ms']:.1f}; slowest={profile['slowest'][:200]}"
+        return value.encode('ascii', 'backslashreplace').decode('ascii')
+
+    @staticmethod
+    def snapshot(top=20):
+        """
+        进程内累计的查询统计
+
+        Args:
+            top: 按总耗时输出前多少条语句
+
+        Returns:
+            dict: 阈值配置、按总耗时排序的语句统计和按数据库耗时排序的接口统计
+        """
+        with QueryProfiler._lock:
+            fingerprints = [dict(stats, fingerprint=key) for key, stats in QueryProfiler._fingerprints.items()]
+            endpoints = [dict(stats, endpoint=key) for key, stats in QueryProfiler._endpoints.items()]
+        fingerprints.sort(key=lambda stats: stats['total_ms'], reverse=True)
+        endpoints.sort(key=lambda stats: stats['total_ms'], reverse=True)
+        for stats in fingerprints + endpoints:
+            count = stats.get('count', stats.get('requests'))
+            stats['avg_ms'] = stats['total_ms'] / count if count else 0
+        return {
+            'since': QueryProfiler._started_at,
+            'slow_query_threshold_ms': SLOW_QUERY_THRESHOLD_MS,
+            'n_plus_one_threshold': N_PLUS_ONE_THRESHOLD,
+            'queries': fingerprints[:top],
+            'endpoints': endpoints
+        }
+
+    @staticmethod
+    def reset():
+        """清空进程内累计的统计"""
+        with QueryProfiler._lock:
+            QueryProfiler._fingerprints.clear()
+            QueryProfiler._endpoints.clear()
+            QueryProfiler._started_at = time.time()
+
+def init_query_profiler(app, db):
+    """
+    为应用启用查询分析：包装 db 的查询方法并记录连接池游标上的查询，请求结束时累计接口统计，
+    调试模式下在响应头 X-DB-Profile 中返回当前请求的统计
+    """
+    QueryProfiler.instrument(db)
+    set_query_hook(QueryProfiler.record)
+
+    @app.after_request
+    def add_query_profile(response):
+        profile = QueryProfiler.finish_request(request.endpoint)
+        if app.debug:
+            response.headers['X-DB-Profile'] = QueryProfiler.header_value(profile)
+        return response
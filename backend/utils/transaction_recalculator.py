@@ -13,19 +13,205 @@ import logging
 import pymysql
 from datetime import datetime
 import decimal
+import math
 from collections import defaultdict
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
-from utils.db import get_db_connection
+from utils.db import get_pool, get_pooled_connection, build_batch_update, ConnectionQueries
+from utils.vectorized_recalculator import calculate_group_fields
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 全量重建时每次读取一个持有人-股票组合的记录数
+GROUP_PAGE_SIZE = int(os.environ.get('GROUP_PAGE_SIZE', 5000))
+
 def ensure_log_directory():
     """确保日志目录存在"""
     if not os.path.exists('logs'):
         os.makedirs('logs')
 
+def _transaction_splits_filter(holder_id=None, stock_code=None, market=None, start_date=None, transaction_id=None):
+    """
+    构建交易分单记录的筛选条件
+    
+    Returns:
+        tuple: (where_clauses, params)
+    """
+    where_clauses = []
+    params = []
+    
+    if transaction_id:
+        # 当提供transaction_id时，直接查询与该original_transaction_id相关的所有分单记录
+        where_clauses.append("ts.original_transaction_id = %s")
+        params.append(transaction_id)
+    else:
+        # 根据提供的筛选条件构建查询
+        if holder_id:
+            where_clauses.append("ts.holder_id = %s")
+            params.append(holder_id)
+        
+        if stock_code and market:
+            where_clauses.append("ts.stock_code = %s")
+            where_clauses.append("ts.market = %s")
+            params.extend([stock_code, market])
+        
+        if start_date:
+            where_clauses.append("ts.transaction_date >= %s")
+            params.append(start_date)
+    
+    return where_clauses, params
+
+def _transaction_splits_query(holder_id=None, stock_code=None, market=None, start_date=None, transaction_id=None):
+    """
+    构建交易分单记录查询，按持有人、股票、交易日期和ID排序
+    
+    Returns:
+        tuple: (query, params)
+    """
+    where_clauses, params = _transaction_splits_filter(holder_id, stock_code, market, start_date, transaction_id)
+    
+    # 组合WHERE子句
+    where_clause = " AND ".join(where_clauses) if where_clauses else ""
+    if where_clause:
+        where_clause = "WHERE " + where_clause
+    
+    query = f"""
+    SELECT ts.*, t.user_id
+    FROM transaction_splits ts
+    JOIN stock_transactions t ON ts.original_transaction_id = t.id
+    {where_clause}
+    ORDER BY ts.holder_id, ts.market, ts.stock_code, ts.transaction_date, ts.id
+    """
+    return query, params
+
+def _group_splits_page_query(key, filters, after_date=None, after_id=0, limit=GROUP_PAGE_SIZE):
+    """
+    构建按(交易日期, ID)键集分页读取一个持有人-股票组合的查询
+    
+    Args:
+        key (tuple): (holder_id, market, stock_code)，holder_id 可以为 NULL
+        filters (tuple): _transaction_splits_filter 的结果
+        after_date (date, optional): 上一页最后一条记录的交易日期，不指定则从第一条开始
+        after_id (int, optional): 上一页最后一条记录的ID
+        limit (int, optional): 每页记录数
+        
+    Returns:
+        tuple: (query, params)
+    """
+    holder_id, market, stock_code = key
+    where_clauses, params = filters
+    where_clauses = where_clauses + ["ts.holder_id <=> %s", "ts.market = %s", "ts.stock_code = %s"]
+    params = params + [holder_id, market, stock_code]
+    
+    if after_date is not None:
+        where_clauses.append("(ts.transaction_date > %s OR (ts.transaction_date = %s AND ts.id > %s))")
+        params.extend([after_date, after_date, after_id or 0])
+    
+    query = f"""
+    SELECT ts.*, t.user_id
+    FROM transaction_splits ts
+    JOIN stock_transactions t ON ts.original_transaction_id = t.id
+    WHERE {" AND ".join(where_clauses)}
+    ORDER BY ts.transaction_date, ts.id
+    LIMIT %s
+    """
+    return query, params + [limit]
+
+def get_holder_stock_keys(holder_id=None, stock_code=None, market=None, start_date=None, transaction_id=None):
+    """
+    获取满足筛选条件的持有人-股票组合及各组合的分单记录数，按持有人、市场、股票代码排序
+    
+    参数同 get_transaction_splits，查询失败时抛出异常
+    
+    Returns:
+        list: [((holder_id, market, stock_code), split_count), ...]
+    """
+    where_clauses, params = _transaction_splits_filter(holder_id, stock_code, market, start_date, transaction_id)
+    where_clause = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+    
+    query = f"""
+    SELECT ts.holder_id, ts.market, ts.stock_code, COUNT(*) AS split_count
+    FROM transaction_splits ts
+    JOIN stock_transactions t ON ts.original_transaction_id = t.id
+    {where_clause}
+    GROUP BY ts.holder_id, ts.market, ts.stock_code
+    ORDER BY ts.holder_id, ts.market, ts.stock_code
+    """
+    with get_pooled_connection() as conn:
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+    
+    return [((row['holder_id'], row['market'], row['stock_code']), row['split_count']) for row in rows]
+
+def get_group_splits(key, filters, page_size=GROUP_PAGE_SIZE):
+    """
+    按(交易日期, ID)键集分页读取一个持有人-股票组合的交易分单记录
+    
+    每页使用一次短查询，读取之间不占用连接，查询失败时抛出异常
+    
+    Args:
+        key (tuple): (holder_id, market, stock_code)
+        filters (tuple): _transaction_splits_filter 的结果
+        page_size (int, optional): 每页记录数
+        
+    Returns:
+        list: 该组合的交易分单记录列表
+    """
+    splits = []
+    after_date, after_id = None, 0
+    while True:
+        query, params = _group_splits_page_query(key, filters, after_date, after_id, page_size)
+        with get_pooled_connection() as conn:
+            with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                cursor.execute(query, params)
+                page = cursor.fetchall()
+        splits.extend(page)
+        if len(page) < page_size:
+            return splits
+        after_date, after_id = page[-1]['transaction_date'], page[-1]['id']
+
+def _failed_group_report(key, split_count, error):
+    """构建处理失败的持有人-股票组合报告"""
+    holder_id, market, stock_code = key
+    return {
+        'holder_id': holder_id,
+        'market': market,
+        'stock_code': stock_code,
+        'total_count': split_count,
+        'success_count': 0,
+        'fail_count': split_count,
+        'elapsed': 0.0,
+        'error': error
+    }
+
+def iter_holder_stock_groups(group_keys, filters, failed_reports):
+    """
+    逐组读取并产出持有人-股票组合的交易分单记录，内存中只保留正在处理的组合
+    
+    读取失败的组合不产出，而是在 failed_reports 中追加失败报告
+    
+    Args:
+        group_keys (list): get_holder_stock_keys 的结果
+        filters (tuple): _transaction_splits_filter 的结果
+        failed_reports (list): 读取失败的组合报告
+        
+    Yields:
+        tuple: ((holder_id, market, stock_code), 该组合的分单记录列表)
+    """
+    for key, split_count in group_keys:
+        try:
+            group_splits = get_group_splits(key, filters)
+        except Exception as e:
+            logger.error(f"读取持有人 {key[0]} 的 {key[1]}-{key[2]} 交易分单记录失败: {str(e)}")
+            failed_reports.append(_failed_group_report(key, split_count, str(e)))
+            continue
+        if group_splits:
+            yield key, group_splits
+
 def get_transaction_splits(holder_id=None, stock_code=None, market=None, start_date=None, transaction_id=None):
     """
     获取交易分单记录，按持有人、股票、交易日期和ID排序
@@ -41,69 +227,137 @@ def get_transaction_splits(holder_id=None, stock_code=None, market=None, start_d
         list: 交易分单记录列表
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(pymysql.cursors.DictCursor)
-        
-        # 构建查询条件
-        where_clauses = []
-        params = []
-        
-        if transaction_id:
-            # 当提供transaction_id时，直接查询与该original_transaction_id相关的所有分单记录
-            where_clauses.append("ts.original_transaction_id = %s")
-            params.append(transaction_id)
-            
-            logger.info(f"查询original_transaction_id为 {transaction_id} 的交易分单记录")
-        else:
-            # 根据提供的筛选条件构建查询
-            if holder_id:
-                where_clauses.append("ts.holder_id = %s")
-                params.append(holder_id)
-            
-            if stock_code and market:
-                where_clauses.append("ts.stock_code = %s")
-                where_clauses.append("ts.market = %s")
-                params.extend([stock_code, market])
-            
-            if start_date:
-                where_clauses.append("ts.transaction_date >= %s")
-                params.append(start_date)
-        
-        # 组合WHERE子句
-        where_clause = " AND ".join(where_clauses) if where_clauses else ""
-        if where_clause:
-            where_clause = "WHERE " + where_clause
-        
-        # 查询交易分单记录
-        query = f"""
-        SELECT ts.*, t.user_id
-        FROM transaction_splits ts
-        JOIN stock_transactions t ON ts.original_transaction_id = t.id
-        {where_clause}
-        ORDER BY ts.holder_id, ts.market, ts.stock_code, ts.transaction_date, ts.id
-        """
-        
-        cursor.execute(query, params)
-        splits = cursor.fetchall()
-        
+        query, params = _transaction_splits_query(holder_id, stock_code, market, start_date, transaction_id)
+        with get_pooled_connection() as conn:
+            with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                cursor.execute(query, params)
+                splits = cursor.fetchall()
         logger.info(f"找到 {len(splits)} 条交易分单记录")
         return splits
     
     except Exception as e:
         logger.error(f"获取交易分单记录失败: {str(e)}")
         return []
+
+def _splits_page_query(holder_id, market, stock_code, after_date, after_id=0, inclusive=False, limit=50):
+    """
+    构建按(交易日期, ID)键集分页的交易分单记录查询
+    
+    Returns:
+        tuple: (query, params)
+    """
+    id_operator = ">=" if inclusive else ">"
+    query = f"""
+    SELECT ts.*
+    FROM transaction_splits ts
+    WHERE ts.holder_id = %s
+    AND ts.market = %s
+    AND ts.stock_code = %s
+    AND (
+        ts.transaction_date > %s
+        OR (ts.transaction_date = %s AND ts.id {id_operator} %s)
+    )
+    ORDER BY ts.transaction_date, ts.id
+    LIMIT %s
+    """
+    return query, [holder_id, market, stock_code, after_date, after_date, after_id or 0, limit]
+
+def get_transaction_splits_page(holder_id, market, stock_code, after_date, after_id=0, inclusive=False, limit=50):
+    """
+    按(交易日期, ID)顺序获取指定持有人-股票在某个位置之后的一页交易分单记录
+    
+    使用键集分页，只读取需要重放的后缀，而不是整段历史
+    
+    Args:
+        holder_id (int): 持有人ID
+        market (str): 市场
+        stock_code (str): 股票代码
+        after_date (date): 起始交易日期
+        after_id (int, optional): 起始记录ID
+        inclusive (bool, optional): 是否包含(after_date, after_id)本身
+        limit (int, optional): 每页记录数
+        
+    Returns:
+        list: 交易分单记录列表
+    """
+    conn = None
+    cursor = None
+    try:
+        conn = get_pooled_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        
+        query, params = _splits_page_query(holder_id, market, stock_code, after_date, after_id, inclusive, limit)
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    
+    except Exception as e:
+        logger.error(f"获取交易分单记录分页失败: {str(e)}")
+        raise
     finally:
         if cursor:
             cursor.close()
         if conn:
             conn.close()
 
-def batch_update_transaction_splits(updates):
+def update_rows_one_by_one(cursor, table, updates):
+    """
+    逐条执行 UPDATE ... WHERE id = %s
+    
+    Args:
+        cursor (Cursor): 数据库游标
+        table (str): 表名
+        updates (list): 更新数据列表，每项为(row_id, updated_fields)元组
+        
+    Returns:
+        int: 成功更新的记录数
+    """
+    success_count = 0
+    for row_id, updated_fields in updates:
+        try:
+            # 构建更新SQL
+            set_clause = ", ".join([f"{field} = %s" for field in updated_fields.keys()])
+            update_query = f"""
+            UPDATE {table}
+            SET {set_clause}
+            WHERE id = %s
+            """
+            
+            # 构建参数列表
+            params = list(updated_fields.values()) + [row_id]
+            
+            # 执行更新
+            cursor.execute(update_query, params)
+            success_count += 1
+        except Exception as e:
+            logger.error(f"更新 {table} 记录 {row_id} 失败: {str(e)}")
+    return success_count
+
+def update_rows_set_based(cursor, table, updates):
+    """
+    用一条 UPDATE ... JOIN 语句更新一批字段相同的记录
+    
+    Args:
+        cursor (Cursor): 数据库游标
+        table (str): 表名
+        updates (list): 更新数据列表，每项为(row_id, updated_fields)元组
+        
+    Returns:
+        int: 提交更新的记录数
+    """
+    if not updates:
+        return 0
+    sql, params = build_batch_update(table, updates)
+    cursor.execute(sql, params)
+    return len(updates)
+
+def batch_update_transaction_splits(updates, conn=None):
     """
     批量更新交易分单记录
     
     Args:
         updates (list): 更新数据列表，每项为(split_id, updated_fields)元组
+        conn (Connection, optional): 数据库连接，提供时由调用方负责提交和关闭，出错时抛出异常；
+            不提供时集合更新失败会回退到逐条更新，跳过出错的记录
         
     Returns:
         int: 成功更新的记录数
@@ -111,49 +365,89 @@ def batch_update_transaction_splits(updates):
     if not updates:
         return 0
     
+    own_conn = conn is None
+    cursor = None
     try:
-        conn = get_db_connection()
+        if own_conn:
+            conn = get_pooled_connection()
         cursor = conn.cursor()
         
         success_count = 0
         
-        # 使用事务批量更新
+        # 按字段集合分组，每组用一条语句更新
+        field_groups = defaultdict(list)
         for split_id, updated_fields in updates:
+            field_groups[tuple(updated_fields.keys())].append((split_id, updated_fields))
+        
+        for group_updates in field_groups.values():
             try:
-                # 构建更新SQL
-                set_clause = ", ".join([f"{field} = %s" for field in updated_fields.keys()])
-                update_query = f"""
-                UPDATE transaction_splits
-                SET {set_clause}
-                WHERE id = %s
-                """
-                
-                # 构建参数列表
-                params = list(updated_fields.values()) + [split_id]
-                
-                # 执行更新
-                cursor.execute(update_query, params)
-                success_count += 1
+                success_count += update_rows_set_based(cursor, 'transaction_splits', group_updates)
             except Exception as e:
-                logger.error(f"更新交易分单记录 {split_id} 失败: {str(e)}")
+                # 调用方提供连接时跳过出错的记录会让调用方的事务提交不完整的结果，直接抛出
+                if not own_conn:
+                    raise
+                # 整条语句失败时不会有部分更新，回退到逐条更新以隔离出错的记录
+                logger.warning(f"集合更新交易分单记录失败，回退到逐条更新: {str(e)}")
+                success_count += update_rows_one_by_one(cursor, 'transaction_splits', group_updates)
         
         # 提交事务
-        conn.commit()
+        if own_conn:
+            conn.commit()
         
         return success_count
     
     except Exception as e:
+        logger.error(f"批量更新交易分单记录失败: {str(e)}")
+        # 调用方提供连接时由调用方决定回滚
+        if not own_conn:
+            raise
         if conn:
             conn.rollback()
-        logger.error(f"批量更新交易分单记录失败: {str(e)}")
         return 0
     finally:
         if cursor:
             cursor.close()
-        if conn:
+        if own_conn and conn:
             conn.close()
 
-def get_previous_state(holder_id, market, stock_code, transaction_date, transaction_id=None):
+def _previous_state_query(holder_id, market, stock_code, transaction_date, transaction_id=None):
+    """
+    构建查询同一持有人同一股票在指定交易之前最后一条记录的语句
+    
+    Returns:
+        tuple: (query, params)
+    """
+    if transaction_id:
+        where_clause = """
+        WHERE holder_id = %s
+        AND market = %s
+        AND stock_code = %s
+        AND (
+            transaction_date < %s
+            OR (transaction_date = %s AND id < %s)
+        )
+        """
+        params = [holder_id, market, stock_code, transaction_date, transaction_date, transaction_id]
+    else:
+        # 如果没有提供交易ID，则查询该日期之前的所有记录
+        where_clause = """
+        WHERE holder_id = %s
+        AND market = %s
+        AND stock_code = %s
+        AND transaction_date < %s
+        """
+        params = [holder_id, market, stock_code, transaction_date]
+    
+    query = f"""
+    SELECT current_quantity as quantity, current_cost as cost, current_avg_cost as avg_cost
+    FROM transaction_splits
+    {where_clause}
+    ORDER BY transaction_date DESC, id DESC
+    LIMIT 1
+    """
+    return query, params
+
+def get_previous_state(holder_id, market, stock_code, transaction_date, transaction_id=None, conn=None):
     """
     获取指定交易之前的持仓状态
     
@@ -163,46 +457,19 @@ def get_previous_state(holder_id, market, stock_code, transaction_date, transact
         stock_code (str): 股票代码
         transaction_date (date): 交易日期
         transaction_id (int, optional): 交易ID
+        conn (Connection, optional): 数据库连接，提供时由调用方负责关闭，查询失败时抛出异常
         
     Returns:
         dict: 之前的持仓状态
     """
+    own_conn = conn is None
+    cursor = None
     try:
-        conn = get_db_connection()
+        if own_conn:
+            conn = get_pooled_connection()
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         
-        # 构建查询条件
-        where_clause = """
-        WHERE holder_id = %s
-        AND market = %s
-        AND stock_code = %s
-        AND (
-            transaction_date < %s
-            OR (transaction_date = %s AND id < %s)
-        )
-        """
-        params = [holder_id, market, stock_code, transaction_date, transaction_date]
-        
-        if transaction_id:
-            params.append(transaction_id)
-        else:
-            # 如果没有提供交易ID，则查询该日期之前的所有记录
-            where_clause = """
-            WHERE holder_id = %s
-            AND market = %s
-            AND stock_code = %s
-            AND transaction_date < %s
-            """
-            params = [holder_id, market, stock_code, transaction_date]
-        
-        # 查询同一持有人同一股票在该交易之前的最后一条记录
-        query = f"""
-        SELECT current_quantity as quantity, current_cost as cost, current_avg_cost as avg_cost
-        FROM transaction_splits
-        {where_clause}
-        ORDER BY transaction_date DESC, id DESC
-        LIMIT 1
-        """
+        query, params = _previous_state_query(holder_id, market, stock_code, transaction_date, transaction_id)
         
         cursor.execute(query, params)
         prev_state = cursor.fetchone()
@@ -216,11 +483,14 @@ def get_previous_state(holder_id, market, stock_code, transaction_date, transact
     
     except Exception as e:
         logger.error(f"获取之前的持仓状态失败: {str(e)}")
+        # 调用方在同一连接上写回时，不能以初始值继续计算
+        if not own_conn:
+            raise
         return {'quantity': 0, 'cost': 0, 'avg_cost': 0}
     finally:
         if cursor:
             cursor.close()
-        if conn:
+        if own_conn and conn:
             conn.close()
 
 def update_original_transactions():
@@ -231,7 +501,7 @@ def update_original_transactions():
         int: 更新的记录数
     """
     try:
-        conn = get_db_connection()
+        conn = get_pooled_connection()
         cursor = conn.cursor()
         
         # 更新原始交易记录的avg_price字段
@@ -267,7 +537,339 @@ def update_original_transactions():
         if conn:
             conn.close()
 
-def recalculate_transaction_splits(holder_id=None, stock_code=None, market=None, start_date=None, transaction_id=None, update_original=False):
+def calculate_split_fields(split, running_quantity, running_cost):
+    """
+    根据交易前的累计持仓状态计算单条交易分单记录的字段
+    
+    Args:
+        split (dict): 交易分单记录
+        running_quantity (Decimal): 交易前累计持仓数量
+        running_cost (Decimal): 交易前累计持仓成本
+        
+    Returns:
+        dict: 计算后的字段（decimal.Decimal类型），其中running_quantity和running_cost为交易后的累计状态
+    """
+    # 获取交易数据并确保所有数值都是decimal.Decimal类型
+    transaction_type = split['transaction_type'].lower()
+    total_quantity = decimal.Decimal(str(split['total_quantity']))
+    total_amount = decimal.Decimal(str(split['total_amount']))
+    
+    # 计算总费用，确保所有数值都是decimal.Decimal类型
+    broker_fee = decimal.Decimal(str(split.get('broker_fee', 0) or 0))
+    stamp_duty = decimal.Decimal(str(split.get('stamp_duty', 0) or 0))
+    transaction_levy = decimal.Decimal(str(split.get('transaction_levy', 0) or 0))
+    trading_fee = decimal.Decimal(str(split.get('trading_fee', 0) or 0))
+    deposit_fee = decimal.Decimal(str(split.get('deposit_fee', 0) or 0))
+    
+    total_fees = broker_fee + stamp_duty + transaction_levy + trading_fee + deposit_fee
+    
+    # 计算交易前状态
+    prev_quantity = running_quantity
+    prev_cost = running_cost
+    prev_avg_cost = prev_cost / prev_quantity if prev_quantity > 0 else decimal.Decimal('0')
+    
+    # 计算交易后状态
+    if transaction_type == 'buy':
+        current_quantity = prev_quantity + total_quantity
+        
+        # 买入成本应包含交易费用
+        buy_cost_with_fees = total_amount + total_fees
+        current_cost = prev_cost + buy_cost_with_fees
+        
+        # 计算新的平均成本（包含费用）
+        current_avg_cost = current_cost / current_quantity if current_quantity > 0 else decimal.Decimal('0')
+        
+        # 买入没有已实现盈亏
+        realized_profit = decimal.Decimal('0')
+        profit_rate = decimal.Decimal('0')
+        
+        # 计算净金额 - 与 TransactionCalculator.calculate_net_amount 一致，买入为总金额 + 总费用
+        net_amount = total_amount + total_fees
+    else:  # sell
+        current_quantity = prev_quantity - total_quantity
+        
+        # 计算已实现盈亏
+        realized_profit = decimal.Decimal('0')
+        profit_rate = decimal.Decimal('0')
+        
+        if prev_quantity > 0 and prev_avg_cost > 0:
+            # 卖出收入 - 买入成本（包含费用的平均成本） - 卖出费用
+            buy_cost = total_quantity * prev_avg_cost
+            realized_profit = total_amount - buy_cost - total_fees
+            
+            # 计算盈亏率
+            if buy_cost > 0:
+                profit_rate = (realized_profit / buy_cost) * decimal.Decimal('100')
+        
+        # 计算剩余成本
+        if prev_quantity > 0:
+            current_cost = prev_cost * (current_quantity / prev_quantity) if current_quantity > 0 else decimal.Decimal('0')
+        else:
+            current_cost = decimal.Decimal('0')
+        
+        # 更新平均成本
+        current_avg_cost = current_cost / current_quantity if current_quantity > 0 else decimal.Decimal('0')
+        
+        # 计算净金额
+        net_amount = total_amount - total_fees
+    
+    # 计算平均价格
+    avg_price = total_amount / total_quantity if total_quantity > 0 else decimal.Decimal('0')
+    
+    return {
+        'prev_quantity': prev_quantity,
+        'prev_cost': prev_cost,
+        'prev_avg_cost': prev_avg_cost,
+        'current_quantity': current_quantity,
+        'current_cost': current_cost,
+        'current_avg_cost': current_avg_cost,
+        'total_fees': total_fees,
+        'net_amount': net_amount,
+        'running_quantity': current_quantity,
+        'running_cost': current_cost,
+        'realized_profit': realized_profit,
+        'profit_rate': profit_rate,
+        'avg_price': avg_price
+    }
+
+def verify_group_fields(group_splits, group_fields, prev_quantity=0, prev_cost=0, places=5):
+    """
+    用逐条Decimal计算校验向量化计算结果
+    
+    Args:
+        group_splits (list): 已排序的同一持有人-股票组合的交易分单记录
+        group_fields (list): calculate_group_fields 的计算结果
+        prev_quantity (Decimal, optional): 第一条记录之前的持仓数量
+        prev_cost (Decimal, optional): 第一条记录之前的持仓成本
+        places (int, optional): 需要一致的小数位数
+        
+    Returns:
+        list: 结果不一致的交易分单记录ID列表
+    """
+    tolerance = decimal.Decimal(1).scaleb(-places)
+    running_quantity = decimal.Decimal(str(prev_quantity))
+    running_cost = decimal.Decimal(str(prev_cost))
+    mismatched_ids = []
+    
+    for split, fields in zip(group_splits, group_fields):
+        expected = calculate_split_fields(split, running_quantity, running_cost)
+        running_quantity = expected['running_quantity']
+        running_cost = expected['running_cost']
+        
+        for field, value in expected.items():
+            if not math.isfinite(fields[field]) or abs(decimal.Decimal(str(fields[field])) - value) > tolerance:
+                logger.warning(f"交易分单记录 {split['id']} 的字段 {field} 不一致: 向量化={fields[field]}, 逐条={value}")
+                mismatched_ids.append(split['id'])
+                break
+    
+    return mismatched_ids
+
+def recalculate_group(group_splits, bulk=False, verify=False, conn=None):
+    """
+    重新计算同一持有人-股票组合的交易分单记录
+    
+    Args:
+        group_splits (list): 同一持有人-股票组合的交易分单记录
+        bulk (bool, optional): 是否使用向量化批量计算
+        verify (bool, optional): 批量计算时是否用逐条Decimal计算校验结果
+        conn (Connection, optional): 数据库连接，提供时由调用方负责提交和关闭
+        
+    Returns:
+        tuple: (total_count, success_count, fail_count)
+    """
+    total_count = 0
+    success_count = 0
+    fail_count = 0
+    
+    # 按交易日期和ID排序
+    group_splits.sort(key=lambda x: (x['transaction_date'], x['id']))
+    
+    # 获取第一条记录的前一状态
+    first_split = group_splits[0]
+    holder_id, market, stock_code = first_split['holder_id'], first_split['market'], first_split['stock_code']
+    logger.info(f"处理持有人 {holder_id} 的 {market}-{stock_code} 股票")
+    prev_state = get_previous_state(
+        holder_id,
+        market,
+        stock_code,
+        first_split['transaction_date'],
+        conn=conn
+    )
+    
+    # 初始化持仓状态
+    running_quantity = decimal.Decimal(str(prev_state.get('quantity', 0)))
+    running_cost = decimal.Decimal(str(prev_state.get('cost', 0)))
+    
+    # 批量更新缓存
+    batch_updates = []
+    batch_size = 100
+    
+    # 向量化批量计算整个组合
+    if bulk:
+        group_fields = calculate_group_fields(group_splits, running_quantity, running_cost)
+        if group_fields is None:
+            # 结果含有 inf/NaN，无论是否校验都不能写入
+            mismatched_ids = [split['id'] for split in group_splits]
+        elif verify:
+            mismatched_ids = verify_group_fields(group_splits, group_fields, running_quantity, running_cost)
+        else:
+            mismatched_ids = []
+        
+        if not mismatched_ids:
+            for start in range(0, len(group_splits), batch_size):
+                batch_updates = [
+                    (split['id'], fields)
+                    for split, fields in zip(group_splits[start:start + batch_size], group_fields[start:start + batch_size])
+                ]
+                total_count += len(batch_updates)
+                batch_success = batch_update_transaction_splits(batch_updates, conn=conn)
+                success_count += batch_success
+                fail_count += len(batch_updates) - batch_success
+            return (total_count, success_count, fail_count)
+        
+        logger.warning(f"持有人 {holder_id} 的 {market}-{stock_code} 向量化计算校验不一致 {len(mismatched_ids)} 条，回退到逐条计算")
+        batch_updates = []
+    
+    # 处理每条交易分单记录
+    for split in group_splits:
+        total_count += 1
+        
+        try:
+            split_fields = calculate_split_fields(split, running_quantity, running_cost)
+            
+            # 更新累计状态
+            running_quantity = split_fields['running_quantity']
+            running_cost = split_fields['running_cost']
+            
+            # 更新字段
+            updated_fields = {field: float(value) for field, value in split_fields.items()}
+            
+            # 添加到批量更新列表
+            batch_updates.append((split['id'], updated_fields))
+            
+            # 每达到批量大小就提交一次
+            if len(batch_updates) >= batch_size:
+                batch_success = batch_update_transaction_splits(batch_updates, conn=conn)
+                success_count += batch_success
+                fail_count += len(batch_updates) - batch_success
+                batch_updates = []
+                logger.info(f"已处理 {total_count} 条记录，成功 {success_count} 条，失败 {fail_count} 条")
+        
+        except Exception as e:
+            fail_count += 1
+            logger.error(f"处理交易分单记录 {split['id']} 时发生错误: {str(e)}")
+    
+    # 处理剩余的批量更新
+    if batch_updates:
+        batch_success = batch_update_transaction_splits(batch_updates, conn=conn)
+        success_count += batch_success
+        fail_count += len(batch_updates) - batch_success
+    
+    return (total_count, success_count, fail_count)
+
+def recalculate_group_with_report(key, group_splits, bulk=False, verify=False, conn=None):
+    """
+    重新计算一个持有人-股票组合并生成处理报告
+    
+    提供conn时，整个组合在该连接上处理并在结束时提交一次，出错或有记录失败则整个组合回滚
+    
+    Args:
+        key (tuple): (holder_id, market, stock_code)
+        group_splits (list): 该组合的交易分单记录
+        bulk (bool, optional): 是否使用向量化批量计算
+        verify (bool, optional): 批量计算时是否校验结果
+        conn (Connection, optional): 数据库连接
+        
+    Returns:
+        dict: 处理报告
+    """
+    holder_id, market, stock_code = key
+    report = {
+        'holder_id': holder_id,
+        'market': market,
+        'stock_code': stock_code,
+        'total_count': len(group_splits),
+        'success_count': 0,
+        'fail_count': 0,
+        'elapsed': 0.0,
+        'error': None
+    }
+    
+    started = time.perf_counter()
+    try:
+        total_count, success_count, fail_count = recalculate_group(group_splits, bulk=bulk, verify=verify, conn=conn)
+        if conn:
+            # 有记录失败时整个组合回滚，不提交部分结果
+            if fail_count:
+                raise RuntimeError(f"{fail_count} 条交易分单记录处理失败")
+            conn.commit()
+        report.update(total_count=total_count, success_count=success_count, fail_count=fail_count)
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        report.update(success_count=0, fail_count=len(group_splits), error=str(e))
+    report['elapsed'] = time.perf_counter() - started
+    
+    logger.info(f"持有人 {holder_id} 的 {market}-{stock_code}: {report['success_count']}/{report['total_count']} 条, 耗时 {report['elapsed']:.3f} 秒")
+    return report
+
+def _init_rebuild_worker():
+    """进程池工作进程初始化：建立本进程的连接池"""
+    get_pool()
+
+def _rebuild_group_worker(key, group_splits, bulk, verify):
+    """进程池任务：从本进程的连接池借出连接处理一个持有人-股票组合"""
+    with get_pooled_connection() as conn:
+        return recalculate_group_with_report(key, group_splits, bulk=bulk, verify=verify, conn=conn)
+
+def recalculate_groups_parallel(holder_stock_groups, workers, bulk=False, verify=False, max_pending=None):
+    """
+    使用进程池并行重新计算多个持有人-股票组合
+    
+    各组合之间的持仓状态互不依赖，每个工作进程从自己的连接池借出连接，每个组合提交一次
+    
+    Args:
+        holder_stock_groups: {(holder_id, market, stock_code): [split, ...]}，
+            或逐组产出 ((holder_id, market, stock_code), [split, ...]) 的迭代器
+        workers (int): 进程数
+        bulk (bool, optional): 是否使用向量化批量计算
+        verify (bool, optional): 批量计算时是否校验结果
+        max_pending (int, optional): 同时提交的组合数上限，默认为进程数的2倍，
+            输入为迭代器时限制内存中的分单记录数
+        
+    Returns:
+        list: 每个组合的处理报告，按耗时降序排列
+    """
+    reports = []
+    max_pending = max_pending or workers * 2
+    
+    if isinstance(holder_stock_groups, dict):
+        # 记录多的组合先提交，减少尾部等待
+        holder_stock_groups = sorted(holder_stock_groups.items(), key=lambda item: len(item[1]), reverse=True)
+    
+    def collect(done, pending):
+        for future in done:
+            key, split_count = pending.pop(future)
+            try:
+                reports.append(future.result())
+            except Exception as e:
+                reports.append(_failed_group_report(key, split_count, str(e)))
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_rebuild_worker) as executor:
+        pending = {}
+        for key, group_splits in holder_stock_groups:
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done, pending)
+            pending[executor.submit(_rebuild_group_worker, key, group_splits, bulk, verify)] = (key, len(group_splits))
+        if pending:
+            done, _ = wait(pending)
+            collect(done, pending)
+    
+    reports.sort(key=lambda report: report['elapsed'], reverse=True)
+    return reports
+
+def recalculate_transaction_splits(holder_id=None, stock_code=None, market=None, start_date=None, transaction_id=None, update_original=False, bulk=False, verify=False, workers=1, group_reports=None):
     """
     重新计算交易分单记录的字段
     
@@ -281,6 +883,10 @@ def recalculate_transaction_splits(holder_id=None, stock_code=None, market=None,
         start_date (date, optional): 开始日期，只处理该日期及之后的记录
         transaction_id (int, optional): 交易ID，只处理该交易及其后续交易
         update_original (bool, optional): 是否同时更新原始交易记录
+        bulk (bool, optional): 是否使用向量化批量计算（适用于全量重建）
+        verify (bool, optional): 批量计算时是否用逐条Decimal计算校验结果，不一致的组合回退到逐条计算
+        workers (int, optional): 并行处理的进程数，大于1时使用进程池按持有人-股票组合并行处理
+        group_reports (list, optional): 如提供，则追加每个持有人-股票组合的处理报告（耗时、数量、错误）
         
     Returns:
         tuple: (total_count, success_count, fail_count)
@@ -305,162 +911,41 @@ def recalculate_transaction_splits(holder_id=None, stock_code=None, market=None,
     if transaction_id:
         logger.info(f"只处理交易ID为 {transaction_id} 的分单记录")
     
-    # 获取交易分单记录
-    splits = get_transaction_splits(holder_id, stock_code, market, start_date, transaction_id)
+    # 先取出组合列表，再逐组用短查询分页读取，写入期间不占用读取连接
+    filters = _transaction_splits_filter(holder_id, stock_code, market, start_date, transaction_id)
+    try:
+        group_keys = get_holder_stock_keys(holder_id, stock_code, market, start_date, transaction_id)
+    except Exception as e:
+        logger.error(f"获取持有人-股票组合失败: {str(e)}")
+        raise
     
-    if not splits:
+    if not group_keys:
         logger.info("没有找到交易分单记录")
         return (0, 0, 0)
     
-    # 按持有人和股票分组
-    holder_stock_groups = defaultdict(list)
-    for split in splits:
-        key = (split['holder_id'], split['market'], split['stock_code'])
-        holder_stock_groups[key].append(split)
+    # 处理每个持有人-股票组合，读取失败的组合记为失败报告
+    reports = []
+    holder_stock_groups = iter_holder_stock_groups(group_keys, filters, reports)
+    if workers > 1:
+        reports.extend(recalculate_groups_parallel(holder_stock_groups, workers, bulk=bulk, verify=verify))
+    else:
+        # 与并行模式相同，每个组合在一个连接上处理并提交一次，出错时整个组合回滚
+        for key, group_splits in holder_stock_groups:
+            with get_pooled_connection() as conn:
+                reports.append(recalculate_group_with_report(key, group_splits, bulk=bulk, verify=verify, conn=conn))
     
-    logger.info(f"共有 {len(holder_stock_groups)} 个持有人-股票组合")
+    logger.info(f"共有 {len(reports)} 个持有人-股票组合")
     
-    # 处理每个持有人-股票组合
-    total_count = 0
-    success_count = 0
-    fail_count = 0
+    total_count = sum(report['total_count'] for report in reports)
+    success_count = sum(report['success_count'] for report in reports)
+    fail_count = sum(report['fail_count'] for report in reports)
     
-    for (holder_id, market, stock_code), group_splits in holder_stock_groups.items():
-        logger.info(f"处理持有人 {holder_id} 的 {market}-{stock_code} 股票")
-        
-        # 按交易日期和ID排序
-        group_splits.sort(key=lambda x: (x['transaction_date'], x['id']))
-        
-        # 获取第一条记录的前一状态
-        first_split = group_splits[0]
-        prev_state = get_previous_state(
-            first_split['holder_id'], 
-            first_split['market'], 
-            first_split['stock_code'], 
-            first_split['transaction_date']
-        )
-        
-        # 初始化持仓状态
-        running_quantity = decimal.Decimal(str(prev_state.get('quantity', 0)))
-        running_cost = decimal.Decimal(str(prev_state.get('cost', 0)))
-        
-        # 批量更新缓存
-        batch_updates = []
-        batch_size = 100
-        
-        # 处理每条交易分单记录
-        for split in group_splits:
-            total_count += 1
-            
-            try:
-                # 获取交易数据并确保所有数值都是decimal.Decimal类型
-                transaction_type = split['transaction_type'].lower()
-                total_quantity = decimal.Decimal(str(split['total_quantity']))
-                total_amount = decimal.Decimal(str(split['total_amount']))
-                
-                # 计算总费用，确保所有数值都是decimal.Decimal类型
-                broker_fee = decimal.Decimal(str(split.get('broker_fee', 0) or 0))
-                stamp_duty = decimal.Decimal(str(split.get('stamp_duty', 0) or 0))
-                transaction_levy = decimal.Decimal(str(split.get('transaction_levy', 0) or 0))
-                trading_fee = decimal.Decimal(str(split.get('trading_fee', 0) or 0))
-                deposit_fee = decimal.Decimal(str(split.get('deposit_fee', 0) or 0))
-                
-                total_fees = broker_fee + stamp_duty + transaction_levy + trading_fee + deposit_fee
-                
-                # 计算交易前状态
-                prev_quantity = running_quantity
-                prev_cost = running_cost
-                prev_avg_cost = prev_cost / prev_quantity if prev_quantity > 0 else decimal.Decimal('0')
-                
-                # 计算交易后状态
-                if transaction_type == 'buy':
-                    current_quantity = prev_quantity + total_quantity
-                    
-                    # 买入成本应包含交易费用
-                    buy_cost_with_fees = total_amount + total_fees
-                    current_cost = prev_cost + buy_cost_with_fees
-                    
-                    # 计算新的平均成本（包含费用）
-                    current_avg_cost = current_cost / current_quantity if current_quantity > 0 else decimal.Decimal('0')
-                    
-                    # 更新累计状态
-                    running_quantity = current_quantity
-                    running_cost = current_cost
-                    
-                    # 买入没有已实现盈亏
-                    realized_profit = decimal.Decimal('0')
-                    profit_rate = decimal.Decimal('0')
-                    
-                    # 计算净金额 - 买入是负数（支出）
-                    net_amount = -(total_amount + total_fees)
-                else:  # sell
-                    current_quantity = prev_quantity - total_quantity
-                    
-                    # 计算已实现盈亏
-                    realized_profit = decimal.Decimal('0')
-                    profit_rate = decimal.Decimal('0')
-                    
-                    if prev_quantity > 0 and prev_avg_cost > 0:
-                        # 卖出收入 - 买入成本（包含费用的平均成本） - 卖出费用
-                        buy_cost = total_quantity * prev_avg_cost
-                        realized_profit = total_amount - buy_cost - total_fees
-                        
-                        # 计算盈亏率
-                        if buy_cost > 0:
-                            profit_rate = (realized_profit / buy_cost) * decimal.Decimal('100')
-                    
-                    # 计算剩余成本
-                    if prev_quantity > 0:
-                        current_cost = prev_cost * (current_quantity / prev_quantity) if current_quantity > 0 else decimal.Decimal('0')
-                    else:
-                        current_cost = decimal.Decimal('0')
-                    
-                    # 更新平均成本
-                    current_avg_cost = current_cost / current_quantity if current_quantity > 0 else decimal.Decimal('0')
-                    
-                    # 更新累计状态
-                    running_quantity = current_quantity
-                    running_cost = current_cost
-                    
-                    # 计算净金额
-                    net_amount = total_amount - total_fees
-                
-                # 更新字段
-                updated_fields = {
-                    'prev_quantity': float(prev_quantity),
-                    'prev_cost': float(prev_cost),
-                    'prev_avg_cost': float(prev_avg_cost),
-                    'current_quantity': float(current_quantity),
-                    'current_cost': float(current_cost),
-                    'current_avg_cost': float(current_avg_cost),
-                    'total_fees': float(total_fees),
-                    'net_amount': float(net_amount),
-                    'running_quantity': float(running_quantity),
-                    'running_cost': float(running_cost),
-                    'realized_profit': float(realized_profit),
-                    'profit_rate': float(profit_rate)
-                }
-                
-                # 添加到批量更新列表
-                batch_updates.append((split['id'], updated_fields))
-                
-                # 每达到批量大小就提交一次
-                if len(batch_updates) >= batch_size:
-                    batch_success = batch_update_transaction_splits(batch_updates)
-                    success_count += batch_success
-                    fail_count += len(batch_updates) - batch_success
-                    batch_updates = []
-                    logger.info(f"已处理 {total_count} 条记录，成功 {success_count} 条，失败 {fail_count} 条")
-            
-            except Exception as e:
-                fail_count += 1
-                logger.error(f"处理交易分单记录 {split['id']} 时发生错误: {str(e)}")
-        
-        # 处理剩余的批量更新
-        if batch_updates:
-            batch_success = batch_update_transaction_splits(batch_updates)
-            success_count += batch_success
-            fail_count += len(batch_updates) - batch_success
+    for report in reports:
+        if report['error']:
+            logger.error(f"持有人 {report['holder_id']} 的 {report['market']}-{report['stock_code']} 处理失败: {report['error']}")
+    
+    if group_reports is not None:
+        group_reports.extend(reports)
     
     # 是否同时更新原始交易记录
     if update_original:
@@ -474,7 +959,137 @@ def recalculate_transaction_splits(holder_id=None, stock_code=None, market=None,
     
     return (total_count, success_count, fail_count)
 
+def split_matches_stored(split, split_fields):
+    """
+    判断重新计算的字段是否与数据库中已存储的值一致
+    
+    数据库中的金额字段保留两位小数，因此按两位小数四舍五入后比较
+    
+    Args:
+        split (dict): 数据库中的交易分单记录
+        split_fields (dict): calculate_split_fields 的计算结果
+        
+    Returns:
+        bool: 是否一致
+    """
+    precision = decimal.Decimal('0.01')
+    for field, value in split_fields.items():
+        stored = split.get(field)
+        if stored is None:
+            return False
+        computed = value.quantize(precision, rounding=decimal.ROUND_HALF_UP)
+        stored = decimal.Decimal(str(stored)).quantize(precision, rounding=decimal.ROUND_HALF_UP)
+        if computed != stored:
+            return False
+    return True
+
+def _to_date(value):
+    """将交易日期统一为date，便于比较字符串、date和datetime"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], '%Y-%m-%d').date()
+    return value
+
+def recalculate_incremental(holder_id, market, stock_code, start_date, start_id=None, page_size=50, db_conn=None):
+    """
+    增量重新计算指定持有人-股票的交易分单记录
+    
+    从被修改记录之前最后一条记录的已存储状态（检查点）开始，按(交易日期, ID)顺序
+    重放后续记录；一旦被修改记录之后的某条记录重新计算的结果与已存储的值一致，
+    说明之后的持仓状态不会再改变，立即停止。修改旧交易的代价只与实际改变的记录数相关。
+    
+    未指定start_id时无法确定被修改的是该日期的哪一条记录，该日期的记录全部重放，
+    从下一个交易日期开始才允许收敛。
+    
+    Args:
+        holder_id (int): 持有人ID
+        market (str): 市场
+        stock_code (str): 股票代码
+        start_date (date): 被修改记录的交易日期（修改日期时取新旧日期中较早者）
+        start_id (int, optional): 被修改记录的ID，不指定则从该日期的第一条记录开始
+        page_size (int, optional): 每次读取的记录数
+        db_conn (optional): 调用方的数据库对象（提供 fetch_one、fetch_all、execute），
+            提供时在调用方的事务中读写且不提交；不提供时从连接池借出连接并在结束时提交
+        
+    Returns:
+        tuple: (checked_count, updated_count)
+    """
+    if db_conn is None:
+        with get_pooled_connection() as conn:
+            try:
+                result = recalculate_incremental(
+                    holder_id, market, stock_code, start_date, start_id, page_size,
+                    db_conn=ConnectionQueries(conn)
+                )
+                conn.commit()
+                return result
+            except Exception:
+                conn.rollback()
+                raise
+    
+    # 获取检查点：被修改记录之前的最后一条已存储状态
+    query, params = _previous_state_query(holder_id, market, stock_code, start_date, start_id)
+    checkpoint = db_conn.fetch_one(query, params) or {}
+    running_quantity = decimal.Decimal(str(checkpoint.get('quantity') or 0))
+    running_cost = decimal.Decimal(str(checkpoint.get('cost') or 0))
+    converge_after = None if start_id else _to_date(start_date)
+    
+    checked_count = 0
+    updated_count = 0
+    after_date, after_id, inclusive = start_date, start_id or 0, True
+    
+    while True:
+        query, params = _splits_page_query(
+            holder_id, market, stock_code, after_date, after_id,
+            inclusive=inclusive, limit=page_size
+        )
+        page = db_conn.fetch_all(query, params) or []
+        if not page:
+            break
+        
+        batch_updates = []
+        converged = False
+        for split in page:
+            split_fields = calculate_split_fields(split, running_quantity, running_cost)
+            
+            # 被修改的记录总是重新计算；未指定start_id时同一日期的记录都可能是被修改的记录
+            can_converge = checked_count > 0 and (
+                converge_after is None or _to_date(split['transaction_date']) > converge_after
+            )
+            if can_converge and split_matches_stored(split, split_fields):
+                converged = True
+                break
+            
+            checked_count += 1
+            running_quantity = split_fields['running_quantity']
+            running_cost = split_fields['running_cost']
+            batch_updates.append((split['id'], {field: float(value) for field, value in split_fields.items()}))
+        
+        if batch_updates:
+            query, params = build_batch_update('transaction_splits', batch_updates, set_updated_at=True)
+            if db_conn.execute(query, params) is False:
+                raise RuntimeError(f"更新持有人 {holder_id} 的 {market}-{stock_code} 交易分单记录失败")
+            updated_count += len(batch_updates)
+        
+        if converged or len(page) < page_size:
+            break
+        
+        last_split = page[-1]
+        after_date, after_id, inclusive = last_split['transaction_date'], last_split['id'], False
+    
+    logger.info(f"增量重新计算 持有人 {holder_id} 的 {market}-{stock_code}: 检查 {checked_count} 条, 更新 {updated_count} 条")
+    return (checked_count, updated_count)
+
 if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='重新计算所有交易分单记录')
+    parser.add_argument('--bulk', action='store_true', help='使用向量化批量计算')
+    parser.add_argument('--verify', action='store_true', help='批量计算时用逐条Decimal计算校验结果（5位小数）')
+    parser.add_argument('--workers', type=int, default=1, help='并行处理的进程数')
+    args = parser.parse_args()
+    
     # 确保日志目录存在
     ensure_log_directory()
     
@@ -482,12 +1097,24 @@ if __name__ == '__main__':
     
     try:
         # 重新计算所有交易分单记录
-        total, success, fail = recalculate_transaction_splits(update_original=True)
+        group_reports = []
+        total, success, fail = recalculate_transaction_splits(
+            update_original=True,
+            bulk=args.bulk,
+            verify=args.verify,
+            workers=args.workers,
+            group_reports=group_reports
+        )
         
         print(f"\n重新计算完成:")
         print(f"总计处理记录: {total}")
         print(f"成功处理: {success}")
         print(f"失败处理: {fail}")
         
+        print(f"\n各持有人-股票组合耗时（降序）:")
+        for report in sorted(group_reports, key=lambda report: report['elapsed'], reverse=True):
+            status = f"失败: {report['error']}" if report['error'] else f"{report['success_count']}/{report['total_count']}"
+            print(f"  持有人 {report['holder_id']} {report['market']}-{report['stock_code']}: {report['elapsed']:.3f} 秒, {status}")
+        
     except Exception as e:
-        print(f"重新计算过程中发生错误: {str(e)}") 
\ No newline at end of file
+        print(f"重新计算过程中发生错误: {str(e)}")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+交易分单记录的向量化批量计算
+
+将同一持有人-股票组合的交易分单记录装载为列式数组，用累积运算一次性计算
+交易前后的持仓数量、成本、平均成本、已实现盈亏和盈亏率，用于全量重建。
+计算公式与 transaction_recalculator.calculate_split_fields 保持一致。
+"""
+
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FEE_FIELDS = ('broker_fee', 'stamp_duty', 'transaction_levy', 'trading_fee', 'deposit_fee')
+
+# 每次连乘的最大记录数
+MAX_SEGMENT_LENGTH = 512
+# 连乘结果的自然对数下限，低于该值时从当前记录重新开始连乘，避免下溢
+LOG_PRODUCT_FLOOR = -300.0
+
+def _column(splits, field):
+    """将字段装载为float64数组，None视为0"""
+    return np.fromiter((float(split.get(field) or 0) for split in splits), dtype=np.float64, count=len(splits))
+
+def _running_cost(ratio, addend, resets, prev_cost):
+    """
+    计算成本递推 cost[k] = ratio[k] * cost[k-1] + addend[k]
+
+    清仓记录处成本归零；两次清仓之间的记录分段计算，每段长度不超过 MAX_SEGMENT_LENGTH，
+    连乘结果低于 exp(LOG_PRODUCT_FLOOR) 时以上一条记录的成本为起点重新连乘。
+    每段内 addend / product 均为非负数，累加没有相消误差。
+    """
+    count = len(ratio)
+    cost = np.empty(count, dtype=np.float64)
+    reset_positions = np.flatnonzero(resets)
+    log_ratio = np.log(np.where(resets, 1.0, ratio))
+
+    start = 0
+    carry = float(prev_cost)
+    next_reset = 0
+    while start < count:
+        if resets[start]:
+            cost[start] = 0.0
+            carry = 0.0
+            start += 1
+            continue
+
+        # 分段到下一次清仓为止
+        while next_reset < len(reset_positions) and reset_positions[next_reset] < start:
+            next_reset += 1
+        end = reset_positions[next_reset] if next_reset < len(reset_positions) else count
+        end = min(end, start + MAX_SEGMENT_LENGTH)
+
+        log_product = np.cumsum(log_ratio[start:end])
+        underflow = np.flatnonzero(log_product < LOG_PRODUCT_FLOOR)
+        if underflow.size:
+            end = start + max(int(underflow[0]), 1)
+            log_product = log_product[:end - start]
+
+        product = np.exp(log_product)
+        segment_cost = product * (carry + np.cumsum(addend[start:end] / product))
+        cost[start:end] = segment_cost
+        carry = float(segment_cost[-1])
+        start = end
+
+    return cost
+
+def calculate_group_fields(splits, prev_quantity=0, prev_cost=0):
+    """
+    向量化计算同一持有人-股票组合的交易分单字段
+
+    持仓成本满足分段线性递推 cost[k] = ratio[k] * cost[k-1] + buy_cost[k]：
+    买入时 ratio 为 1，卖出时为剩余数量占比；清仓（或卖出前无持仓）时成本归零，
+    作为新分段的起点。每个分段内用对数累加求连乘，再用累加求和得到成本。
+    计算结果含有非有限值（inf/NaN）时返回 None，由调用方回退到逐条计算。
+
+    Args:
+        splits (list): 已按交易日期和ID排序的交易分单记录
+        prev_quantity (int, optional): 第一条记录之前的持仓数量
+        prev_cost (float, optional): 第一条记录之前的持仓成本
+
+    Returns:
+        list: 每条记录的计算字段字典（float类型），与splits一一对应；结果含非有限值时为 None
+    """
+    count = len(splits)
+    if count == 0:
+        return []
+
+    is_buy = np.fromiter((split['transaction_type'].lower() == 'buy' for split in splits), dtype=bool, count=count)
+    quantity = np.fromiter((int(split['total_quantity']) for split in splits), dtype=np.int64, count=count)
+    amount = _column(splits, 'total_amount')
+    fees = np.zeros(count, dtype=np.float64)
+    for field in FEE_FIELDS:
+        fees += _column(splits, field)
+
+    # 持仓数量：带符号数量的累加
+    current_quantity = int(prev_quantity) + np.cumsum(np.where(is_buy, quantity, -quantity))
+    before_quantity = np.empty_like(current_quantity)
+    before_quantity[0] = int(prev_quantity)
+    before_quantity[1:] = current_quantity[:-1]
+
+    # 成本递推系数
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sell_ratio = np.where(
+            (before_quantity > 0) & (current_quantity > 0),
+            current_quantity / np.where(before_quantity > 0, before_quantity, 1),
+            0.0
+        )
+    ratio = np.where(is_buy, 1.0, sell_ratio)
+    addend = np.where(is_buy, amount + fees, 0.0)
+
+    # 卖出前无持仓或清仓时成本归零
+    current_cost = _running_cost(ratio, addend, ratio == 0.0, prev_cost)
+    before_cost = np.empty_like(current_cost)
+    before_cost[0] = float(prev_cost)
+    before_cost[1:] = current_cost[:-1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        before_avg_cost = np.where(before_quantity > 0, before_cost / np.where(before_quantity > 0, before_quantity, 1), 0.0)
+        current_avg_cost = np.where(current_quantity > 0, current_cost / np.where(current_quantity > 0, current_quantity, 1), 0.0)
+
+        # 卖出的已实现盈亏和盈亏率
+        realized_mask = ~is_buy & (before_quantity > 0) & (before_avg_cost > 0)
+        buy_cost = quantity * before_avg_cost
+        realized_profit = np.where(realized_mask, amount - buy_cost - fees, 0.0)
+        profit_rate = np.where(realized_mask & (buy_cost > 0), realized_profit / np.where(buy_cost > 0, buy_cost, 1) * 100, 0.0)
+
+    net_amount = np.where(is_buy, amount + fees, amount - fees)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_price = np.where(quantity > 0, amount / np.where(quantity > 0, quantity, 1), 0.0)
+
+    columns = {
+        'prev_quantity': before_quantity.astype(np.float64),
+        'prev_cost': before_cost,
+        'prev_avg_cost': before_avg_cost,
+        'current_quantity': current_quantity.astype(np.float64),
+        'current_cost': current_cost,
+        'current_avg_cost': current_avg_cost,
+        'total_fees': fees,
+        'net_amount': net_amount,
+        'running_quantity': current_quantity.astype(np.float64),
+        'running_cost': current_cost,
+        'realized_profit': realized_profit,
+        'profit_rate': profit_rate,
+        'avg_price': avg_price
+    }
+
+    invalid = [field for field, values in columns.items() if not np.isfinite(values).all()]
+    if invalid:
+        logger.warning(f"向量化计算结果含有非有限值: {', '.join(invalid)}")
+        return None
+
+    # 转换为与逐条计算相同的行格式
+    column_lists = {field: values.tolist() for field, values in columns.items()}
+    return [
+        {field: column_lists[field][index] for field in column_lists}
+        for index in range(count)
+    ]